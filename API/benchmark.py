@@ -0,0 +1,354 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Benchmarks Against A Local Stub Exchange
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps as json_dumps
+from json import loads as json_loads
+from threading import Thread
+
+# THIRD PARTY MODULES
+import requests
+
+# CEX MODULES
+import book_recorder
+import cex_async
+import executor
+import rate_limit
+from cex_public import (
+    URLS,
+    book_buffer,
+    book_fill,
+    book_json,
+    book_levels,
+    book_response,
+)
+from sessions import get_session, pool_stats
+
+# GLOBAL USER DEFINED CONSTANTS
+CALLS = 200
+CALLERS = 8
+# levels per side each exchange sent for every get_book() call before
+# book_request() passed its depth on; bittrex has no limit, a whole book
+FULL_BOOK = {
+    "bittrex": 2000,
+    "bitfinex": 100,
+    "binance": 100,
+    "poloniex": 50,
+    "coinbase": 50,
+    "kraken": 50,
+    "kucoin": 100,
+}
+PORT = 0  # 0 picks a free port
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    serve a small canned ticker; http.server requires a handler class
+    """
+
+    protocol_version = "HTTP/1.1"
+    # one write per response; avoids nagle stalls on keep-alive connections
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+    body = json_dumps({"price": "0.00713", "size": "1.5"}).encode()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        respond to every GET with the canned body
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """
+        headers alone, as sessions.prewarm() asks for
+        """
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """
+        silence per request logging
+        """
+
+
+def stub_server():
+    """
+    start the stub exchange in a daemon thread; return its base url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", PORT), StubHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return "http://127.0.0.1:%s" % server.server_address[1], server
+
+
+def fetch(url):
+    """
+    module level executor target; one GET against the stub
+    """
+    return requests.get(url, timeout=10).json()
+
+
+def fetch_pooled(url):
+    """
+    module level executor target; one GET on a pooled keep-alive session
+    """
+    return get_session({"exchange": "stub", "url": url}).get(url, timeout=10).json()
+
+
+def calls_per_second(url, target=fetch, calls=CALLS, callers=CALLERS):
+    """
+    drive calls through executor.execute() from concurrent caller threads
+    """
+    begin = time.time()
+    with ThreadPoolExecutor(callers) as pool:
+        list(pool.map(lambda _: executor.execute(target, (url,), 10), range(calls)))
+    return calls / (time.time() - begin)
+
+
+def bench_executor():
+    """
+    calls per second per executor mode
+    """
+    url, server = stub_server()
+    print("\nEXECUTOR MODES", CALLS, "calls", CALLERS, "callers\n")
+    for mode in ["spawn", "process", "thread", "inline"]:
+        executor.set_mode(mode, workers=CALLERS)
+        # warm the pool so startup cost is not billed to the first calls
+        executor.execute(fetch, (url,), 10)
+        print("%-8s %10.1f calls per second" % (mode, calls_per_second(url)))
+    executor.shutdown()
+    server.shutdown()
+
+
+def bench_sessions():
+    """
+    calls per second with and without pooled keep-alive sessions
+    """
+    url, server = stub_server()
+    print("\nKEEP-ALIVE SESSIONS", CALLS, "calls", CALLERS, "callers\n")
+    for mode in ["process", "thread"]:
+        executor.set_mode(mode, workers=CALLERS)
+        executor.execute(fetch, (url,), 10)
+        fresh = calls_per_second(url, fetch)
+        pooled = calls_per_second(url, fetch_pooled)
+        reuse = pool_stats()[url]["reuse"]
+        print(
+            "%-8s %10.1f fresh %10.1f pooled calls per second, %.1f%% reuse"
+            % (mode, fresh, pooled, 100 * reuse)
+        )
+    executor.shutdown()
+    server.shutdown()
+
+
+def bench_async(calls=CALLS * 5):
+    """
+    concurrent cex_async.get_price() calls on one event loop
+    the stub serves a coinbase ticker; URLS is pointed at it for the run
+    and the coinbase rate limit is lifted, the stub has none
+    """
+    url, server = stub_server()
+    live, URLS["coinbase"] = URLS["coinbase"], url
+    limit = rate_limit.LIMITS.pop("coinbase")
+
+    async def run():
+        apis = [{"exchange": "coinbase", "pair": "LTC:BTC"} for _ in range(calls)]
+        begin = time.time()
+        prices = await asyncio.gather(*[cex_async.get_price(api) for api in apis])
+        elapsed = time.time() - begin
+        await cex_async.close_sessions()
+        assert prices == [0.00713] * calls
+        return elapsed
+
+    print("\nASYNC", calls, "concurrent get_price() calls\n")
+    print("%-8s %10.1f calls per second" % ("asyncio", calls / asyncio.run(run())))
+    URLS["coinbase"] = live
+    rate_limit.LIMITS["coinbase"] = limit
+    server.shutdown()
+
+
+def book_payload(exchange, levels):
+    """
+    raw response bytes of a book with levels per side, as each exchange sends
+    """
+    bids = [["%.8f" % (100 - i / 100), "%.8f" % (1 + i % 7)] for i in range(levels)]
+    asks = [["%.8f" % (100 + i / 100), "%.8f" % (1 + i % 5)] for i in range(levels)]
+    if exchange == "bittrex":
+        data = {
+            "success": True,
+            "message": "",
+            "result": {
+                "buy": [{"Quantity": float(v), "Rate": float(p)} for p, v in bids],
+                "sell": [{"Quantity": float(v), "Rate": float(p)} for p, v in asks],
+            },
+        }
+    elif exchange == "bitfinex":
+        data = [[float(p), 1, float(v)] for p, v in bids]
+        data += [[float(p), 1, -float(v)] for p, v in asks]
+    elif exchange == "kraken":
+        data = {"error": [], "result": {"XLTCXXBT": {"bids": bids, "asks": asks}}}
+    elif exchange == "kucoin":
+        data = {"code": "200000", "data": {"bids": bids, "asks": asks}}
+    elif exchange == "poloniex":
+        data = {"bids": bids, "asks": asks, "isFrozen": "0", "seq": 1}
+    else:
+        data = {"bids": bids, "asks": asks}
+    return json_dumps(data).encode()
+
+
+def measure(target, repeat=20):
+    """
+    (best seconds, peak bytes allocated) of target()
+    """
+    best = min(timed(target) for _ in range(repeat))
+    tracemalloc.start()
+    target()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def timed(target):
+    """
+    seconds one target() call takes
+    """
+    begin = time.perf_counter()
+    target()
+    return time.perf_counter() - begin
+
+
+def bench_book_parse(depth=10):
+    """
+    get_book() parse time and allocation per exchange, before and after
+    before: every level sent, json_loads() of all of it
+    after: only depth levels requested where the exchange allows it,
+    and book_json() stops decoding each side at depth
+    """
+    print("\nBOOK PARSE depth", depth, "per exchange\n")
+    print("%-9s %15s %15s %15s" % ("", "levels sent", "ms", "peak kB"))
+    for exchange in FULL_BOOK:
+        api = {"exchange": exchange}
+        full = book_payload(exchange, FULL_BOOK[exchange])
+        sent = book_payload(
+            exchange, (book_levels(exchange, depth) or FULL_BOOK[exchange])
+        )
+        before = measure(lambda: book_response(api, json_loads(full), depth))
+        after = measure(
+            lambda: book_response(api, book_json(exchange, sent, depth), depth)
+        )
+        print(
+            "%-9s %7s > %-5s %7.3f > %-6.3f %7.1f > %-6.1f"
+            % (
+                exchange,
+                FULL_BOOK[exchange],
+                (book_levels(exchange, depth) or FULL_BOOK[exchange]),
+                1000 * before[0],
+                1000 * after[0],
+                before[1] / 1024,
+                after[1] / 1024,
+            )
+        )
+
+
+def bench_book_buffers(pairs=100, polls=100, depth=50):
+    """
+    a polling loop over many pairs normalizing books into fresh arrays
+    versus filling one preallocated buffer per pair in place
+    """
+    api = {"exchange": "binance"}
+    data = json_loads(book_payload("binance", depth))
+    buffers = [book_buffer(depth) for _ in range(pairs)]
+    print("\nBOOK BUFFERS", pairs, "pairs", polls, "polls depth", depth, "\n")
+    for name, poll in [
+        ("fresh", lambda _: book_response(api, data, depth)),
+        ("buffer", lambda out: book_fill(api, data, depth, out)),
+    ]:
+        begin = time.perf_counter()
+        for _ in range(polls):
+            for out in buffers:
+                poll(out)
+        elapsed = time.perf_counter() - begin
+        peak = measure(lambda: poll(buffers[0]), 1)[1]
+        print(
+            "%-8s %10.1f books per second %8d bytes peak per book"
+            % (name, pairs * polls / elapsed, peak)
+        )
+
+
+def bench_book_recorder(pairs=10, snapshots=2000, depth=50):
+    """
+    snapshots of many pairs queued to the recorder, the bytes kept per
+    snapshot, and the rate they replay at in time order
+    """
+    api = {"exchange": "binance"}
+    data = json_loads(book_payload("binance", depth))
+    book = book_response(api, data, depth)
+    apis = [{"exchange": "binance", "pair": "PAIR:%s" % i} for i in range(pairs)]
+    path = book_recorder.PATH
+    print("\nBOOK RECORDER", pairs, "pairs", snapshots, "snapshots depth", depth, "\n")
+    with tempfile.TemporaryDirectory() as temp:
+        book_recorder.PATH = temp + "/"
+        try:
+            recorder = book_recorder.open_recorder(depth, buffer=pairs * snapshots)
+            begin = time.perf_counter()
+            for unix in range(snapshots):
+                # a few levels move between snapshots
+                book["bidv"][unix % depth] += 1
+                for each in apis:
+                    book_recorder.record(recorder, each, book, unix)
+            queued = time.perf_counter() - begin
+            book_recorder.close_recorder(recorder)
+            written = time.perf_counter() - begin
+            size = sum(
+                os.path.getsize(
+                    book_recorder.series_path(each["exchange"], each["pair"], depth)
+                    + "books.bin"
+                )
+                for each in apis
+            )
+            begin = time.perf_counter()
+            replayed = sum(1 for _ in book_recorder.replay(apis, depth))
+            elapsed = time.perf_counter() - begin
+        finally:
+            book_recorder.PATH = path
+    total = pairs * snapshots
+    print("%-8s %10.1f snapshots per second queued" % ("record", total / queued))
+    print("%-8s %10.1f snapshots per second on disk" % ("write", total / written))
+    print("%-8s %10.1f bytes per snapshot" % ("size", size / total))
+    print("%-8s %10.1f snapshots per second" % ("replay", replayed / elapsed))
+
+
+def main():
+    """
+    run all benchmarks
+    """
+    bench_executor()
+    bench_sessions()
+    bench_async()
+    bench_book_parse()
+    bench_book_buffers()
+    bench_book_recorder()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Order Book Snapshot Recorder
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from cex_public import get_book
+from utilities import trace
+
+# GLOBAL USER DEFINED CONSTANTS
+PATH = str(os.path.dirname(os.path.abspath(__file__))) + "/books/"
+BUFFER = 10000  # snapshots held for the writer; beyond this new ones are dropped
+BATCH = 1000  # most snapshots the writer takes per pass
+DELTA = False  # xor each snapshot against the one before it
+KEYFRAME = 256  # every KEYFRAME-th record of a series is stored whole
+# the rows of the (4, depth) block of levels in each record
+FIELDS = ["bidv", "bidp", "askp", "askv"]
+CLOCK = time.time
+
+
+def about():
+    """
+    BOOK RECORDER USAGE
+
+    from book_recorder import open_recorder, record, poll_books, close_recorder
+    from book_recorder import load, replay
+
+    recorder = open_recorder(depth=50)
+    record(recorder, api, get_book(api, 50))    # False if the buffer was full
+    poll_books(recorder, apis, interval=1)      # or record them all, forever
+    close_recorder(recorder)                    # writes what is still queued
+
+    data = load("kraken", "XBT:USD", 50, start, end)
+    data["unix"], data["bidp"]                  # (n,) and (n, 50) arrays
+    for api, unix, book in replay(apis, 50, start, end):
+        ...                                     # get_book() format, in time order
+
+    ABOUT
+
+    one append only file of fixed size binary records per
+    (exchange, pair, depth) under PATH, with meta.json beside it
+    a record is the unix stamp, the level count of each side and a
+    (4, depth) float64 block of bidv, bidp, askp and askv, NaN past the count
+    fixed size records are read back memory mapped, with no parsing
+    records are the same size with or without delta; the recorder itself
+    saves no space, a snapshot costs 16 + 32 * depth bytes on disk
+    delta=True stores the bits of each snapshot xor the one before, so
+    levels which did not move are zeros; that only pays off if the files
+    are compressed afterwards, and load() must then decode from the
+    keyframe before a window with one vectorized xor accumulate
+    every KEYFRAME-th delta record is whole; decoding is exact
+    record() copies the book and queues it; it never touches the disk and
+    never waits; a background thread appends whole batches per series
+    when BUFFER snapshots are queued, new ones are counted in "dropped"
+    a torn record left by a crash is cut off when the series is next opened
+    one recorder per series at a time; snapshots are stored in arrival order
+    """
+    print(about.__doc__)
+
+
+def series_path(exchange, pair, depth):
+    """
+    directory of one recorded series
+    """
+    return PATH + "%s/%s/%s/" % (exchange, pair.replace(":", "_"), int(depth))
+
+
+def record_dtype(depth, delta):
+    """
+    numpy dtype of one record; the levels are int64 bits when delta encoded
+    """
+    return np.dtype(
+        [
+            ("unix", "<f8"),
+            ("bids", "<i4"),
+            ("asks", "<i4"),
+            ("book", "<i8" if delta else "<f8", (len(FIELDS), depth)),
+        ]
+    )
+
+
+def read_meta(path):
+    """
+    format of a series as it was first written; None if there is none
+    """
+    try:
+        with open(path + "meta.json") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def open_recorder(depth=50, delta=DELTA, keyframe=KEYFRAME, buffer=BUFFER):
+    """
+    start the background writer of book snapshots of depth levels
+    delta and keyframe apply to new series; existing ones keep their own
+    """
+    recorder = {
+        "depth": depth,
+        "delta": delta,
+        "keyframe": keyframe,
+        "queue": Queue(buffer),
+        "series": {},
+        "written": 0,
+        "dropped": 0,
+        "failed": 0,
+        "error": None,
+        "lock": Lock(),
+        "stop": Event(),
+    }
+    recorder["thread"] = Thread(target=write_loop, args=(recorder,), daemon=True)
+    recorder["thread"].start()
+    return recorder
+
+
+def close_recorder(recorder):
+    """
+    stop polling, write every snapshot still queued and close the files
+    """
+    recorder["stop"].set()
+    recorder["thread"].join()
+    for series in recorder["series"].values():
+        series["handle"].close()
+    recorder["series"].clear()
+
+
+def record(recorder, api, book, unix=None):
+    """
+    queue a copy of a get_book() book of api["pair"], stamped unix or now
+    also takes book_buffer() and stream_book() books
+    returns False, without waiting, if the buffer is full
+    """
+    depth = recorder["depth"]
+    block = np.full((len(FIELDS), depth), np.nan)
+    bids = min(book.get("bids", len(book["bidp"])), depth)
+    asks = min(book.get("asks", len(book["askp"])), depth)
+    for row, field in enumerate(FIELDS):
+        count = bids if field[:3] == "bid" else asks
+        block[row, :count] = book[field][:count]
+    unix = CLOCK() if unix is None else unix
+    try:
+        recorder["queue"].put_nowait(
+            ((api["exchange"], api["pair"]), unix, bids, asks, block)
+        )
+    except Full:
+        with recorder["lock"]:
+            recorder["dropped"] += 1
+        return False
+    return True
+
+
+def poll_books(recorder, apis, interval=1, rounds=None):
+    """
+    record a book of every api concurrently, every interval seconds
+    until close_recorder() or rounds rounds; failed requests are counted
+    """
+    done = 0
+    with ThreadPoolExecutor(max(len(apis), 1)) as pool:
+        while not recorder["stop"].is_set() and (rounds is None or done < rounds):
+            begin = time.time()
+            futures = {
+                pool.submit(get_book, api, recorder["depth"], None, True): api
+                for api in apis
+            }
+            for future in as_completed(futures):
+                try:
+                    record(recorder, futures[future], future.result())
+                except Exception as error:
+                    with recorder["lock"]:
+                        recorder["failed"] += 1
+                        recorder["error"] = trace(error)
+            done += 1
+            if rounds is None or done < rounds:
+                recorder["stop"].wait(max(interval - (time.time() - begin), 0))
+
+
+def write_loop(recorder):
+    """
+    background writer; appends queued snapshots a batch at a time
+    """
+    queue = recorder["queue"]
+    while True:
+        try:
+            items = [queue.get(timeout=0.1)]
+        except Empty:
+            if recorder["stop"].is_set():
+                return
+            continue
+        while len(items) < BATCH:
+            try:
+                items.append(queue.get_nowait())
+            except Empty:
+                break
+        batches = {}
+        for item in items:
+            batches.setdefault(item[0], []).append(item[1:])
+        for key, snapshots in batches.items():
+            try:
+                write(recorder, key, snapshots)
+            except Exception as error:
+                with recorder["lock"]:
+                    recorder["dropped"] += len(snapshots)
+                    recorder["error"] = trace(error)
+
+
+def open_series(recorder, key):
+    """
+    append handle and encoding state of one series, created if new
+    """
+    exchange, pair = key
+    depth = recorder["depth"]
+    path = series_path(exchange, pair, depth)
+    os.makedirs(path, exist_ok=True)
+    meta = read_meta(path)
+    if meta is None:
+        meta = {
+            "depth": depth,
+            "delta": recorder["delta"],
+            "keyframe": recorder["keyframe"],
+        }
+        with open(path + "meta.tmp", "w") as handle:
+            json.dump(meta, handle)
+        os.replace(path + "meta.tmp", path + "meta.json")
+    dtype = record_dtype(depth, meta["delta"])
+    handle = open(path + "books.bin", "ab")
+    count = handle.tell() // dtype.itemsize
+    # cut off a record torn by a crash mid write
+    handle.truncate(count * dtype.itemsize)
+    series = {"handle": handle, "count": count, "dtype": dtype, "last": None}
+    series.update(meta)
+    if meta["delta"] and count % meta["keyframe"]:
+        rows = np.memmap(path + "books.bin", dtype, mode="r", shape=(count,))
+        series["last"] = decode(rows, count - 1, count, meta).view(np.int64)[0]
+    return series
+
+
+def write(recorder, key, snapshots):
+    """
+    encode (unix, bids, asks, block) snapshots of one series and append them
+    """
+    series = recorder["series"].get(key)
+    if series is None:
+        series = recorder["series"][key] = open_series(recorder, key)
+    rows = np.empty(len(snapshots), series["dtype"])
+    unix, bids, asks, blocks = zip(*snapshots)
+    rows["unix"], rows["bids"], rows["asks"] = unix, bids, asks
+    blocks = np.stack(blocks)
+    if series["delta"]:
+        bits = blocks.view(np.int64)
+        previous = np.empty_like(bits)
+        previous[0] = 0 if series["last"] is None else series["last"]
+        previous[1:] = bits[:-1]
+        # xor with zero leaves the keyframes whole
+        index = series["count"] + np.arange(len(bits))
+        previous[index % series["keyframe"] == 0] = 0
+        rows["book"] = bits ^ previous
+        series["last"] = bits[-1].copy()
+    else:
+        rows["book"] = blocks
+    series["handle"].write(rows.tobytes())
+    series["handle"].flush()
+    series["count"] += len(rows)
+    with recorder["lock"]:
+        recorder["written"] += len(rows)
+
+
+def decode(rows, begin, stop, meta):
+    """
+    (stop - begin, 4, depth) float64 levels of records begin to stop
+    """
+    if not meta["delta"]:
+        return rows["book"][begin:stop]
+    keyframe = meta["keyframe"]
+    first = begin - begin % keyframe
+    groups = -((first - stop) // keyframe)
+    bits = np.zeros((groups, keyframe) + rows.dtype["book"].shape, np.int64)
+    flat = bits.reshape((-1,) + bits.shape[2:])
+    flat[: stop - first] = rows["book"][first:stop]
+    np.bitwise_xor.accumulate(bits, axis=1, out=bits)
+    return flat[begin - first : stop - first].view(np.float64)
+
+
+def load(exchange, pair, depth, start=None, end=None):
+    """
+    recorded snapshots with start <= unix <= end as a dict of arrays
+    {"unix", "bids", "asks": (n,), "bidv", "bidp", "askp", "askv": (n, depth)}
+    memory mapped; levels decoded into memory when delta encoded
+    """
+    path = series_path(exchange, pair, depth)
+    meta = read_meta(path)
+    count = 0
+    if meta is not None and os.path.exists(path + "books.bin"):
+        dtype = record_dtype(depth, meta["delta"])
+        count = os.path.getsize(path + "books.bin") // dtype.itemsize
+    if not count:
+        data = {key: np.array([]) for key in ["unix", "bids", "asks"]}
+        data["bids"] = data["asks"] = np.array([], dtype=np.int32)
+        data.update({field: np.empty((0, depth)) for field in FIELDS})
+        return data
+    rows = np.memmap(path + "books.bin", dtype, mode="r", shape=(count,))
+    begin = 0 if start is None else int(np.searchsorted(rows["unix"], start, "left"))
+    stop = count if end is None else int(np.searchsorted(rows["unix"], end, "right"))
+    stop = max(begin, stop)
+    levels = decode(rows, begin, stop, meta)
+    data = {key: rows[key][begin:stop] for key in ["unix", "bids", "asks"]}
+    data.update({field: levels[:, row] for row, field in enumerate(FIELDS)})
+    return data
+
+
+def replay(apis, depth=50, start=None, end=None):
+    """
+    yield (api, unix, book) for the recorded snapshots of every api over
+    [start, end] in time order; books are get_book() format views
+    """
+    series = [
+        (api, load(api["exchange"], api["pair"], depth, start, end)) for api in apis
+    ]
+    sizes = [len(data["unix"]) for _, data in series]
+    unix = np.concatenate([data["unix"] for _, data in series])
+    which = np.repeat(np.arange(len(series)), sizes)
+    rows = np.concatenate([np.arange(size) for size in sizes]).astype(np.int64)
+    for index in np.argsort(unix, kind="stable").tolist():
+        api, data = series[which[index]]
+        row = rows[index]
+        bids, asks = data["bids"][row], data["asks"][row]
+        yield api, float(unix[index]), {
+            "bidv": data["bidv"][row, :bids],
+            "bidp": data["bidp"][row, :bids],
+            "askp": data["askp"][row, :asks],
+            "askv": data["askv"][row, :asks],
+        }
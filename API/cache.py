@@ -0,0 +1,198 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Bounded TTL Cache For Public Market Data
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import sys
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from threading import Lock, Thread
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from utilities import trace
+
+# GLOBAL USER DEFINED CONSTANTS
+CACHE = False  # opt in; the default for calls which pass cache=None
+TTLS = {"price": 5, "book": 1}  # seconds; candles expire at the next close
+STALE = {"price": 30, "book": 5, "candles": 60}  # grace after expiry
+MAX_ENTRIES = 1024
+MAX_BYTES = 64 * 1024**2
+CLOCK = time.time
+
+# module state; key: (value, bytes, expires, stale until) in LRU order
+ENTRIES = {
+    "lock": Lock(),
+    "lru": OrderedDict(),
+    "bytes": 0,
+    "refreshing": set(),
+    "stats": {"hits": 0, "misses": 0, "stale": 0, "evictions": 0},
+}
+
+
+def about():
+    """
+    CACHE USAGE
+
+    import cache
+    cache.CACHE = True                          # opt every call in
+    get_book(api)                               # cached for 1 second
+    get_price(api, cache=False)                 # bypass for this call
+    get_candles(api, cache="stale")             # stale while revalidate
+    print(cache.cache_stats())
+
+    ABOUT
+
+    TTLS seconds per kind; candles live until the next interval close,
+    or forever when the window ends before the current candle
+    least recently used entries are evicted past MAX_ENTRIES or MAX_BYTES
+    cache=None follows CACHE, True uses the cache, False bypasses it
+    cache="stale" answers from an expired entry within its STALE grace
+    at once, and refreshes it in a background thread
+    every caller receives its own copy
+    """
+    print(about.__doc__)
+
+
+def size_of(value):
+    """
+    approximate bytes held by a normalized response
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(size_of(k) + size_of(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(size_of(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def candle_ttl(end, interval):
+    """
+    seconds until the newest candle in a window may still change
+    None when every candle in the window has closed
+    """
+    now = CLOCK()
+    if end is not None and end + interval + 60 < now - now % interval:
+        return None
+    return interval - now % interval
+
+
+def store(key, value, ttl, stale):
+    """
+    insert or replace an entry and evict down to the bounds
+    """
+    size = size_of(value)
+    now = CLOCK()
+    expires = None if ttl is None else now + ttl
+    stale_until = None if ttl is None else expires + stale
+    with ENTRIES["lock"]:
+        old = ENTRIES["lru"].pop(key, None)
+        if old is not None:
+            ENTRIES["bytes"] -= old[1]
+        if size > MAX_BYTES:
+            return
+        ENTRIES["lru"][key] = (deepcopy(value), size, expires, stale_until)
+        ENTRIES["bytes"] += size
+        while len(ENTRIES["lru"]) > MAX_ENTRIES or ENTRIES["bytes"] > MAX_BYTES:
+            _, (_, evicted, _, _) = ENTRIES["lru"].popitem(last=False)
+            ENTRIES["bytes"] -= evicted
+            ENTRIES["stats"]["evictions"] += 1
+
+
+def lookup(key, stale_ok=False):
+    """
+    ("fresh" or "stale" or None, copy of the value)
+    """
+    now = CLOCK()
+    with ENTRIES["lock"]:
+        entry = ENTRIES["lru"].get(key)
+        if entry is None:
+            return None, None
+        value, _, expires, stale_until = entry
+        if expires is None or now < expires:
+            state = "fresh"
+        elif stale_ok and now < stale_until:
+            state = "stale"
+        else:
+            return None, None
+        ENTRIES["lru"].move_to_end(key)
+    return state, deepcopy(value)
+
+
+def refresh(key, ttl, stale, target, args):
+    """
+    background revalidation of one key; at most one at a time per key
+    """
+    with ENTRIES["lock"]:
+        if key in ENTRIES["refreshing"]:
+            return
+        ENTRIES["refreshing"].add(key)
+
+    def run():
+        try:
+            store(key, target(*args), ttl, stale)
+        except Exception as error:
+            print(trace(error))
+        finally:
+            with ENTRIES["lock"]:
+                ENTRIES["refreshing"].discard(key)
+
+    Thread(target=run, daemon=True).start()
+
+
+def cache_call(key, ttl, cache, target, *args):
+    """
+    target(*args) through the cache; key[0] names the kind of data
+    """
+    if cache is None:
+        cache = CACHE
+    if not cache:
+        return target(*args)
+    stale = STALE.get(key[0], 0)
+    state, value = lookup(key, stale_ok=cache == "stale")
+    with ENTRIES["lock"]:
+        ENTRIES["stats"]["hits" if state == "fresh" else state or "misses"] += 1
+    if state == "stale":
+        # fetches write endpoint, params and nonce into the api dict;
+        # the refresh must not race the caller's next call on the same one
+        copies = tuple(dict(arg) if isinstance(arg, dict) else arg for arg in args)
+        refresh(key, ttl, stale, target, copies)
+    if state is not None:
+        return value
+    value = target(*args)
+    store(key, value, ttl, stale)
+    return value
+
+
+def cache_stats():
+    """
+    {"hits", "misses", "stale", "evictions", "entries", "bytes"}
+    """
+    with ENTRIES["lock"]:
+        stats = dict(ENTRIES["stats"])
+        stats["entries"] = len(ENTRIES["lru"])
+        stats["bytes"] = ENTRIES["bytes"]
+    return stats
+
+
+def clear():
+    """
+    drop every entry and zero the counters
+    """
+    with ENTRIES["lock"]:
+        ENTRIES["lru"].clear()
+        ENTRIES["bytes"] = 0
+        for stat in ENTRIES["stats"]:
+            ENTRIES["stats"][stat] = 0
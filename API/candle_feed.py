@@ -0,0 +1,133 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Incremental Latest Candles Feed
+
+litepresence 2019
+"""
+
+# STANDARD MODULES
+import time
+from threading import Lock
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from cex_public import (COLUMNS, INTERVALS, fill_buckets, get_candles,
+                        no_duplicates, normalize, paginate_candles, reformat)
+
+# GLOBAL USER DEFINED CONSTANTS
+SIZE = 1000  # candles held per feed
+CLOCK = time.time
+
+
+def about():
+    """
+    CANDLE FEED USAGE
+
+    from candle_feed import open_feed, refresh, window
+
+    feed = open_feed({"exchange": "binance", "pair": "BTC:USDT"}, 60, 500)
+    while True:
+        refresh(feed)               # one small request; returns new bars
+        data = window(feed, 100)    # newest 100 candles, oldest first
+        time.sleep(60)
+
+    ABOUT
+
+    a feed is a dict holding one preallocated ring buffer per field
+    open_feed() fills it with one get_candles() call
+    refresh() requests only from the newest bar held, which may still be
+    forming, replaces that bar in place and appends the bars after it,
+    gaps filled with the previous close as get_candles() does
+    the oldest bars fall off the ring once it holds size candles
+    native exchange intervals only; see INTERVALS in cex_public
+    """
+    print(about.__doc__)
+
+
+def open_feed(api, interval=86400, size=SIZE):
+    """
+    new feed holding the latest size candles of api["pair"]
+    """
+    if interval not in INTERVALS[api["exchange"]]:
+        raise ValueError("%s has no %s candles" % (api["exchange"], interval))
+    feed = {
+        "api": {"exchange": api["exchange"], "pair": api["pair"]},
+        "interval": interval,
+        "size": size,
+        "data": {
+            k: np.empty(size, dtype=np.int64 if k == "unix" else np.float64)
+            for k in COLUMNS
+        },
+        "head": 0,  # next slot written
+        "count": 0,
+        "lock": Lock(),
+    }
+    refresh(feed)
+    return feed
+
+
+def append(feed, data):
+    """
+    write candles after the newest held; caller holds feed["lock"]
+    """
+    size = feed["size"]
+    count = len(data["unix"])
+    skip = max(count - size, 0)
+    slots = (feed["head"] + np.arange(skip, count)) % size
+    for key, values in feed["data"].items():
+        values[slots] = data[key][skip:]
+    feed["head"] = (feed["head"] + count) % size
+    feed["count"] = min(feed["count"] + count, size)
+
+
+def refresh(feed):
+    """
+    fetch from the newest bar held onward; returns the number of new bars
+    """
+    api, interval = feed["api"], feed["interval"]
+    if not feed["count"]:
+        # nothing held yet; a new market or a failed open
+        # get_candles() leaves out the bar still forming; refresh() adds it
+        now = int(CLOCK())
+        begin = now - (feed["size"] + 1) * interval
+        data = get_candles(dict(api), begin, now, interval)
+        with feed["lock"]:
+            append(feed, data)
+        return len(data["unix"])
+    with feed["lock"]:
+        last = (feed["head"] - 1) % feed["size"]
+        last_unix = int(feed["data"]["unix"][last])
+        last_close = feed["data"]["close"][last]
+    stop = int(CLOCK()) + interval + 60
+    page = paginate_candles(dict(api), last_unix - interval, stop, interval)
+    data = no_duplicates(reformat(page))
+    data = {k: v[data["unix"] >= last_unix] for k, v in data.items()}
+    if not len(data["unix"]):
+        return 0
+    # the bar held last is rewritten only if the exchange sent it again
+    begin = last_unix if data["unix"][0] == last_unix else last_unix + interval
+    ip_unix = np.arange(begin, data["unix"][-1] + 1, interval)
+    data = fill_buckets(data, ip_unix, -1, interval, last_close, last_close)
+    data = normalize(data)
+    with feed["lock"]:
+        if begin == last_unix:
+            for key, values in feed["data"].items():
+                values[last] = data[key][0]
+            data = {k: v[1:] for k, v in data.items()}
+        append(feed, data)
+    return len(data["unix"])
+
+
+def window(feed, depth=None):
+    """
+    copy of the newest depth candles held, oldest first, as a dict of arrays
+    """
+    with feed["lock"]:
+        depth = feed["count"] if depth is None else min(depth, feed["count"])
+        slots = (feed["head"] - depth + np.arange(depth)) % feed["size"]
+        return {k: v[slots] for k, v in feed["data"].items()}
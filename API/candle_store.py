@@ -0,0 +1,183 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Persistent Local Candle Store
+
+litepresence 2019
+"""
+
+# STANDARD MODULES
+import json
+import os
+import time
+from threading import Lock
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from utilities import flock
+
+# GLOBAL USER DEFINED CONSTANTS
+STORE = False  # opt in; the default for calls which pass store=None
+PATH = str(os.path.dirname(os.path.abspath(__file__))) + "/candles/"
+SETTLE = 60  # seconds after a close before a bar is considered final
+# the columns of a page of candles; see cex_public.COLUMNS
+FIELDS = ["high", "low", "open", "close", "volume", "unix"]
+CLOCK = time.time
+
+LOCK = Lock()
+
+
+def about():
+    """
+    CANDLE STORE USAGE
+
+    import candle_store
+    candle_store.STORE = True                    # opt every call in
+    get_candles(api, start, end, 60)             # only gaps hit the network
+    get_candles(api, start, end, 60, store=False)
+    candle_store.covered("coinbase", "BTC:USD", 60)   # [[begin, end], ...]
+
+    ABOUT
+
+    one directory per (exchange, pair, interval) under PATH
+    one .npy column per field, read back memory mapped
+    ranges.json lists the [begin, end] spans already downloaded
+    only bars closed at least SETTLE seconds ago are kept
+    a call downloads just the spans of its window not yet covered;
+    usually the head before the oldest bar kept and the live tail
+    save() replaces the column files under an exclusive flock and load()
+    maps them under a shared one, so a read never mixes columns of two saves
+    where there is no flock (windows) only the thread lock guards them
+    """
+    print(about.__doc__)
+
+
+def series_path(exchange, pair, interval):
+    """
+    directory of one candle series
+    """
+    return PATH + "%s/%s/%s/" % (exchange, pair.replace(":", "_"), int(interval))
+
+
+def covered(exchange, pair, interval):
+    """
+    sorted, merged [begin, end] spans already downloaded
+    """
+    try:
+        with open(series_path(exchange, pair, interval) + "ranges.json") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return []
+
+
+def merge_ranges(ranges, interval):
+    """
+    sort spans and join those which touch within one interval
+    """
+    merged = []
+    for begin, end in sorted(ranges):
+        if merged and begin <= merged[-1][1] + interval:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([begin, end])
+    return merged
+
+
+def gaps(ranges, start, end):
+    """
+    [begin, end] spans of the window [start, end] not yet covered
+    """
+    missing = []
+    for begin, stop in ranges:
+        if stop < start or begin > end:
+            continue
+        if begin > start:
+            missing.append([start, begin])
+        start = max(start, stop)
+    if start < end:
+        missing.append([start, end])
+    return missing
+
+
+def last_closed(interval):
+    """
+    open time of the newest bar which closed at least SETTLE seconds ago
+    """
+    now = int(CLOCK()) - SETTLE
+    return now - now % interval - interval
+
+
+def load(exchange, pair, interval, start=None, end=None):
+    """
+    stored candles with start <= unix <= end as a dict of memory mapped arrays
+    """
+    path = series_path(exchange, pair, interval)
+    if not os.path.exists(path + "unix.npy"):
+        return {field: np.array([]) for field in FIELDS}
+    # every column from the same save(); each map keeps the file it opened
+    with LOCK, open(path + "lock", "a") as lock:
+        flock(lock, "LOCK_SH")
+        data = columns(path)
+    begin = 0 if start is None else np.searchsorted(data["unix"], start, "left")
+    stop = None if end is None else np.searchsorted(data["unix"], end, "right")
+    return {field: values[begin:stop] for field, values in data.items()}
+
+
+def columns(path):
+    """
+    every stored column, memory mapped; the caller holds the flock
+    """
+    return {field: np.load(path + field + ".npy", mmap_mode="r") for field in FIELDS}
+
+
+def save(exchange, pair, interval, page, begin, end):
+    """
+    merge an (n, 6) page of candles into the store and mark [begin, end] covered
+    candles outside [begin, end] are not kept
+    """
+    path = series_path(exchange, pair, interval)
+    os.makedirs(path, exist_ok=True)
+    page = page[(begin <= page[:, -1]) & (page[:, -1] <= end)]
+    with LOCK, open(path + "lock", "w") as lock:
+        flock(lock, "LOCK_EX")
+        old = {field: np.array([]) for field in FIELDS}
+        if os.path.exists(path + "unix.npy"):
+            old = columns(path)
+        # fresh candles first, so they win over what was kept before
+        unix = np.concatenate([page[:, -1], old["unix"]]).astype(np.int64)
+        unix, index = np.unique(unix, return_index=True)
+        for col, field in enumerate(FIELDS):
+            if field == "unix":
+                values = unix
+            else:
+                values = np.concatenate([page[:, col], old[field]])[index]
+            np.save(path + field + ".tmp.npy", values)
+            os.replace(path + field + ".tmp.npy", path + field + ".npy")
+        ranges = covered(exchange, pair, interval) + [[int(begin), int(end)]]
+        with open(path + "ranges.tmp", "w") as handle:
+            json.dump(merge_ranges(ranges, interval), handle)
+        os.replace(path + "ranges.tmp", path + "ranges.json")
+
+
+def read_through(api, start, end, interval, fetch):
+    """
+    (n, 6) page of candles over [start, end] as fetch(api, start, end, interval)
+    would return, downloading only the spans the store does not cover
+    """
+    exchange, pair = api["exchange"], api["pair"]
+    closed = last_closed(interval)
+    pages = []
+    for begin, stop in gaps(covered(exchange, pair, interval), start, end):
+        # one interval of padding; some exchanges exclude their start bar
+        page = fetch(api, begin - interval, stop, interval)
+        # an empty answer may be a failed page; never mark it covered
+        if len(page) and begin < closed:
+            save(exchange, pair, interval, page, begin, min(stop, closed))
+        pages.append(page[page[:, -1] > closed])
+    data = load(exchange, pair, interval, start, min(end, closed))
+    kept = np.column_stack([data[field] for field in FIELDS]).reshape(-1, len(FIELDS))
+    return np.concatenate([kept] + pages)
@@ -0,0 +1,348 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Native Asyncio Remote Procedures
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import asyncio
+import time
+from copy import deepcopy
+from json import loads as json_loads
+from weakref import WeakKeyDictionary
+
+# THIRD PARTY MODULES
+import aiohttp
+import numpy as np
+
+# CEX MODULES
+from cex_private import (
+    balances_request,
+    balances_response,
+    cancel_requests,
+    cancel_response,
+    next_nonce,
+    open_order_ids,
+    order_request,
+    orders_request,
+    orders_response,
+    sign,
+)
+from cex_public import (
+    BATCH,
+    INTERVALS,
+    PAGE_ATTEMPTS,
+    book_fill,
+    book_json,
+    book_request,
+    book_response,
+    candles_request,
+    candles_response,
+    kept_buffer,
+    page_windows,
+    prepare,
+    price_request,
+    price_response,
+    prices_request,
+    prices_response,
+    process_candles,
+)
+from rate_limit import acquire_async
+from resample import native_interval, resample
+from utilities import trace
+
+# GLOBAL USER DEFINED CONSTANTS
+TIMEOUT = 30
+ATTEMPTS = 10
+LIMIT_PER_HOST = 100  # concurrent connections per exchange per event loop
+PAGES = 8  # concurrent candle pages per get_candles() call
+# private nonces must also arrive in increasing order per key at these
+SEQUENTIAL = ["bitfinex", "kraken", "poloniex"]
+
+# module state; one aiohttp session per base url per event loop
+SESSIONS = WeakKeyDictionary()
+# and one lock per exchange and key per event loop for SEQUENTIAL exchanges
+LOCKS = WeakKeyDictionary()
+
+
+def about():
+    """
+    ASYNC USAGE
+
+    import asyncio
+    from cex_async import get_price, get_book, get_candles
+
+    async def main():
+        apis = [{"exchange": e, "pair": "LTC:BTC"} for e in ["kraken", "binance"]]
+        prices = await asyncio.gather(*[get_price(api) for api in apis])
+        await close_sessions()
+
+    asyncio.run(main())
+
+    ABOUT
+
+    same signatures and normalized returns as cex_public and cex_private
+    endpoints, params, signatures and normalization are shared with them
+    one event loop drives many requests; no processes, no threads
+    """
+    print(about.__doc__)
+
+
+def get_session(api):
+    """
+    aiohttp session for api["url"] on the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    sessions = SESSIONS.setdefault(loop, {})
+    session = sessions.get(api["url"])
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=LIMIT_PER_HOST)
+        session = aiohttp.ClientSession(connector=connector)
+        sessions[api["url"]] = session
+    return session
+
+
+def nonce_lock(api):
+    """
+    asyncio lock serializing private calls of one key at one exchange
+    """
+    locks = LOCKS.setdefault(asyncio.get_running_loop(), {})
+    return locks.setdefault((api["exchange"], api.get("key")), asyncio.Lock())
+
+
+async def close_sessions():
+    """
+    close every aiohttp session of the running event loop
+    """
+    sessions = SESSIONS.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        await session.close()
+
+
+def query(params):
+    """
+    params dict to aiohttp query pairs; lists repeat the key, None is dropped
+    matches the encoding of the requests module used by the sync path
+    """
+    pairs = []
+    for key, value in (params or {}).items():
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            if item is not None:
+                pairs.append((str(key), str(item)))
+    return pairs
+
+
+async def send(api, private=False, parse=json_loads):
+    """
+    one public or signed request attempt; returns parse() of the response
+    """
+    if private:
+        api["nonce"] = next_nonce(api["exchange"])
+        call = sign(deepcopy(api))
+    else:
+        api["nonce"] = time.time()
+        call = prepare(deepcopy(api))
+    headers = {
+        k: v.decode() if isinstance(v, bytes) else v for k, v in call["headers"].items()
+    }
+    async with get_session(call).request(
+        call["method"],
+        call["url"] + call["endpoint"],
+        params=query(call["params"]),
+        data=call["data"] or None,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+    ) as resp:
+        return parse(await resp.read())
+
+
+async def fetch(api, private=False, lane="market", parse=json_loads):
+    """
+    async durability wrapper for external requests; returns parsed json
+    each attempt awaits the exchange rate limiter in the given lane
+    """
+    for attempt in range(1, ATTEMPTS + 1):
+        await acquire_async(api, lane)
+        try:
+            if private and api["exchange"] in SEQUENTIAL:
+                # one call in flight per key, so nonces arrive in order
+                async with nonce_lock(api):
+                    return await send(api, private, parse)
+            return await send(api, private, parse)
+        except Exception as error:
+            print(trace(error), attempt, api["exchange"], api["pair"])
+            await asyncio.sleep(attempt**2)
+    return None
+
+
+# PUBLIC METHODS
+
+
+async def get_price(api):
+    """
+    Last Price as float
+    """
+    price_request(api)
+    return price_response(api, await fetch(api))
+
+
+async def get_prices(api, pairs):
+    """
+    Last Price of many pairs at one exchange as {pair: float}
+    one request where the exchange offers it, else concurrent get_price()
+    """
+    pairs = list(pairs)
+    if api["exchange"] in BATCH:
+        prices_request(api, pairs)
+        return prices_response(api, await fetch(api), pairs)
+    last = await asyncio.gather(
+        *[get_price(dict(api, pair=p)) for p in pairs], return_exceptions=True
+    )
+    # a pair the exchange does not list fails alone, as in the batch
+    return {
+        pair: None if isinstance(price, BaseException) else price
+        for pair, price in zip(pairs, last)
+    }
+
+
+async def get_book(api, depth=10, out=None):
+    """
+    Depth of Market format:
+
+    {"bidv": [], "bidp": [], "askp": [], "askv": []}
+
+    out=True or a book_buffer() fills in place, as cex_public.get_book()
+    """
+    depth = min(depth, 50)
+    book_request(api, depth)
+    data = await fetch(api, parse=lambda raw: book_json(api["exchange"], raw, depth))
+    if out is None:
+        return book_response(api, data, depth)
+    return book_fill(api, data, depth, kept_buffer(api, depth) if out is True else out)
+
+
+async def candles(api, start, end, interval):
+    """
+    single page of candle data
+    a failed page is retried on its own, PAGE_ATTEMPTS times, then raises
+    """
+    candles_request(api, start, end, interval)
+    for attempt in range(1, PAGE_ATTEMPTS + 1):
+        try:
+            data = await fetch(api, lane="backfill")
+            return candles_response(api, data, start, end)
+        except Exception as error:
+            print(trace(error), {k: v for k, v in api.items() if k != "secret"})
+            if attempt == PAGE_ATTEMPTS:
+                raise
+            await asyncio.sleep(attempt)
+
+
+async def get_candles(api, start=None, end=None, interval=86400):
+    """
+    normalized candle data as a dict of numpy arrays
+    ["high", "low", "open", "close", "volume", "unix"]
+    pages are fetched concurrently, up to PAGES at a time
+    intervals the exchange does not offer are resampled; see resample.py
+    """
+    if end is None:
+        end = int(time.time())
+    if start is None:
+        start = end - 10 * interval
+    native = native_interval(INTERVALS[api["exchange"]], interval)
+    if native is None:
+        raise ValueError("no %s interval divides %s" % (api["exchange"], interval))
+    if native != interval:
+        data = await get_candles(api, start - start % interval, end, native)
+        data = resample(data, interval)
+        window = (start < data["unix"]) & (data["unix"] <= end + interval + 60)
+        return {k: v[window] for k, v in data.items()}
+    end = end + interval + 60
+    deep_begin = start - 3 * interval
+    semaphore = asyncio.Semaphore(PAGES)
+
+    async def page(window):
+        async with semaphore:
+            return await candles(dict(api), window[0], window[1], interval)
+
+    windows = page_windows(api["exchange"], deep_begin, end, interval)
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            pages = await asyncio.gather(*[page(window) for window in windows])
+            return process_candles(
+                np.concatenate(pages), start, end, deep_begin, interval
+            )
+        except Exception as error:
+            print(trace(error), attempt, api["exchange"], api["pair"])
+            await asyncio.sleep(attempt**2)
+    raise RuntimeError("get_candles failed %s %s" % (api["exchange"], api["pair"]))
+
+
+# PRIVATE METHODS
+
+
+async def get_orders(api):
+    """
+    Normalized open orders in one market
+    {"bids": {}, "asks": {}, "bid_sum": 0.0, "ask_sum": 0.0}
+    """
+    orders_request(api)
+    return orders_response(api, await fetch(api, private=True))
+
+
+async def get_balances(api):
+    """
+    Normalized balances in one market
+    {"asset_total": 0.0, "asset_free": 0.0, "asset_tied": 0.0,
+    "currency_total": 0.0, "currency_free": 0.0, "currency_tied": 0.0}
+    """
+    balances_request(api)
+    ret = await fetch(api, private=True)
+    # kraken requires a 2nd call to open orders to derive free balances
+    orders = await get_orders(dict(api)) if api["exchange"] == "kraken" else None
+    return balances_response(api, ret, orders)
+
+
+async def post_order(edict, api):
+    """
+    POST Normalized Limit Order; returns the raw response
+    """
+    order_request(edict, api)
+    return await fetch(api, private=True, lane="order")
+
+
+async def delete_orders(api, order_ids=None):
+    """
+    DELETE all orders by api["pair"] (or) by symbol and order_id
+    cancel calls are sent concurrently; fetch() queues them at SEQUENTIAL
+    """
+    order_ids = list(order_ids or [])
+    if not order_ids and api["exchange"] in ["kraken", "binance", "bittrex"]:
+        order_ids = open_order_ids(await get_orders(dict(api)))
+    calls = cancel_requests(api, order_ids)
+    responses = await asyncio.gather(*[fetch(call, True, "order") for _, call in calls])
+    return cancel_response(api, calls, list(responses))
+
+
+async def demo():
+    """
+    concurrent last price at every exchange
+    """
+    exchanges = ["bitfinex", "binance", "poloniex", "coinbase", "kraken", "kucoin"]
+    apis = [{"exchange": exchange, "pair": "LTC:BTC"} for exchange in exchanges]
+    prices = await asyncio.gather(
+        *[get_price(api) for api in apis], return_exceptions=True
+    )
+    for exchange, price in zip(exchanges, prices):
+        print(exchange, price)
+    await close_sessions()
+
+
+if __name__ == "__main__":
+    asyncio.run(demo())
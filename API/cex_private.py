@@ -20,16 +20,18 @@ import hmac
 import os
 import time
 from base64 import b64decode, b64encode
+from copy import deepcopy
 from json import dumps as json_dumps
-from multiprocessing import Process, Value
+from json import loads as json_loads
 from pprint import pprint
+from threading import Lock
 from urllib.parse import urlencode
 
-# THIRD PARTY MODULES
-import requests
-
 # CEX MODULES
-from utilities import json_ipc, symbol_syntax, trace
+from executor import execute
+from rate_limit import acquire
+from sessions import get_session, pool_prewarm
+from utilities import json_ipc, pipe_doc, pipe_pop, symbol_syntax, trace
 
 # GLOBAL USER DEFINED CONSTANTS
 TIMEOUT = 30
@@ -37,6 +39,10 @@ ATTEMPTS = 10
 PATH = str(os.path.dirname(os.path.abspath(__file__))) + "/"
 DETAIL = True
 SANDBOX = False
+PIPE = False  # debug: relay responses through human readable json_ipc *.txt
+
+# module state; last nonce in integer milliseconds per exchange
+NONCES = {"lock": Lock(), "last": {}}
 
 
 def about():
@@ -137,11 +143,30 @@ def lookup_url(api):
     return api
 
 
-def signed_request(api, signal):
+def warm_up(exchanges):
     """
-    Remote procedure call for authenticated exchange operations
-    api         : dict with keys for building external request
-    signal      : multiprocessing completion relay
+    open keep-alive connections to private exchange apis in every worker
+    so the first trading call does not pay DNS, TCP and TLS handshakes
+    """
+    return pool_prewarm({k: lookup_url({"exchange": k})["url"] for k in exchanges})
+
+
+def next_nonce(exchange):
+    """
+    strictly increasing request nonce in seconds per exchange
+    exchanges which sign int(nonce * 1000) never see the same value twice
+    """
+    with NONCES["lock"]:
+        millis = max(int(time.time() * 1000), NONCES["last"].get(exchange, 0) + 1)
+        NONCES["last"][exchange] = millis
+    # centered in its millisecond so int(nonce * 1000) recovers it exactly
+    return (millis + 0.5) / 1000
+
+
+def sign(api):
+    """
+    add url, data and authentication headers to the api dict
+    shared by the sync and async remote procedure calls
     """
     api = lookup_url(api)
     api["data"] = ""
@@ -244,17 +269,28 @@ def signed_request(api, signal):
             "Content-Type": "application/json",
             "User-Agent": "www.litepresence.com finitestate@tutamail.com",
         }
+    return api
+
+
+def signed_request(api):
+    """
+    Remote procedure call for authenticated exchange operations
+    api         : dict signed by the parent, including "pipe" and "detail"
+    so module globals changed after the worker started still take effect
+    returns raw response bytes; the parent parses them exactly once
+    in PIPE debug mode the response is relayed via json_ipc and returns True
+    """
     # process the request
-    ret = requests.request(
+    ret = get_session(api).request(
         method=api["method"],
         url=api["url"] + api["endpoint"],
         data=api["data"],
         params=api["params"],
         headers=api["headers"],
+        timeout=TIMEOUT,
     )
-    response = ret.json()
     # print
-    if DETAIL:
+    if api["detail"]:
         pprint(
             {
                 "api": {
@@ -281,30 +317,29 @@ def signed_request(api, signal):
         print("ret json      ")
         pprint(ret.json())
     # interprocess communication
-    doc = (
-        api["exchange"]
-        + api["pair"]
-        + str(int(10 ** 6 * api["nonce"]))
-        + "_{}_private.txt".format(api["exchange"])
-    )
-    json_ipc(doc, json_dumps(response))
-    # signal multiprocessing handler to terminate
-    signal.value = 1
+    if api["pipe"]:
+        json_ipc(pipe_doc(api), ret.text)
+        # signal durability wrapper of completion
+        return True
+    return ret.content
 
 
-def process_request(api):
+def process_request(api, lane="market"):
     """
     Multiprocessing Durability Wrapper for External Requests
-    interprocess communication via durable text pipe
+    requests run on the long lived workers of the executor module
+    raw response bytes are handed back in memory and parsed once here
+    each attempt waits on the exchange rate limiter in the given lane
     """
     begin = time.time()
-    # multiprocessing completion signal
-    signal = Value("i", 0)
+    data = None
+    # completion signal
+    done = False
     # several iterations of external requests until satisfied with response
     i = 0
-    while (i < ATTEMPTS) and not signal.value:
-        # multiprocessing text file name nonce
-        api["nonce"] = time.time()
+    while (i < ATTEMPTS) and not done:
+        # request nonce; also names the text pipe in PIPE debug mode
+        api["nonce"] = next_nonce(api["exchange"])
         i += 1
         print("")
         print(
@@ -313,23 +348,18 @@ def process_request(api):
             time.ctime(),
             int(time.time()),
         )
-        child = Process(target=signed_request, args=(api, signal))
-        child.daemon = False
-        child.start()
-        child.join(TIMEOUT)
-        child.terminate()
-        time.sleep(i ** 2)
-    # the doc was created by the subprocess; read and destroy it
-    doc = (
-        api["exchange"]
-        + api["pair"]
-        + str(int(10 ** 6 * api["nonce"]))
-        + "_{}_private.txt".format(api["exchange"])
-    )
-    data = json_ipc(doc)
-    path = PATH + "pipe/"
-    if os.path.isfile(path + doc):
-        os.remove(path + doc)
+        try:
+            acquire(api, lane)
+            # sign a fresh copy per attempt; signing rewrites params and data
+            call = sign(dict(deepcopy(api), pipe=PIPE, detail=DETAIL))
+            raw = execute(signed_request, (call,), TIMEOUT)
+            # True means the worker relayed the response via json_ipc
+            data = pipe_pop(call) if raw is True else json_loads(raw)
+            done = True
+        except Exception as error:
+            print(trace(error))
+            # back off only after a failed attempt
+            time.sleep(i ** 2)
     print(
         "{} {} PRIVATE elapsed:".format(api["exchange"], api["pair"]),
         ("%.2f" % (time.time() - begin)),
@@ -338,20 +368,10 @@ def process_request(api):
     return data
 
 
-def get_balances(api):
+def balances_request(api):
     """
-    Normalized external requests for balances in market
-    {"asset_total": 0.0, "asset_free": 0.0, "asset_tied": 0.0,
-    "currency_total": 0.0, "currency_free": 0.0, "currency_tied": 0.0}
+    add balances endpoint, params and method to the api dict
     """
-
-    if DETAIL:
-        print(get_balances.__doc__, api["pair"])
-    else:
-        print("\nGet Balances", api["pair"])
-    asset, currency = api["pair"].split(":")
-    balances = {"asset": asset, "currency": currency}
-
     # format remote procedure call to exchange api standards
     if api["exchange"] == "coinbase":
         api["endpoint"] = "/accounts/"
@@ -381,6 +401,15 @@ def get_balances(api):
         api["endpoint"] = "/api/v1/accounts"
         api["params"] = {}
         api["method"] = "GET"
+    return api
+
+
+def balances_response(api, ret, orders=None):
+    """
+    normalize a balances response
+    kraken lacks free balances; pass its normalized open orders to derive them
+    """
+    asset, currency = api["pair"].split(":")
     balances = {
         "asset_total": 0,
         "asset_free": 0,
@@ -389,8 +418,6 @@ def get_balances(api):
         "currency_free": 0,
         "currency_tied": 0,
     }
-    # make external call
-    ret = process_request(api)
     # format json response to extinctionEVENT standard dictionary
     if api["exchange"] == "coinbase":
         # [{"currency": "BTC", "balance": "0.0", "available": "0.0", "hold": "0.0",
@@ -455,14 +482,10 @@ def get_balances(api):
         # and once you get there it lacks "free" balances
         # {"accounts":{"cash":{"balances":{"xbt":0,...}}}}
         # we fix this with a 2nd call to open orders to derive
-        api["params"] = {}
-        api["endpoint"] = "/0/private/OpenOrders"
-        api["method"] = "GET"
-        ret = get_orders(api)
-        kraken_ask_sum = ret["ask_sum"]
+        kraken_ask_sum = orders["ask_sum"]
         # bid sum will need to derived in currency terms
         kraken_bid_sum = 0
-        for i in ret["bids"]:
+        for i in orders["bids"]:
             kraken_bid_sum += i["price"] * i["current_qty"]
         kraken_bid_sum *= 1.000001  # account for available conservatively
         kraken_ask_sum = min(kraken_ask_sum, balances["asset_total"])
@@ -514,24 +537,34 @@ def get_balances(api):
                 "currency_free": float(currency_account["available"]),
                 "currency_tied": float(currency_account["holds"]),
             }
-    print(api["pair"], balances)
     return balances
 
 
-def get_orders(api):
+def get_balances(api):
     """
-    Normalized external requests for open orders in one market
-
-    normalized orders (sums in asset terms)
-    {"bids": {}, "asks": {}, "bid_sum": 0.0, "ask_sum": 0.0}
-
-    normalized bid or ask (qty in asset terms)
-    {"price": 0.0, "order_id": "", "start_qty": 0.0, "current_qty": 0.0}
+    Normalized external requests for balances in market
+    {"asset_total": 0.0, "asset_free": 0.0, "asset_tied": 0.0,
+    "currency_total": 0.0, "currency_free": 0.0, "currency_tied": 0.0}
     """
+
     if DETAIL:
-        print(get_orders.__doc__, api["pair"])
+        print(get_balances.__doc__, api["pair"])
     else:
-        print("\nGet Orders", api["pair"])
+        print("\nGet Balances", api["pair"])
+    balances_request(api)
+    # make external call
+    ret = process_request(api)
+    # kraken requires a 2nd call to open orders to derive free balances
+    orders = get_orders(api) if api["exchange"] == "kraken" else None
+    balances = balances_response(api, ret, orders)
+    print(api["pair"], balances)
+    return balances
+
+
+def orders_request(api):
+    """
+    add open orders endpoint, params and method to the api dict
+    """
     # format remote procedure call to exchange api standards
     api["symbol"] = symbol_syntax(api["exchange"], api["pair"])
     if api["exchange"] == "poloniex":
@@ -566,9 +599,13 @@ def get_orders(api):
             "symbol": api["symbol"],
         }
         api["method"] = "GET"
-    # make external call
-    ret = process_request(api)
-    print(ret)
+    return api
+
+
+def orders_response(api, ret):
+    """
+    normalize an open orders response
+    """
     # format response to extinctionEVENT standards
     bids = []
     asks = []
@@ -676,6 +713,27 @@ def get_orders(api):
     return orders
 
 
+def get_orders(api):
+    """
+    Normalized external requests for open orders in one market
+
+    normalized orders (sums in asset terms)
+    {"bids": {}, "asks": {}, "bid_sum": 0.0, "ask_sum": 0.0}
+
+    normalized bid or ask (qty in asset terms)
+    {"price": 0.0, "order_id": "", "start_qty": 0.0, "current_qty": 0.0}
+    """
+    if DETAIL:
+        print(get_orders.__doc__, api["pair"])
+    else:
+        print("\nGet Orders", api["pair"])
+    orders_request(api)
+    # make external call
+    ret = process_request(api)
+    print(ret)
+    return orders_response(api, ret)
+
+
 def post_orders(edicts, api):
     """
     wraps post_order() in a for to add a side key to the edict for buy/sell
@@ -689,9 +747,9 @@ def post_orders(edicts, api):
                 print(post_order(edict, api))
 
 
-def post_order(edict, api):
+def order_request(edict, api):
     """
-    POST Normalized Limit Order
+    add limit order endpoint, params and method for an edict to the api dict
     """
 
     def precision(num, places):
@@ -797,102 +855,151 @@ def post_order(edict, api):
         }
         api["endpoint"] = "/api/v1/orders"
         api["method"] = "POST"
+    return api
+
+
+def post_order(edict, api):
+    """
+    POST Normalized Limit Order
+    """
+    order_request(edict, api)
     # make external POST order call
-    ret = process_request(api)
+    ret = process_request(api, "order")
     return ret
 
 
-def delete_orders(api, order_ids=None):
+def open_order_ids(orders):
     """
-    DELETE all orders by api["pair"] (or) by symbol and order_id:
+    order ids of normalized open orders; asks then bids
     """
-    if DETAIL:
-        print(cancel.__doc__, "symbol", api["pair"], "order_ids", order_ids)
-    if order_ids is None:
-        order_ids = []  # must be a list
+    order_ids = []
+    for order in orders["asks"]:
+        order_ids.append(order["order_id"])
+    for order in orders["bids"]:
+        order_ids.append(order["order_id"])
+    return order_ids
+
+
+def cancel_requests(api, order_ids):
+    """
+    list of (order_id, api) remote procedure calls which cancel orders
+    order_id is None for a single call which cancels all in the market
+    exchanges without cancel all require order_ids; see open_order_ids()
+    """
+    if api["exchange"] not in [
+        "coinbase",
+        "poloniex",
+        "kucoin",
+        "kraken",
+        "binance",
+        "bittrex",
+    ]:
+        raise ValueError("%s order cancellation is not supported" % api["exchange"])
     # format remote procedure call to exchange api standards
     api["symbol"] = symbol_syntax(api["exchange"], api["pair"])
-    if not order_ids:
-        print("Cancel All")
-    else:
-        print("Cancel Order Ids:", order_ids)
+    calls = []
     # Coinbase and Poloniex offer both Cancel All and Cancel One
     if api["exchange"] in ["coinbase", "poloniex", "kucoin"]:
         if order_ids:
             # Cancel a list of orders
-            ret = []
             for order_id in order_ids:
-                print("Cancel Order", order_id)
+                call = dict(api)
                 if api["exchange"] == "coinbase":
-                    api["endpoint"] = "/orders/" + str(order_id)
-                    api["params"] = {}
-                    api["method"] = "DELETE"
+                    call["endpoint"] = "/orders/" + str(order_id)
+                    call["params"] = {}
+                    call["method"] = "DELETE"
                 elif api["exchange"] == "poloniex":
-                    api["endpoint"] = "/tradingApi"
-                    api["params"] = {
+                    call["endpoint"] = "/tradingApi"
+                    call["params"] = {
                         "command": "cancelOrder",
                         "orderNumber": int(order_id),
                     }
-                    api["method"] = "POST"
+                    call["method"] = "POST"
                 elif api["exchange"] == "kucoin":
-                    api["endpoint"] = f"/api/v1/orders/{order_id}"
-                    api["params"] = None
-                    api["method"] = "DELETE"
-                response = process_request(api)
-                ret.append({"order_id": order_id, "response": response})
+                    call["endpoint"] = f"/api/v1/orders/{order_id}"
+                    call["params"] = None
+                    call["method"] = "DELETE"
+                calls.append((order_id, call))
         else:
             # Cancel All
+            call = dict(api)
             if api["exchange"] == "coinbase":
-                api["endpoint"] = "/orders"
-                api["params"] = {"product_id": api["symbol"]}
-                api["method"] = "DELETE"
+                call["endpoint"] = "/orders"
+                call["params"] = {"product_id": api["symbol"]}
+                call["method"] = "DELETE"
             elif api["exchange"] == "poloniex":
-                api["endpoint"] = "/tradingApi"
-                api["params"] = {
+                call["endpoint"] = "/tradingApi"
+                call["params"] = {
                     "command": "cancelAllOrders",
                     "currencyPair": api["symbol"],
                 }
-                api["method"] = "POST"
+                call["method"] = "POST"
             if api["exchange"] == "kucoin":
-                api["endpoint"] = "/api/v1/orders"
-                api["params"] = {"symbol": api["symbol"]}
-                api["method"] = "DELETE"
-            ret = process_request(api)
+                call["endpoint"] = "/api/v1/orders"
+                call["params"] = {"symbol": api["symbol"]}
+                call["method"] = "DELETE"
+            calls.append((None, call))
 
     # Handle cases where "Cancel All" in one market is not supported
-    elif api["exchange"] in ["kraken", "binance", "bittrex", "Bitfinex"]:
-        # If we have an order_ids list we"ll use it, else make one
-        if not order_ids:
-            print("Open Orders call to suppport Cancel All")
-            orders = get_orders(api)
-            order_ids = []
-            for order in orders["asks"]:
-                order_ids.append(order["order_id"])
-            for order in orders["bids"]:
-                order_ids.append(order["order_id"])
-        ret = []
+    elif api["exchange"] in ["kraken", "binance", "bittrex"]:
         for order_id in order_ids:
-            print("Cancel Order", order_id)
-            if api["exchange"] == "bitfinex":
-                api["endpoint"] = "/v2/auth/w/order/cancel"
-                api["params"] = {"id": order_id}
-                api["method"] = "FIXME"  # FIXME
-            elif api["exchange"] == "binance":
-                api["endpoint"] = "/api/v3/order"
-                api["params"] = {"symbol": api["symbol"], "orderId": order_id}
-                api["method"] = "DELETE"
+            call = dict(api)
+            if api["exchange"] == "binance":
+                call["endpoint"] = "/api/v3/order"
+                call["params"] = {"symbol": api["symbol"], "orderId": order_id}
+                call["method"] = "DELETE"
             elif api["exchange"] == "bittrex":
-                api["endpoint"] = "/api/v1.1/market/cancel"
-                api["params"] = {"uuid": order_id}
-                api["method"] = "GET"
+                call["endpoint"] = "/api/v1.1/market/cancel"
+                call["params"] = {"uuid": order_id}
+                call["method"] = "GET"
             elif api["exchange"] == "kraken":
-                api["endpoint"] = "/0/private/CancelOrder"
-                api["params"] = {"txid": order_id}
-                api["method"] = "POST"
-            response = process_request(api)
-            ret.append(response)
+                call["endpoint"] = "/0/private/CancelOrder"
+                call["params"] = {"txid": order_id}
+                call["method"] = "POST"
+            calls.append((order_id, call))
 
-    return ret
+    return calls
+
+
+def cancel_response(api, calls, responses):
+    """
+    collate cancel responses: raw for cancel all, else one per order id
+    """
+    if calls and calls[0][0] is None:
+        return responses[0]
+    if api["exchange"] in ["coinbase", "poloniex", "kucoin"]:
+        return [
+            {"order_id": order_id, "response": response}
+            for (order_id, _), response in zip(calls, responses)
+        ]
+    return responses
+
+
+def delete_orders(api, order_ids=None):
+    """
+    DELETE all orders by api["pair"] (or) by symbol and order_id:
+    """
+    if DETAIL:
+        print(delete_orders.__doc__, "symbol", api["pair"], "order_ids", order_ids)
+    if order_ids is None:
+        order_ids = []  # must be a list
+    if not order_ids:
+        print("Cancel All")
+    else:
+        print("Cancel Order Ids:", order_ids)
+    # If we have an order_ids list we"ll use it, else make one
+    one_by_one = api["exchange"] in ["kraken", "binance", "bittrex"]
+    if one_by_one and not order_ids:
+        print("Open Orders call to suppport Cancel All")
+        order_ids = open_order_ids(get_orders(api))
+    calls = cancel_requests(api, order_ids)
+    responses = []
+    for order_id, call in calls:
+        if order_id is not None:
+            print("Cancel Order", order_id)
+        responses.append(process_request(call, "order"))
+
+    return cancel_response(api, calls, responses)
 
 
 def authenticate(api):
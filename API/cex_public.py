@@ -12,24 +12,160 @@ litepresence 2019
 # STANDARD MODULES
 import os
 import time
-from json import dumps as json_dumps
+from concurrent.futures import ThreadPoolExecutor
+import re
+from json import JSONDecoder
+from json import loads as json_loads
 from math import ceil
-from multiprocessing import Process, Value
 from pprint import pprint
 
 # THIRD PARTY MODULES
 import numpy as np
-import requests
 
 # CEX MODULES
-from utilities import (from_iso_date, json_ipc, symbol_syntax, to_iso_date,
-                       trace)
+from cache import TTLS, cache_call, candle_ttl
+import candle_store
+from coalesce import single_flight
+from executor import execute
+from rate_limit import acquire
+from resample import native_interval, resample, resample_chunks
+from sessions import get_session, pool_prewarm
+from utilities import (from_iso_dates, json_ipc, pipe_doc, pipe_pop,
+                       symbol_syntax, to_iso_date, trace)
 
 # GLOBAL USER DEFINED CONSTANTS
 TIMEOUT = 30
 ATTEMPTS = 10
+PAGES = 8  # concurrent candle pages per get_candles() call
+CHUNK = 10000  # candles per chunk yielded by iter_candles()
+PAGE_ATTEMPTS = 3  # per candle page, on top of the retries of process_request
+# a page of candles is an (n, 6) float64 array with these columns
+COLUMNS = ["high", "low", "open", "close", "volume", "unix"]
+# row oriented candle responses: raw index of each of COLUMNS, unix divisor
+ROWS = {
+    "bitfinex": ([3, 4, 1, 2, 5, 0], 1000),  # [mts, o, c, h, l, v]
+    "binance": ([2, 3, 1, 4, 5, 6], 1000),  # [open mts, o, h, l, c, v, close mts]
+    "coinbase": ([2, 1, 3, 4, 5, 0], 1),  # [t, l, h, o, c, v]
+    "kraken": ([2, 3, 1, 4, 6, 0], 1),  # [t, o, h, l, c, vwap, v, count]
+    "kucoin": ([3, 4, 1, 2, 5, 0], 1),  # [t, o, c, h, l, v, turnover]
+}
+# {exchange: {native candle interval in seconds: exchange parameter}}
+# get_candles() resamples any multiple of these; see resample.py
+INTERVALS = {
+    "bittrex": {
+        60: "oneMin",
+        300: "fiveMin",
+        1800: "thirtyMin",
+        3600: "hour",
+        86400: "day",
+    },
+    "bitfinex": {
+        60: "1m",
+        300: "5m",
+        900: "15m",
+        1800: "30m",
+        3600: "1h",
+        10800: "3h",
+        21600: "6h",
+        43200: "12h",
+        86400: "1D",
+        604800: "7D",
+        1209600: "14D",
+        2419200: "1M",
+    },
+    "binance": {
+        60: "1m",
+        180: "3m",
+        300: "5m",
+        900: "15m",
+        1800: "30m",
+        3600: "1h",
+        14400: "4h",
+        21600: "6h",
+        28800: "8h",
+        43200: "12h",
+        86400: "1d",
+        604800: "1w",
+        2419200: "1M",
+    },
+    "poloniex": {
+        300: 300,
+        900: 900,
+        1800: 1800,
+        7200: 7200,
+        14400: 14400,
+        86400: 86400,
+    },
+    "coinbase": {
+        60: 60,
+        300: 300,
+        900: 900,
+        3600: 3600,
+        21600: 21600,
+        86400: 86400,
+    },
+    "kraken": {
+        60: 1,
+        300: 5,
+        900: 15,
+        1800: 30,
+        3600: 60,
+        14400: 240,
+        86400: 1440,
+        604800: 10080,
+        2419200: 21600,
+    },
+    "kucoin": {
+        60: "1min",
+        180: "3min",
+        300: "5min",
+        900: "15min",
+        1800: "30min",
+        3600: "1hour",
+        7200: "2hour",
+        14400: "4hour",
+        21600: "6hour",
+        28800: "8hour",
+        43200: "12hour",
+        86400: "1day",
+        604800: "1week",
+    },
+}
+# dict oriented candle responses: raw key of each of COLUMNS
+KEYS = {
+    "bittrex": ["H", "L", "O", "C", "V", "T"],
+    "poloniex": ["high", "low", "open", "close", "quoteVolume", "date"],
+}
+# depth limits the exchange accepts for a book; the smallest one >= depth
+BOOK_LIMITS = {
+    "binance": [5, 10, 20, 50, 100, 500, 1000, 5000],
+    "bitfinex": [1, 25, 100],
+}
+# (wrapper, bids, asks) keys of the books book_json() decodes only to depth
+# these have no depth parameter, or coarse ones; see book_levels()
+BOOK_SIDES = {
+    "bittrex": ("result", "buy", "sell"),
+    "coinbase": (None, "bids", "asks"),
+    "kucoin": ("data", "bids", "asks"),
+}
+DECODER = JSONDecoder()
+# (exchange, pair, depth): buffer filled by get_book(out=True)
+BUFFERS = {}
+WHITESPACE = re.compile(r"[ \t\n\r]*")
 PATH = str(os.path.dirname(os.path.abspath(__file__))) + "/"
 DETAIL = False
+PIPE = False  # debug: relay responses through human readable json_ipc *.txt
+# exchanges with an all markets or multi pair ticker; see get_prices()
+BATCH = ["bittrex", "bitfinex", "binance", "poloniex", "kraken", "kucoin"]
+URLS = {
+    "coinbase": "https://api.pro.coinbase.com",
+    "bittrex": "https://bittrex.com",
+    "bitfinex": "https://api-pub.bitfinex.com",
+    "kraken": "https://api.kraken.com",
+    "poloniex": "https://www.poloniex.com",
+    "binance": "https://api.binance.com",
+    "kucoin": "https://api.kucoin.com",
+}
 
 # READ ME
 def read_me():
@@ -54,7 +190,7 @@ def read_me():
     procedural Python - no class objects
     external requests multiprocess wrapped
     architecture sorted by call type
-    human readable interprocess communication via *.txt
+    in memory interprocess communication; human readable *.txt for debug
     easy to compare exchange parameters
 
     EXCHANGE RANKINGS
@@ -101,46 +237,46 @@ def api_docs():
     print(api_docs.__doc__)
 
 
-# SUBPROCESS REMOTE PROCEDURE CALL
-def request(api, signal):
+def prepare(api):
     """
-    GET remote procedure call to public exchange API
+    add GET method, base url and blank credentials to the api dict
+    shared by the sync and async remote procedure calls
     """
-    urls = {
-        "coinbase": "https://api.pro.coinbase.com",
-        "bittrex": "https://bittrex.com",
-        "bitfinex": "https://api-pub.bitfinex.com",
-        "kraken": "https://api.kraken.com",
-        "poloniex": "https://www.poloniex.com",
-        "binance": "https://api.binance.com",
-        "kucoin": "https://api.kucoin.com",
-    }
-
     api["method"] = "GET"
     api["headers"] = {}
     api["data"] = ""
     api["key"] = ""
     api["passphrase"] = ""
     api["secret"] = ""
-    api["url"] = urls[api["exchange"]]
+    api["url"] = URLS[api["exchange"]]
+    return api
+
 
+# SUBPROCESS REMOTE PROCEDURE CALL
+def request(api):
+    """
+    GET remote procedure call to public exchange API
+    the parent has already prepared the call and set its "pipe" and "detail"
+    so module globals changed after the worker started still take effect
+    returns raw response bytes; the parent parses them exactly once
+    in PIPE debug mode the response is relayed via json_ipc and returns True
+    """
     url = api["url"] + api["endpoint"]
-    if DETAIL:
+    if api["detail"]:
         print(api)
         print(url)
-    time.sleep(1)
     # /api/v1/market/orderbook/level1?symbol=BTC-USDT
 
-    resp = requests.request(
+    resp = get_session(api).request(
         method=api["method"],
         url=url,
         data=api["data"],
         params=api["params"],
         headers=api["headers"],
+        timeout=TIMEOUT,
     )
-    data = resp.json()
-
-    if DETAIL:
+    if api["detail"]:
+        data = resp.json()
         print(resp)
         print(data)
         if isinstance(data, dict):
@@ -152,28 +288,28 @@ def request(api, signal):
         else:
             print(data)
         print("len request data", len(data))
-    doc = (
-        api["exchange"]
-        + api["pair"]
-        + str(int(10 ** 6 * api["nonce"]))
-        + "_{}_private.txt".format(api["exchange"])
-    )
-    json_ipc(doc, json_dumps(data))
-    signal.value = 1
+    if api["pipe"]:
+        json_ipc(pipe_doc(api), resp.text)
+        return True
+    return resp.content
 
 
-def process_request(api):
+def process_request(api, lane="market", parse=json_loads):
     """
     Multiprocessing Durability Wrapper for External Requests
-    interprocess communication via durable text pipe
+    requests run on the long lived workers of the executor module
+    raw response bytes are handed back in memory and parsed once here
+    by parse(), json_loads() unless the caller needs less of the response
+    each attempt waits on the exchange rate limiter in the given lane
     """
     begin = time.time()
-    # multiprocessing completion signal
-    signal = Value("i", 0)
+    data = None
+    # completion signal
+    done = False
     # several iterations of external requests until satisfied with response
     i = 0
-    while (i < ATTEMPTS) and not signal.value:
-        # multiprocessing text file name nonce
+    while (i < ATTEMPTS) and not done:
+        # request nonce; also names the text pipe in PIPE debug mode
         api["nonce"] = time.time()
         i += 1
         if DETAIL:
@@ -184,23 +320,17 @@ def process_request(api):
                 time.ctime(),
                 int(time.time()),
             )
-        child = Process(target=request, args=(api, signal))
-        child.daemon = False
-        child.start()
-        child.join(TIMEOUT)
-        child.terminate()
-        time.sleep(i ** 2)
-    # the doc was created by the subprocess; read and destroy it
-    doc = (
-        api["exchange"]
-        + api["pair"]
-        + str(int(10 ** 6 * api["nonce"]))
-        + "_{}_private.txt".format(api["exchange"])
-    )
-    data = json_ipc(doc)
-    path = PATH + "pipe/"
-    if os.path.isfile(path + doc):
-        os.remove(path + doc)
+        try:
+            acquire(api, lane)
+            call = prepare(dict(api, pipe=PIPE, detail=DETAIL))
+            raw = execute(request, (call,), TIMEOUT)
+            # True means the worker relayed the response via json_ipc
+            data = pipe_pop(call) if raw is True else parse(raw)
+            done = True
+        except Exception as error:
+            print(trace(error))
+            # back off only after a failed attempt
+            time.sleep(i ** 2)
     if DETAIL:
         print(
             "{} {} PUBLIC elapsed:".format(api["exchange"], api["pair"]),
@@ -210,12 +340,22 @@ def process_request(api):
     return data
 
 
+def warm_up(exchanges=None):
+    """
+    open keep-alive connections to public exchange apis in every worker
+    so the first trading call does not pay DNS, TCP and TLS handshakes
+    """
+    if exchanges is None:
+        exchanges = list(URLS)
+    return pool_prewarm({k: URLS[k] for k in exchanges})
+
+
 # METHODS
 
 
-def get_price(api):
+def price_request(api):
     """
-    Last Price as float
+    add last price endpoint and params to the api dict
     """
     exchange = api["exchange"]
     symbol = symbol_syntax(exchange, api["pair"])
@@ -239,27 +379,55 @@ def get_price(api):
     }
     api["endpoint"] = endpoints[exchange]
     api["params"] = params[exchange]
+    return api
+
+
+def price_response(api, data):
+    """
+    normalize a last price response to float
+    """
+    exchange = api["exchange"]
+    symbol = symbol_syntax(exchange, api["pair"])
+    if exchange == "bittrex":
+        last = float(data["result"]["Last"])
+    elif exchange == "bitfinex":
+        last = float(data[6])
+    elif exchange == "binance":
+        data = {d["symbol"]: float(d["price"]) for d in data}
+        last = data[symbol]
+    elif exchange == "poloniex":
+        last = float(data[symbol]["last"])
+    elif exchange == "coinbase":
+        last = float(data["price"])
+    elif exchange == "kraken":
+        data = data["result"]
+        data = data[list(data)[0]]
+        last = float(data["c"][0])
+    elif exchange == "kucoin":
+        last = float(data["data"]["price"])
+    return last
+
+
+def get_price(api, cache=None):
+    """
+    Last Price as float
+    identical concurrent calls share one request; see coalesce.py
+    cache=True, False or "stale" overrides cache.CACHE; see cache.py
+    """
+    key = ("price", api["exchange"], api["pair"])
+    return cache_call(key, TTLS["price"], cache, single_flight, key, fetch_price, api)
+
+
+def fetch_price(api):
+    """
+    Last Price as float; always makes its own request
+    """
+    price_request(api)
     while 1:
 
         try:
             data = process_request(api)
-            if exchange == "bittrex":
-                last = float(data["result"]["Last"])
-            elif exchange == "bitfinex":
-                last = float(data[6])
-            elif exchange == "binance":
-                data = {d["symbol"]: float(d["price"]) for d in data}
-                last = data[symbol]
-            elif exchange == "poloniex":
-                last = float(data[symbol]["last"])
-            elif exchange == "coinbase":
-                last = float(data["price"])
-            elif exchange == "kraken":
-                data = data["result"]
-                data = data[list(data)[0]]
-                last = float(data["c"][0])
-            elif exchange == "kucoin":
-                last = float(data["data"]["price"])
+            last = price_response(api, data)
         except Exception as error:
             print(trace(error), {k: v for k, v in api.items() if k != "secret"})
         break
@@ -267,16 +435,98 @@ def get_price(api):
     return last
 
 
-def get_book(api, depth=10):
+def prices_request(api, pairs):
     """
-    Depth of Market format:
+    add an all markets or multi pair ticker endpoint and params to the api dict
+    """
+    exchange = api["exchange"]
+    symbols = [symbol_syntax(exchange, pair) for pair in pairs]
+    endpoints = {
+        "bittrex": "/api/v1.1/public/getmarketsummaries",
+        "bitfinex": "/v2/tickers",
+        "binance": "/api/v1/ticker/allPrices",
+        "poloniex": "/public",
+        "kraken": "/0/public/Ticker",
+        "kucoin": "/api/v1/market/allTickers",
+    }
+    params = {
+        "bittrex": {},
+        "bitfinex": {"symbols": ",".join("t" + symbol for symbol in symbols)},
+        "binance": {},
+        "poloniex": {"command": "returnTicker"},
+        "kraken": {"pair": ",".join(symbols)},
+        "kucoin": {},
+    }
+    api["endpoint"] = endpoints[exchange]
+    api["params"] = params[exchange]
+    return api
 
-    {"bidv": [], "bidp": [], "askp": [], "askv": []}
+
+def kraken_symbol(key):
+    """
+    kraken result key to our kraken syntax; ie XLTCXXBT to ltcxbt
+    """
+    if len(key) == 8 and key[0] in "XZ" and key[4] in "XZ":
+        key = key[1:4] + key[5:]
+    return key.lower()
+
+
+def prices_response(api, data, pairs):
+    """
+    normalize an all markets or multi pair ticker to {pair: float}
+    pairs missing from the response are None
+    """
+    exchange = api["exchange"]
+    if exchange == "bittrex":
+        data = {d["MarketName"]: d["Last"] for d in data["result"]}
+    elif exchange == "bitfinex":
+        data = {d[0][1:]: d[7] for d in data}
+    elif exchange == "binance":
+        data = {d["symbol"]: d["price"] for d in data}
+    elif exchange == "poloniex":
+        data = {k: v["last"] for k, v in data.items()}
+    elif exchange == "kraken":
+        data = {kraken_symbol(k): v["c"][0] for k, v in data["result"].items()}
+    elif exchange == "kucoin":
+        data = {d["symbol"]: d["last"] for d in data["data"]["ticker"]}
+    prices = {}
+    for pair in pairs:
+        last = data.get(symbol_syntax(exchange, pair))
+        prices[pair] = None if last is None else float(last)
+    return prices
+
+
+def get_prices(api, pairs):
+    """
+    Last Price of many pairs at one exchange as {pair: float}
+    one request where the exchange offers an all markets or multi pair ticker
+    else concurrent get_price() calls; pairs missing at the exchange are None
+    """
+    pairs = list(pairs)
+    if api["exchange"] in BATCH:
+        prices_request(api, pairs)
+        return prices_response(api, process_request(api), pairs)
+
+    def price(pair):
+        # a pair the exchange does not list fails alone, as in the batch
+        try:
+            return get_price(dict(api, pair=pair))
+        except Exception as error:
+            print(trace(error), api["exchange"], pair)
+            return None
+
+    with ThreadPoolExecutor(max(len(pairs), 1)) as pool:
+        return dict(zip(pairs, pool.map(price, pairs)))
+
+
+def book_request(api, depth=50):
+    """
+    add order book endpoint and params to the api dict
+    asks for no more than depth levels per side where the exchange can
     """
     exchange = api["exchange"]
     symbol = symbol_syntax(exchange, api["pair"])
-    if depth > 50:
-        depth = 50
+    levels = book_levels(exchange, depth)
 
     endpoints = {
         "bittrex": "/api/v1.1/public/getorderbook",
@@ -285,78 +535,258 @@ def get_book(api, depth=10):
         "poloniex": "/public",
         "coinbase": "/products/{}/book".format(symbol),
         "kraken": "/0/public/Depth",
-        "kucoin": "/api/v1/market/orderbook/level2_100",
+        "kucoin": "/api/v1/market/orderbook/level2_%s" % levels,
     }
     params = {
         "bittrex": {"market": symbol, "type": "both"},
-        "bitfinex": {"len": 100},
-        "binance": {"symbol": symbol},
-        "poloniex": {"command": "returnOrderBook", "currencyPair": symbol},
-        "coinbase": {"level": 2},
-        "kraken": {"pair": symbol, "count": "50"},
+        "bitfinex": {"len": levels},
+        "binance": {"symbol": symbol, "limit": levels},
+        "poloniex": {
+            "command": "returnOrderBook",
+            "currencyPair": symbol,
+            "depth": depth,
+        },
+        # level 1 is the best bid and ask only; level 2 the best 50 of each
+        "coinbase": {"level": 1 if levels == 1 else 2},
+        "kraken": {"pair": symbol, "count": str(depth)},
         "kucoin": {"symbol": symbol},
     }
     api["endpoint"] = endpoints[exchange]
     api["params"] = params[exchange]
+    return api
+
+
+def book_levels(exchange, depth):
+    """
+    levels per side a book request for depth levels brings back
+    None where the exchange always sends the whole book
+    """
+    if exchange in BOOK_LIMITS:
+        limits = BOOK_LIMITS[exchange]
+        return min([limit for limit in limits if limit >= depth] or limits[-1:])
+    levels = {
+        "bittrex": None,
+        "poloniex": depth,
+        "coinbase": 1 if depth == 1 else 50,
+        "kraken": depth,
+        "kucoin": 20 if depth <= 20 else 100,
+    }
+    return levels[exchange]
+
+
+def book_json(exchange, raw, depth):
+    """
+    json_loads() of a book response, but each side only to depth levels
+    levels arrive best first; the rest are skipped, never decoded
+    anything unexpected, an error message say, is decoded in full
+    so is a book of not many more levels than depth; a level decoded on its
+    own costs about three decoded by json_loads(), which is faster there
+    """
+    levels = book_levels(exchange, depth)
+    if exchange not in BOOK_SIDES or (levels is not None and 3 * depth > levels):
+        return json_loads(raw)
+    text = raw.decode() if isinstance(raw, bytes) else raw
+    wrapper, *sides = BOOK_SIDES[exchange]
+    book = {}
+    for side in sides:
+        book[side] = first_levels(text, side, depth)
+        if book[side] is None:
+            return json_loads(raw)
+    return {wrapper: book} if wrapper else book
+
+
+def first_levels(text, key, depth):
+    """
+    the first depth items of the json array under "key" in text
+    None if there is no such array
+    """
+    index = text.find('"%s"' % key)
+    if index < 0:
+        return None
+    index = WHITESPACE.match(text, index + len(key) + 2).end()
+    if text[index : index + 1] != ":":
+        return None
+    index = WHITESPACE.match(text, index + 1).end()
+    if text[index : index + 1] != "[":
+        return None
+    levels = []
+    while len(levels) < depth:
+        index = WHITESPACE.match(text, index + 1).end()
+        if text[index] == "]":
+            break
+        level, index = DECODER.raw_decode(text, index)
+        levels.append(level)
+        # index is now on the comma or closing bracket after the level
+        index = WHITESPACE.match(text, index).end()
+        if text[index] == "]":
+            break
+    return levels
+
+
+def book_sides(exchange, data):
+    """
+    (bids, asks) of a book response, each an iterator of (price, volume)
+    """
+    if exchange == "kraken":
+        data = data["result"]
+        data = data[list(data)[0]]
+    if exchange == "bittrex":
+        data = data["result"]
+    if exchange == "kucoin":
+        data = data["data"]
+    if exchange == "bittrex":
+        # {"buy": [{"Quantity":, "Rate":},...,],
+        #  "sell": [{"Quantity":, "Rate":},...,]}
+        return (
+            ((item["Rate"], item["Quantity"]) for item in data["buy"]),
+            ((item["Rate"], item["Quantity"]) for item in data["sell"]),
+        )
+    if exchange == "bitfinex":
+        # [[,,],[,,],[,,]] # asks negative volume
+        return (
+            ((item[0], item[2]) for item in data if item[2] > 0),
+            ((item[0], -item[2]) for item in data if not item[2] > 0),
+        )
+    # {"bids" [[,],[,],[,]], "asks": [[,],[,],[,]]}
+    return (
+        ((item[0], item[1]) for item in data["bids"]),
+        ((item[0], item[1]) for item in data["asks"]),
+    )
+
+
+def book_response(api, data, depth):
+    """
+    normalize an order book response to depth of market format
+    """
+    bids, asks = book_sides(api["exchange"], data)
+
+    # convert books to unified format
+    book = {"bidv": [], "bidp": [], "askp": [], "askv": []}
+    for price, volume in bids:
+        book["bidv"].append(float(volume))
+        book["bidp"].append(float(price))
+    for price, volume in asks:
+        book["askv"].append(float(volume))
+        book["askp"].append(float(price))
+
+    # normalize lowest ask and highest bid to [0] position; standardize depth
+    # sorted by price then volume, as sorted(zip(price, volume)) would
+    book = {k: np.array(v) for k, v in book.items()}
+    bids = np.lexsort((book["bidv"], book["bidp"]))[::-1][:depth]
+    asks = np.lexsort((book["askv"], book["askp"]))[:depth]
+    book = {
+        "bidv": book["bidv"][bids],
+        "bidp": book["bidp"][bids],
+        "askp": book["askp"][asks],
+        "askv": book["askv"][asks],
+    }
+    if DETAIL:
+        print("total bids:", len(book["bidp"]))
+        print("total asks:", len(book["askp"]))
+    return book
+
+
+def get_book(api, depth=10, cache=None, out=None):
+    """
+    Depth of Market format:
+
+    {"bidv": [], "bidp": [], "askp": [], "askv": []}
+
+    also the snapshot an order_book.py book starts from or is reset to
+    out=True fills the buffer kept for (exchange, pair, depth) in place,
+    out=book_buffer(depth) fills that one; see book_fill()
+    a buffer is always a fresh request; the cache never holds one
+    """
+    if depth > 50:
+        depth = 50
+    if out is not None:
+        return fetch_book(api, depth, kept_buffer(api, depth) if out is True else out)
+    key = ("book", api["exchange"], api["pair"], depth)
+    ttl = TTLS["book"]
+    return cache_call(key, ttl, cache, single_flight, key, fetch_book, api, depth)
+
+
+def book_buffer(depth):
+    """
+    fixed capacity Depth of Market arrays and the levels filled per side
+    {"bidv", "bidp", "askp", "askv": arrays NaN past the count,
+     "bids": int, "asks": int}
+    """
+    buffer = {key: np.full(depth, np.nan) for key in ["bidv", "bidp", "askp", "askv"]}
+    buffer.update({"bids": 0, "asks": 0})
+    return buffer
+
+
+def kept_buffer(api, depth):
+    """
+    the buffer get_book(out=True) fills for (exchange, pair, depth)
+    one per key; threads polling the same book pass their own instead
+    """
+    key = (api["exchange"], api["pair"], depth)
+    buffer = BUFFERS.get(key)
+    if buffer is None:
+        buffer = BUFFERS.setdefault(key, book_buffer(depth))
+    return buffer
+
+
+def book_fill(api, data, depth, out):
+    """
+    book_response() written into the arrays of a book_buffer(); no new arrays
+    levels arrive best first; a book which does not is normalized as usual
+    by book_response() and copied in
+    """
+    bids, asks = book_sides(api["exchange"], data)
+    out["bids"] = fill_side(bids, out["bidp"], out["bidv"], depth, -1)
+    out["asks"] = fill_side(asks, out["askp"], out["askv"], depth, 1)
+    if out["bids"] is None or out["asks"] is None:
+        book = book_response(api, data, min(depth, len(out["bidp"])))
+        for key, values in book.items():
+            out[key][: len(values)] = values
+            out[key][len(values) :] = np.nan
+        out["bids"], out["asks"] = len(book["bidp"]), len(book["askp"])
+    return out
+
+
+def fill_side(levels, prices, volumes, depth, sign):
+    """
+    write the first depth (price, volume) levels in place; sign is -1 when
+    prices descend from the best, as bids do
+    the number of levels written; None if they were not strictly in order
+    """
+    depth = min(depth, len(prices))
+    # items of a memoryview are set faster than those of the array itself
+    price_view, volume_view = memoryview(prices), memoryview(volumes)
+    count, last = 0, None
+    for price, volume in levels:
+        if count == depth:
+            break
+        price = float(price)
+        if count and sign * price <= sign * last:
+            return None
+        price_view[count] = last = price
+        volume_view[count] = float(volume)
+        count += 1
+    prices[count:] = np.nan
+    volumes[count:] = np.nan
+    return count
+
+
+def fetch_book(api, depth, out=None):
+    """
+    Depth of Market; always makes its own request
+    filled into out in place when given
+    """
+    book_request(api, depth)
 
     while 1:
         try:
-            data = process_request(api)
-            if exchange == "kraken":
-                data = data["result"]
-                data = data[list(data)[0]]
-            if exchange == "bittrex":
-                data = data["result"]
-            if exchange == "kucoin":
-                data = data["data"]
-
-            # convert books to unified format
-            book = {"bidv": [], "bidp": [], "askp": [], "askv": []}
-            if exchange in ["binance", "poloniex", "coinbase", "kraken", "kucoin"]:
-                # {"bids" [[,],[,],[,]], "asks": [[,],[,],[,]]}
-                for i in range(len(data["bids"])):
-                    book["bidv"].append(float(data["bids"][i][1]))
-                    book["bidp"].append(float(data["bids"][i][0]))
-                for i in range(len(data["asks"])):
-                    book["askv"].append(float(data["asks"][i][1]))
-                    book["askp"].append(float(data["asks"][i][0]))
-            elif exchange == "bittrex":
-                # {"bids": [{Quantity:, "Rate"},...,],
-                #  "asks": [{Quantity:, "Rate"},...,]}
-                for _, item in enumerate(data["buy"]):
-                    book["bidv"].append(float(item["Quantity"]))
-                    book["bidp"].append(float(item["Rate"]))
-                for _, item in enumerate(data["sell"]):
-                    book["askv"].append(float(item["Quantity"]))
-                    book["askp"].append(float(item["Rate"]))
-            elif exchange == "bitfinex":
-                # [[,,],[,,],[,,]] # bids negative volume
-                for _, item in enumerate(data):
-                    if item[2] > 0:
-                        book["bidv"].append(float(item[2]))
-                        book["bidp"].append(float(item[0]))
-                    else:
-                        book["askv"].append(-float(item[2]))
-                        book["askp"].append(float(item[0]))
-                # book = {k:v[::-1] for k, v in book.items()}
-
-            # normalize lowest ask and highest bid to [0] position
-            book["bidv"] = [v for p, v in sorted(zip(book["bidp"], book["bidv"]))]
-            book["askv"] = [v for p, v in sorted(zip(book["askp"], book["askv"]))]
-            book["bidp"] = sorted(book["bidp"])
-            book["askp"] = sorted(book["askp"])
-            book["bidv"] = book["bidv"][::-1]
-            book["bidp"] = book["bidp"][::-1]
-            # standardize book depth
-            book["bidv"] = book["bidv"][:depth]
-            book["bidp"] = book["bidp"][:depth]
-            book["askv"] = book["askv"][:depth]
-            book["askp"] = book["askp"][:depth]
-
-            book = {k: np.array(v) for k, v in book.items()}
-            if DETAIL:
-                print("total bids:", len(book["bidp"]))
-                print("total asks:", len(book["askp"]))
+            data = process_request(
+                api, parse=lambda raw: book_json(api["exchange"], raw, depth)
+            )
+            if out is None:
+                book = book_response(api, data, depth)
+            else:
+                book = book_fill(api, data, depth, out)
         except Exception as error:
             print(trace(error), {k: v for k, v in api.items() if k != "secret"})
         break
@@ -364,234 +794,48 @@ def get_book(api, depth=10):
     return book
 
 
-def get_candles(api, start=None, end=None, interval=86400):
+def get_candles(
+    api, start=None, end=None, interval=86400, cache=None, store=None, dtype=None
+):
     """
     input and output normalized requests for candle data
     returns a dict with numpy array values for the following keys
     ["high", "low", "open", "close", "volume", "unix"]
     where unix is int and the remainder are float
     this is the ideal format for utilizing talib / tulip indicators
+    dtype="structured" returns one structured array with those fields
+    instead of a dict
     """
+    key = ("candles", api["exchange"], api["pair"], start, end, interval)
+    ttl = candle_ttl(end, interval)
+    data = cache_call(
+        key, ttl, cache, fetch_candles, api, start, end, interval, store
+    )
+    return candle_dtype(data, dtype)
 
-    def paginate_candles(api, start, end, interval):
-        """
-        paginate requests per maximum request size per exchange
-        collate responses crudely with overlap
-
-        # USE FOR EDGE MATCHING DEV
-        max_candles = {
-            "bittrex": 100,
-            "bitfinex": 100,
-            "binance": 100,
-            "poloniex": 100,
-            "coinbase": 100,
-            "kraken": 100,
-            "kucoin": 100,
-        }
-        """
-        max_candles = {
-            "bittrex": 1000,  # 1000
-            "bitfinex": 10000,  # 10000
-            "binance": 500,  # 1000
-            "poloniex": 2000,
-            "coinbase": 300,  # 300
-            "kraken": 200,  # 200
-            "kucoin": 1500,  # 1500
-        }
-        overlap = 2
-        # fetch the max candles at this exchange
-        max_candles = max_candles[exchange] - (2 * overlap + 1)
-        # define the maximum exchange window in seconds
-        window = int(max_candles * interval)
-        # determine number of candles we require
-        depth = int(ceil((end - deep_begin) / float(interval)))
-        # determine number of calls required to get those candles
-        calls = int(max(ceil(depth / float(max_candles)), 1))
-        # pagination and crude collation
-        stop = end
-        if calls > 1:
-            data = []
-            for call in range(calls, 0, -1):
-                # overlap on each end
-                end = stop - ((call - 1) * window) + (overlap * interval)
-                start = stop - (call * window) - (overlap * interval)
-                print("call", call, "/", calls, start, end)
-                datum = candles(api, start, end, interval)
-                time.sleep(1)
-                data += datum
-        # single request
-        else:
-            data = candles(api, deep_begin, end, interval)
-
-        return data
-
-    def remove_null(data):
-        """
-        Ensure all data in list are dicts with a "unix" key
-        """
-        data = [i for i in data if isinstance(i, dict)]
-        data = [i for i in data if "unix" in i]
-
-        return data
-
-    def no_duplicates(data):
-        """
-        ensure no duplicates due to pagination overlap at edges
-        """
-        dup_free = []
-        timestamps = []
-        for _, item in enumerate(data):
-            if item["unix"] not in timestamps:
-                timestamps.append(item["unix"])
-                dup_free.append(item)
-
-        return dup_free
-
-    def sort_by_unix(data):
-        """
-        pagination may still be backwards and segmented; resort by timestamp
-        """
-        data = sorted(data, key=lambda k: k["unix"])
 
+def candle_dtype(data, dtype=None):
+    """
+    a normalized dict of candle arrays as a structured array
+    None leaves it as it is
+    """
+    if dtype is None:
         return data
+    if not (isinstance(dtype, str) and dtype == "structured"):
+        raise ValueError("candle dtype must be None or 'structured'")
+    fields = [(k, np.int64 if k == "unix" else np.float64) for k in data]
+    ret = np.empty(len(data["unix"]), dtype=fields)
+    for key, values in data.items():
+        ret[key] = values
+    return ret
 
-    def interpolate_previous(data, start, end, interval):
-        """
-        candles may be missing; fill them in with previous close
-        """
-        start = int(start)
-        end = int(end)
-        interval = int(interval)
-        ip_unix = [*range(min(data["unix"]), max(data["unix"]), interval)]
-        out = {
-            "high": [],
-            "low": [],
-            "open": [],
-            "close": [],
-            "volume": [],
-            "unix": ip_unix,
-        }
-        for _, candle in enumerate(ip_unix):
-            for idx, _ in enumerate(data["unix"]):
-
-                match = False
-                diff = candle - data["unix"][idx]
-
-                if 0 <= diff < interval:
-                    match = True
-                    out["volume"].append(data["volume"][idx])
-                    out["high"].append(data["high"][idx])
-                    out["low"].append(data["low"][idx])
-                    out["open"].append(data["open"][idx])
-                    out["close"].append(data["close"][idx])
-                    break
-
-            if not match:
-                if candle == start:
-                    close = data["close"][0]
-                else:
-                    close = out["close"][-1]
-                out["volume"].append(0)
-                out["high"].append(close)
-                out["low"].append(close)
-                out["open"].append(close)
-                out["close"].append(close)
-
-        if DETAIL:
-            for key, val in out.items():
-                print(len(val), key)
-
-        return out
-
-    def window_data(data, start, end):
-        """
-        Ensure we do not return any data outside requested window
-
-        # use this instead if still in list of dict form
-        # d2 = []
-        # for index, item in enumerate(data):
-        #     if start < item["unix"] < end:
-        #        d2.append(item)
-        """
-        out = {"high": [], "low": [], "open": [], "close": [], "volume": [], "unix": []}
-
-        for idx, item in enumerate(data["unix"]):
-            if start < item <= end:
-                out["high"].append(data["high"][idx])
-                out["low"].append(data["low"][idx])
-                out["open"].append(data["open"][idx])
-                out["close"].append(data["close"][idx])
-                out["volume"].append(data["volume"][idx])
-                out["unix"].append(data["unix"][idx])
-
-        return out
-
-    def left_strip(data):
-        """
-        Remove no volume candles in beginning of dataset
-        """
-        out = {"high": [], "low": [], "open": [], "close": [], "volume": [], "unix": []}
-        begin = False
-
-        for idx, item in enumerate(data["volume"]):
-            if item or begin:
-                begin = True
-                out["high"].append(data["high"][idx])
-                out["low"].append(data["low"][idx])
-                out["open"].append(data["open"][idx])
-                out["close"].append(data["close"][idx])
-                out["volume"].append(data["volume"][idx])
-                out["unix"].append(data["unix"][idx])
-
-        return out
-
-    def reformat(data):
-        """
-        switch from list-of-dicts to dict-of-lists
-        """
-        list_format = {}
-        list_format["unix"] = []
-        list_format["high"] = []
-        list_format["low"] = []
-        list_format["open"] = []
-        list_format["close"] = []
-        list_format["volume"] = []
-        for _, item in enumerate(data):
-            list_format["unix"].append(item["unix"])
-            list_format["high"].append(item["high"])
-            list_format["low"].append(item["low"])
-            list_format["open"].append(item["open"])
-            list_format["close"].append(item["close"])
-            list_format["volume"].append(item["volume"])
-
-        return list_format
-
-    def normalize(data):
-        """
-        ensure high is high and low is low
-        filter extreme candatales at 0.5X to 2X the candatale average
-        ensure open and close are within high and low
-        """
-
-        for i, _ in enumerate(data["close"]):
-
-            data["high"][i] = max(
-                data["high"][i], data["low"][i], data["open"][i], data["close"][i]
-            )
-            data["low"][i] = min(
-                data["high"][i], data["low"][i], data["open"][i], data["close"][i]
-            )
-            ocl = (data["open"][i] + data["close"][i] + data["low"][i]) / 3
-            och = (data["open"][i] + data["close"][i] + data["high"][i]) / 3
-            data["high"][i] = min(data["high"][i], 2 * ocl)
-            data["low"][i] = max(data["low"][i], och / 2)
-            data["open"][i] = min(data["open"][i], data["high"][i])
-            data["open"][i] = max(data["open"][i], data["low"][i])
-            data["close"][i] = min(data["close"][i], data["high"][i])
-            data["close"][i] = max(data["close"][i], data["low"][i])
-
-        return data
 
+def fetch_candles(api, start, end, interval, store=None):
+    """
+    candle data; always makes its own requests
+    store=True, False overrides candle_store.STORE; see candle_store.py
+    intervals the exchange does not offer are resampled; see resample.py
+    """
     exchange = api["exchange"]
     if end is None:
         # to current
@@ -599,51 +843,36 @@ def get_candles(api, start=None, end=None, interval=86400):
     if start is None:
         # default 10 candles
         start = end - 10 * interval
+    native = native_interval(INTERVALS[exchange], interval)
+    if native is None:
+        raise ValueError("no %s interval divides %s" % (exchange, interval))
+    if native != interval:
+        # built locally from the finest native interval which divides it
+        data = fetch_candles(api, start - start % interval, end, native, store)
+        data = resample(data, interval)
+        window = (start < data["unix"]) & (data["unix"] <= end + interval + 60)
+        return {k: v[window] for k, v in data.items()}
     # allow for timestamp up to one interval and one minute in future.
     end = end + interval + 60
     # request 3 candles deeper than needed
     deep_begin = start - 3 * interval
+    if store is None:
+        store = candle_store.STORE
 
     print("\nstart:", to_iso_date(start), "end:", to_iso_date(end))
+    data = []
     while True:
         try:
             # collect external data in pages if need be
-            data = paginate_candles(api, deep_begin, end, interval)
-            if DETAIL:
-                print(len(data), "paginated with overlap and collated")
-            data = remove_null(data)
-            if DETAIL:
-                print(len(data), "null data removed")
-            data = no_duplicates(data)
-            if DETAIL:
-                print(len(data), "edge match - no duplicates by unix")
-            data = sort_by_unix(data)
-            if DETAIL:
-                print(len(data), "edge match - sort by unix")
-            data = reformat(data)
-            if DETAIL:
-                print(len(data["unix"]), "rotation; reformated to dict of lists")
-            data = interpolate_previous(data, deep_begin, end, interval)
-            if DETAIL:
-                print(
-                    len(data["unix"]),
-                    len(data["close"]),
-                    "missing buckets to candles interpolated as previous close",
+            if store:
+                # the span paginate_candles() covers; pages overlap its ends
+                windows = page_windows(exchange, deep_begin, end, interval)
+                data = candle_store.read_through(
+                    api, windows[0][0], windows[-1][1], interval, paginate_candles
                 )
-            data = window_data(data, start, end)
-            if DETAIL:
-                print(len(data["unix"]), "windowed to intial start / end request")
-            data = left_strip(data)
-            if DETAIL:
-                print(len(data["unix"]), "stripped of empty pre market candles")
-            data = normalize(data)
-            if DETAIL:
-                print({k: len(v) for k, v in data.items()})
-            if DETAIL:
-                print("normalized as valid: high is highest, no extremes, etc.")
-            data = {k: np.array(v) for k, v in data.items()}
-            if DETAIL:
-                print("final conversion to dict of numpy arrays:\n")
+            else:
+                data = paginate_candles(api, deep_begin, end, interval)
+            data = process_candles(data, start, end, deep_begin, interval)
             print(
                 "total items",
                 len(data),
@@ -664,105 +893,329 @@ def get_candles(api, start=None, end=None, interval=86400):
             continue
 
 
-def candles(api, start, end, interval):
+def page_windows(exchange, start, end, interval):
     """
-    single page of candle data
+    split [start, end] into pages per maximum request size per exchange
+    pages overlap at the edges and are listed oldest first
+
+    # USE FOR EDGE MATCHING DEV
+    max_candles = {
+        "bittrex": 100,
+        "bitfinex": 100,
+        "binance": 100,
+        "poloniex": 100,
+        "coinbase": 100,
+        "kraken": 100,
+        "kucoin": 100,
+    }
+    """
+    max_candles = {
+        "bittrex": 1000,  # 1000
+        "bitfinex": 10000,  # 10000
+        "binance": 500,  # 1000
+        "poloniex": 2000,
+        "coinbase": 300,  # 300
+        "kraken": 200,  # 200
+        "kucoin": 1500,  # 1500
+    }
+    overlap = 2
+    # fetch the max candles at this exchange
+    max_candles = max_candles[exchange] - (2 * overlap + 1)
+    # define the maximum exchange window in seconds
+    window = int(max_candles * interval)
+    # determine number of candles we require
+    depth = int(ceil((end - start) / float(interval)))
+    # determine number of calls required to get those candles
+    calls = int(max(ceil(depth / float(max_candles)), 1))
+    # single request
+    if calls == 1:
+        return [(start, end)]
+    # pagination with overlap on each end
+    stop = end
+    return [
+        (
+            stop - (call * window) - (overlap * interval),
+            stop - ((call - 1) * window) + (overlap * interval),
+        )
+        for call in range(calls, 0, -1)
+    ]
+
+
+def paginate_candles(api, start, end, interval):
+    """
+    paginate requests per maximum request size per exchange
+    up to PAGES pages in flight at once; the rate limiter paces them
+    collate responses crudely with overlap, oldest page first
+    """
+    windows = page_windows(api["exchange"], start, end, interval)
+
+    def page(call):
+        begin, stop = windows[call]
+        if len(windows) > 1:
+            print("call", len(windows) - call, "/", len(windows), begin, stop)
+        return candles(dict(api), begin, stop, interval)
+
+    with ThreadPoolExecutor(min(PAGES, len(windows))) as pool:
+        pages = list(pool.map(page, range(len(windows))))
+
+    return np.concatenate(pages)
+
+
+def iter_candles(api, start=None, end=None, interval=86400, chunk=CHUNK):
+    """
+    get_candles() as a generator of normalized dicts of numpy arrays
+    yields up to chunk candles at a time, oldest first, as pages arrive
+    joined end to end the chunks equal get_candles() over the same window
+    memory holds PAGES pages in flight, two pages of raw candles and a chunk
     """
     exchange = api["exchange"]
-    symbol = symbol_syntax(exchange, api["pair"])
-    limit = int(float(end - start) / interval) + 1
-    intervals = {
-        "bittrex": {
-            60: "oneMin",
-            300: "fiveMin",
-            1800: "thirtyMin",
-            3600: "hour",
-            86400: "day",
-        },
-        "bitfinex": {
-            60: "1m",
-            300: "5m",
-            900: "15m",
-            1800: "30m",
-            3600: "1h",
-            10800: "3h",
-            21600: "6h",
-            43200: "12h",
-            86400: "1D",
-            604800: "7D",
-            1209600: "14D",
-            2419200: "1M",
-        },
-        "binance": {
-            60: "1m",
-            180: "3m",
-            300: "5m",
-            900: "15m",
-            1800: "30m",
-            3600: "1h",
-            14400: "4h",
-            21600: "6h",
-            28800: "8h",
-            43200: "12h",
-            86400: "1d",
-            604800: "1w",
-            2419200: "1M",
-        },
-        "poloniex": {
-            300: 300,
-            900: 900,
-            1800: 1800,
-            7200: 7200,
-            14400: 14000,
-            86400: 86400,
-        },
-        "coinbase": {
-            60: 60,
-            300: 300,
-            900: 900,
-            3600: 3600,
-            21600: 21600,
-            86400: 86400,
-        },
-        "kraken": {
-            60: 1,
-            300: 5,
-            900: 15,
-            1800: 30,
-            3600: 60,
-            14400: 240,
-            86400: 1440,
-            604800: 10080,
-            2419200: 21600,
-        },
-        "kucoin": {
-            60: "1min",
-            180: "3min",
-            300: "5min",
-            900: "15min",
-            1800: "30min",
-            3600: "1hour",
-            7200: "2hour",
-            14400: "4hour",
-            21600: "6hour",
-            28800: "8hour",
-            43200: "12hour",
-            86400: "1day",
-            604800: "1week",
-        },
+    if end is None:
+        end = int(time.time())
+    if start is None:
+        start = end - 10 * interval
+    native = native_interval(INTERVALS[exchange], interval)
+    if native is None:
+        raise ValueError("no %s interval divides %s" % (exchange, interval))
+    if native != interval:
+        chunks = iter_candles(api, start - start % interval, end, native, chunk)
+        for data in resample_chunks(chunks, interval):
+            window = (start < data["unix"]) & (data["unix"] <= end + interval + 60)
+            if window.any():
+                yield {k: v[window] for k, v in data.items()}
+        return
+    end = end + interval + 60
+    deep_begin = start - 3 * interval
+    windows = page_windows(exchange, deep_begin, end, interval)
+    state = {
+        "raw": np.empty((0, len(COLUMNS))),
+        "floor": -np.inf,
+        "next": None,
+        "first": None,
+        "close": np.nan,
+        "begun": False,
     }
 
+    def page(call):
+        begin, stop = windows[call]
+        return candles(dict(api), begin, stop, interval)
+
+    pool = ThreadPoolExecutor(min(PAGES, len(windows)))
     try:
-        bitfinex_hist = "".join(
-            [i for i in intervals["bitfinex"][interval] if not i.isdigit()]
+        futures = [pool.submit(page, call) for call in range(len(windows))[:PAGES]]
+        held = []
+        for call, _ in enumerate(windows):
+            data, futures[call] = futures[call].result(), None
+            if call + PAGES < len(windows):
+                futures.append(pool.submit(page, call + PAGES))
+            # candles an interval before the next page's window are final
+            # exchanges may answer with the bar which opens just before it
+            boundary = np.inf
+            if call + 1 < len(windows):
+                boundary = windows[call + 1][0] - interval
+            data = stream_candles(
+                state, data, boundary, start, end, deep_begin, interval
+            )
+            held.append(data)
+            while sum(len(d["unix"]) for d in held) >= chunk:
+                data = {k: np.concatenate([d[k] for d in held]) for k in COLUMNS}
+                yield {k: v[:chunk] for k, v in data.items()}
+                held = [{k: v[chunk:] for k, v in data.items()}]
+        if sum(len(d["unix"]) for d in held):
+            yield {k: np.concatenate([d[k] for d in held]) for k in COLUMNS}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_candles(state, page, boundary, start, end, deep_begin, interval):
+    """
+    one page of iter_candles(); process_candles() for the candles it finalizes
+    state carries the raw candles not yet final, the next bucket, the first
+    and the last close, and whether left_strip() has seen volume yet
+    """
+    data = np.concatenate([state["raw"], page[page[:, -1] >= state["floor"]]])
+    data = no_duplicates(reformat(data))
+    state["floor"] = boundary
+    final = data["unix"] < boundary
+    empty = {k: np.array([], dtype=v.dtype) for k, v in data.items()}
+    if not final.any():
+        state["raw"] = np.column_stack([data[k] for k in COLUMNS])
+        return empty
+    if state["next"] is None:
+        state["next"], state["first"] = data["unix"][0], data["close"][0]
+    # buckets before the newest final candle; the last one bounds them
+    ip_unix = np.arange(state["next"], data["unix"][final][-1], interval)
+    data_out = fill_buckets(
+        data, ip_unix, int(deep_begin), interval, state["first"], state["close"]
+    )
+    if len(ip_unix):
+        state["next"] = ip_unix[-1] + interval
+        state["close"] = data_out["close"][-1]
+    keep = data["unix"] > state["next"] - interval
+    state["raw"] = np.column_stack([data[k][keep] for k in COLUMNS])
+    data_out = window_data(data_out, start, end)
+    if not state["begun"]:
+        data_out = left_strip(data_out)
+        state["begun"] = bool(len(data_out["unix"]))
+
+    return normalize(data_out)
+
+
+def process_candles(data, start, end, deep_begin, interval):
+    """
+    collated (n, 6) array of candle pages to a normalized dict of numpy arrays
+    shared by the sync and async candle remote procedures
+    every step below is a whole array operation
+    """
+    if DETAIL:
+        print(len(data), "paginated with overlap and collated")
+    data = reformat(data)
+    if DETAIL:
+        print(len(data["unix"]), "rotation; reformated to dict of arrays")
+    data = no_duplicates(data)
+    if DETAIL:
+        print(len(data["unix"]), "edge match - no duplicates, sorted by unix")
+    data = interpolate_previous(data, deep_begin, end, interval)
+    if DETAIL:
+        print(
+            len(data["unix"]),
+            len(data["close"]),
+            "missing buckets to candles interpolated as previous close",
         )
-        interval_raw = interval
-        interval = intervals[exchange][interval]
-    except Exception as error:
-        trace(error)
-        print("Invalid interval for this exchange")
-        print(exchange, symbol, interval)
-        pprint(intervals)
+    data = window_data(data, start, end)
+    if DETAIL:
+        print(len(data["unix"]), "windowed to intial start / end request")
+    data = left_strip(data)
+    if DETAIL:
+        print(len(data["unix"]), "stripped of empty pre market candles")
+    data = normalize(data)
+    if DETAIL:
+        print({k: len(v) for k, v in data.items()})
+    if DETAIL:
+        print("normalized as valid: high is highest, no extremes, etc.")
+    if not len(data["unix"]):
+        # an empty window has always come back as float arrays
+        data = {k: np.array([]) for k in data}
+
+    return data
+
+
+def reformat(data):
+    """
+    switch from an (n, 6) array of COLUMNS to dict-of-arrays
+    """
+    data = {key: data[:, idx] for idx, key in enumerate(COLUMNS)}
+    data["unix"] = data["unix"].astype(np.int64)
+
+    return data
+
+
+def no_duplicates(data):
+    """
+    ensure no duplicates due to pagination overlap at edges
+    the first candle seen at each timestamp is kept; the rest sorted by unix
+    """
+    _, index = np.unique(data["unix"], return_index=True)
+
+    return {k: v[index] for k, v in data.items()}
+
+
+def interpolate_previous(data, start, end, interval):
+    """
+    candles may be missing; fill them in with previous close
+    one bucket per interval from the first candle up to, not including, the last
+    """
+    start = int(start)
+    end = int(end)
+    interval = int(interval)
+    unix = data["unix"]
+    ip_unix = np.arange(unix.min(), unix.max(), interval)
+    out = fill_buckets(data, ip_unix, start, interval, data["close"][0])
+
+    if DETAIL:
+        for key, val in out.items():
+            print(len(val), key)
+
+    return out
+
+
+def fill_buckets(data, ip_unix, start, interval, first, carry=np.nan):
+    """
+    candles on the bucket grid ip_unix from sorted, unique candles
+    each bucket takes the oldest candle in (bucket - interval, bucket]
+    unmatched buckets carry the last close forward, beginning with carry,
+    except a bucket at start, which takes first, the first close in the data
+    """
+    unix = data["unix"]
+    # first candle after bucket - interval; a match if not after the bucket
+    index = np.searchsorted(unix, ip_unix - interval, side="right")
+    index = np.minimum(index, len(unix) - 1)
+    # buckets past the newest candle clip to it; that is no match either
+    match = (unix[index] <= ip_unix) & (unix[index] > ip_unix - interval)
+    source = np.where(match, data["close"][index], first)
+    valid = match | (ip_unix == start)
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(ip_unix)), -1))
+    close = np.where(last < 0, carry, source[last])
+
+    return {
+        "high": np.where(match, data["high"][index], close),
+        "low": np.where(match, data["low"][index], close),
+        "open": np.where(match, data["open"][index], close),
+        "close": close,
+        "volume": np.where(match, data["volume"][index], 0),
+        "unix": ip_unix,
+    }
+
+
+def window_data(data, start, end):
+    """
+    Ensure we do not return any data outside requested window
+    """
+    mask = (start < data["unix"]) & (data["unix"] <= end)
+
+    return {k: v[mask] for k, v in data.items()}
+
+
+def left_strip(data):
+    """
+    Remove no volume candles in beginning of dataset
+    """
+    mask = np.logical_or.accumulate(data["volume"] != 0)
+
+    return {k: v[mask] for k, v in data.items()}
+
+
+def normalize(data):
+    """
+    ensure high is high and low is low
+    filter extreme candatales at 0.5X to 2X the candatale average
+    ensure open and close are within high and low
+    """
+    high, low = data["high"], data["low"]
+    opens, close = data["open"], data["close"]
+    high = np.maximum(np.maximum(high, low), np.maximum(opens, close))
+    low = np.minimum(np.minimum(high, low), np.minimum(opens, close))
+    ocl = (opens + close + low) / 3
+    och = (opens + close + high) / 3
+    high = np.minimum(high, 2 * ocl)
+    low = np.maximum(low, och / 2)
+    data["high"], data["low"] = high, low
+    data["open"] = np.maximum(np.minimum(opens, high), low)
+    data["close"] = np.maximum(np.minimum(close, high), low)
+
+    return data
+
+
+def candles_request(api, start, end, interval):
+    """
+    add endpoint and params for a single page of candle data to the api dict
+    """
+    exchange = api["exchange"]
+    symbol = symbol_syntax(exchange, api["pair"])
+    limit = int(float(end - start) / interval) + 1
+    # get_candles() only asks for native intervals; see native_interval()
+    interval_raw = interval
+    interval = INTERVALS[exchange][interval]
+    bitfinex_hist = "".join([i for i in str(interval) if not i.isdigit()])
 
     endpoints = {
         "bittrex": "/api/v2.0/pub/market/GetTicks",
@@ -801,106 +1254,61 @@ def candles(api, start, end, interval):
     api["endpoint"] = endpoints[exchange]
     api["params"] = params[exchange]
     api["params"].update(windows[exchange])
+    return api
 
-    try:
-        data = process_request(api)
+
+def candles_response(api, data, start, end):
+    """
+    normalize a single page of candle data to an (n, 6) array of COLUMNS
+    row oriented responses fill a preallocated array column by column
+    """
+    exchange = api["exchange"]
+    if exchange in ["bittrex", "kraken"]:
+        data = data["result"]
+    if exchange == "kraken":
+        data = data[list(data)[0]]
+    if exchange == "kucoin":
+        data = data["data"]
+
+    page = np.empty((len(data), len(COLUMNS)))
+    if exchange in ROWS:
+        index, divisor = ROWS[exchange]
+        for col, idx in enumerate(index):
+            page[:, col] = [d[idx] for d in data]
+        page[:, -1] = np.trunc(page[:, -1] / divisor)
+    else:
+        keys = KEYS[exchange]
+        for col, key in enumerate(keys[:-1]):
+            page[:, col] = [d[key] for d in data]
         if exchange == "bittrex":
-            data = data["result"]
-            data = [
-                {
-                    "open": float(d["O"]),
-                    "high": float(d["H"]),
-                    "low": float(d["L"]),
-                    "close": float(d["C"]),
-                    "volume": float(d["V"]),
-                    "unix": from_iso_date(d["T"]),
-                }
-                for d in data
-                if start < from_iso_date(d["T"]) <= end
-            ]
-
-        elif exchange == "bitfinex":
-            data = [
-                {
-                    "unix": int(float(d[0]) / 1000.0),
-                    "open": float(d[1]),
-                    "close": float(d[2]),
-                    "high": float(d[3]),
-                    "low": float(d[4]),
-                    "volume": float(d[5]),
-                }
-                for d in data
-                if start <= int(float(d[0]) / 1000.0) <= end
-            ]
-        elif exchange == "binance":
-            data = [
-                {
-                    "open": float(d[1]),
-                    "high": float(d[2]),
-                    "low": float(d[3]),
-                    "close": float(d[4]),
-                    "volume": float(d[5]),
-                    "unix": int(int(d[6]) / 1000.0),
-                }
-                for d in data
-            ]
-        elif exchange == "poloniex":
-            data = [
-                {
-                    "open": float(d["open"]),
-                    "high": float(d["high"]),
-                    "low": float(d["low"]),
-                    "close": float(d["close"]),
-                    "volume": float(d["quoteVolume"]),
-                    "unix": int(d["date"]),
-                }
-                for d in data
-            ]
-        elif exchange == "coinbase":
-            data = [
-                {
-                    "unix": int(d[0]),
-                    "low": float(d[1]),
-                    "high": float(d[2]),
-                    "open": float(d[3]),
-                    "close": float(d[4]),
-                    "volume": float(d[5]),
-                }
-                for d in data
-            ]
-        elif exchange == "kraken":
-            data = data["result"]
-            data = data[list(data)[0]]
-            data = [
-                {
-                    "unix": int(d[0]),
-                    "open": float(d[1]),
-                    "high": float(d[2]),
-                    "low": float(d[3]),
-                    "close": float(d[4]),
-                    # vwap d[5]
-                    "volume": float(d[6]),
-                }
-                for d in data
-            ]
-        elif exchange == "kucoin":
-            data = data["data"]
-            data = [
-                {
-                    "unix": int(d[0]),
-                    "open": float(d[1]),
-                    "close": float(d[2]),
-                    "high": float(d[3]),
-                    "low": float(d[4]),
-                    "volume": float(d[5]),
-                }
-                for d in data
-            ]
-    except Exception as error:
-        print(trace(error), {k: v for k, v in api.items() if k != "secret"})
-        data = []
+            page[:, -1] = from_iso_dates([d["T"] for d in data])
+        else:
+            page[:, -1] = [d[keys[-1]] for d in data]
+    if np.isnan(page).any():
+        raise ValueError("null in %s candle data" % exchange)
+    if exchange == "bittrex":
+        page = page[(start < page[:, -1]) & (page[:, -1] <= end)]
+    elif exchange == "bitfinex":
+        page = page[(start <= page[:, -1]) & (page[:, -1] <= end)]
 
-    return data
+    return page
+
+
+def candles(api, start, end, interval):
+    """
+    single page of candle data
+    a failed page is retried on its own, PAGE_ATTEMPTS times, then raises
+    """
+    candles_request(api, start, end, interval)
+    for attempt in range(1, PAGE_ATTEMPTS + 1):
+        try:
+            data = process_request(api, "backfill")
+            return candles_response(api, data, start, end)
+        except Exception as error:
+            print(trace(error), {k: v for k, v in api.items() if k != "secret"})
+            if attempt == PAGE_ATTEMPTS:
+                raise
+            time.sleep(attempt)
 
 
 # DEMONSTRATION
@@ -0,0 +1,521 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Streaming WebSocket Market Data
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import asyncio
+import time
+from json import loads as json_loads
+from threading import Thread
+
+# THIRD PARTY MODULES
+import aiohttp
+
+# CEX MODULES
+import cex_async
+import cex_public
+from order_book import best, depth_of_market, load, new_book, truncate, update_many
+from utilities import symbol_syntax, trace
+
+# GLOBAL USER DEFINED CONSTANTS
+WS_URLS = {
+    "coinbase": "wss://ws-feed.pro.coinbase.com",
+    "bitfinex": "wss://api-pub.bitfinex.com/ws/2",
+    "kraken": "wss://ws.kraken.com",
+    "poloniex": "wss://api2.poloniex.com",
+    "binance": "wss://stream.binance.com:9443",
+    # kucoin hands out its endpoint with a token; see stream_url()
+}
+DEPTH = 25  # levels subscribed per side where the exchange asks
+KEEPALIVE = 10  # seconds of quiet before a ping
+SILENCE = 30  # seconds of quiet before a reconnect
+BACKOFF = 1  # seconds before the first reconnect; doubles to MAX_BACKOFF
+MAX_BACKOFF = 60
+POLL = 2  # seconds between polls of exchanges without a stream
+
+
+def about():
+    """
+    STREAM USAGE
+
+    from cex_stream import open_stream, stream_book, stream_ticker, close_stream
+
+    apis = [{"exchange": e, "pair": "BTC:USD"} for e in ["coinbase", "kraken"]]
+    feed = open_stream(apis)
+    stream_book(feed, apis[0], depth=10)    # get_book() format or None
+    stream_ticker(feed, apis[1])            # {"bid", "ask", "last", ...}
+    close_stream(feed)
+
+    or, inside a running event loop
+
+    state = new_state(api)
+    task = asyncio.create_task(run_stream(state, stop))   # stop: asyncio.Event
+
+    ABOUT
+
+    one websocket per (exchange, pair) subscribed to the book and trades
+    each keeps an order_book.py book current: snapshots load() it and
+    diffs update it level by level
+    stream_book() and stream_ticker() read it at any time from any thread
+    a dropped or silent socket reconnects with exponential BACKOFF
+    a sequence gap, or an exchange asking for it, reconnects and resyncs
+    from the fresh snapshot sent on subscription
+    until the book has its first snapshot stream_book() returns None
+    bittrex serves SignalR, not a plain websocket; it is polled instead,
+    every POLL seconds through cex_async, into the same state
+
+    STATE
+
+    {
+        "api": {"exchange", "pair"},
+        "book": order_book.py book,
+        "trade": {"price", "volume", "unix"} of the last trade or None,
+        "synced": True once the book holds a snapshot from this connection,
+        "updated": unix of the last message,
+        "connects": int, "resyncs": int,
+    }
+    """
+    print(about.__doc__)
+
+
+def new_state(api):
+    """
+    empty stream state of one (exchange, pair)
+    """
+    return {
+        "api": {"exchange": api["exchange"], "pair": api["pair"]},
+        "book": new_book(),
+        "trade": None,
+        "synced": False,
+        "updated": 0.0,
+        "connects": 0,
+        "resyncs": 0,
+        # per connection; channel ids, sequence numbers
+        "context": {},
+    }
+
+
+def open_stream(apis):
+    """
+    stream every api in a background thread; returns the feed
+    """
+    feed = {
+        "streams": {(api["exchange"], api["pair"]): new_state(api) for api in apis},
+        "loop": asyncio.new_event_loop(),
+    }
+
+    async def main():
+        feed["stop"] = asyncio.Event()
+        feed["tasks"] = [
+            asyncio.create_task(run_stream(state, feed["stop"]))
+            for state in feed["streams"].values()
+        ]
+        await asyncio.gather(*feed["tasks"], return_exceptions=True)
+        await cex_async.close_sessions()
+
+    feed["thread"] = Thread(
+        target=feed["loop"].run_until_complete, args=(main(),), daemon=True
+    )
+    feed["thread"].start()
+    return feed
+
+
+def close_stream(feed, timeout=10):
+    """
+    stop every stream of a feed and close its sockets
+    """
+    loop = feed["loop"]
+    while "stop" not in feed and feed["thread"].is_alive():
+        time.sleep(0.01)
+    if feed["thread"].is_alive():
+        loop.call_soon_threadsafe(feed["stop"].set)
+    feed["thread"].join(timeout)
+    if not loop.is_running():
+        loop.close()
+
+
+def stream_book(feed, api, depth=10):
+    """
+    Depth of Market format; None before the first snapshot
+
+    {"bidv": [], "bidp": [], "askp": [], "askv": []}
+    """
+    state = feed["streams"][(api["exchange"], api["pair"])]
+    if not state["synced"]:
+        return None
+    return depth_of_market(state["book"], depth)
+
+
+def stream_ticker(feed, api):
+    """
+    top of book and last trade
+    {"bid", "bidv", "ask", "askv", "last", "volume", "unix", "synced"}
+    """
+    state = feed["streams"][(api["exchange"], api["pair"])]
+    bid = best(state["book"], "bid") if state["synced"] else None
+    ask = best(state["book"], "ask") if state["synced"] else None
+    trade = state["trade"] or {}
+    return {
+        "bid": bid and bid[0],
+        "bidv": bid and bid[1],
+        "ask": ask and ask[0],
+        "askv": ask and ask[1],
+        "last": trade.get("price"),
+        "volume": trade.get("volume"),
+        "unix": trade.get("unix"),
+        "synced": state["synced"],
+    }
+
+
+async def run_stream(state, stop):
+    """
+    keep one stream state current until stop is set
+    """
+    if state["api"]["exchange"] not in HANDLERS:
+        await poll_stream(state, stop)
+        return
+    attempt = 0
+    session = aiohttp.ClientSession()
+    try:
+        while not stop.is_set():
+            task = asyncio.create_task(connect(session, state))
+            waiter = asyncio.create_task(stop.wait())
+            await asyncio.wait([task, waiter], return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+                break
+            try:
+                task.result()
+            except Exception as error:
+                print(trace(error), state["api"])
+            # a connection which got as far as a snapshot resets the backoff
+            attempt = 0 if state["synced"] else attempt + 1
+            state["synced"] = False
+            delay = min(BACKOFF * 2 ** max(attempt - 1, 0), MAX_BACKOFF)
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await session.close()
+
+
+async def connect(session, state):
+    """
+    one websocket connection; returns or raises when it ends
+    """
+    exchange, pair = state["api"]["exchange"], state["api"]["pair"]
+    url = await stream_url(session, exchange, pair)
+    async with session.ws_connect(url) as socket:
+        state["connects"] += 1
+        state["context"] = {}
+        for message in subscriptions(exchange, pair):
+            await socket.send_json(message)
+        quiet = time.time()
+        while True:
+            try:
+                msg = await socket.receive(timeout=KEEPALIVE)
+            except asyncio.TimeoutError:
+                if time.time() - quiet > SILENCE:
+                    raise
+                if exchange in PINGS:
+                    await socket.send_json(PINGS[exchange]())
+                continue
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                # closed, closing or error; the caller reconnects
+                return
+            quiet = state["updated"] = time.time()
+            HANDLERS[exchange](state, json_loads(msg.data))
+
+
+async def poll_stream(state, stop):
+    """
+    exchanges without a plain websocket; poll the book and price instead
+    """
+    api = state["api"]
+    while not stop.is_set():
+        try:
+            dom, price = await asyncio.gather(
+                cex_async.get_book(dict(api), 50), cex_async.get_price(dict(api))
+            )
+            load(state["book"], dom)
+            state["trade"] = {"price": price, "volume": None, "unix": time.time()}
+            state["synced"] = True
+            state["updated"] = time.time()
+        except Exception as error:
+            print(trace(error), api)
+        try:
+            await asyncio.wait_for(stop.wait(), POLL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def stream_url(session, exchange, pair):
+    """
+    websocket url of one (exchange, pair)
+    """
+    if exchange == "binance":
+        symbol = symbol_syntax(exchange, pair).lower()
+        streams = "%s@depth20@100ms/%s@trade" % (symbol, symbol)
+        return WS_URLS["binance"] + "/stream?streams=" + streams
+    if exchange == "kucoin":
+        # a public token and the endpoint to use it at
+        url = cex_public.URLS["kucoin"] + "/api/v1/bullet-public"
+        async with session.post(url) as response:
+            data = (await response.json())["data"]
+        return data["instanceServers"][0]["endpoint"] + "?token=" + data["token"]
+    return WS_URLS[exchange]
+
+
+def kraken_pair(pair):
+    """
+    kraken websocket pair names are "XBT/USD" style
+    """
+    asset, currency = pair.upper().split(":")
+    return "/".join("XBT" if x == "BTC" else x for x in [asset, currency])
+
+
+def subscriptions(exchange, pair):
+    """
+    messages to send on connecting; book and trades of one pair
+    """
+    symbol = symbol_syntax(exchange, pair)
+    if exchange == "coinbase":
+        return [
+            {
+                "type": "subscribe",
+                "product_ids": [symbol],
+                "channels": ["level2", "matches"],
+            }
+        ]
+    if exchange == "kraken":
+        return [
+            {
+                "event": "subscribe",
+                "pair": [kraken_pair(pair)],
+                "subscription": subscription,
+            }
+            for subscription in [{"name": "book", "depth": DEPTH}, {"name": "trade"}]
+        ]
+    if exchange == "bitfinex":
+        return [
+            {
+                "event": "subscribe",
+                "channel": "book",
+                "symbol": "t" + symbol,
+                "prec": "P0",
+                "len": str(DEPTH),
+            },
+            {"event": "subscribe", "channel": "trades", "symbol": "t" + symbol},
+        ]
+    if exchange == "poloniex":
+        return [{"command": "subscribe", "channel": symbol}]
+    if exchange == "kucoin":
+        return [
+            {
+                "id": str(number),
+                "type": "subscribe",
+                "topic": topic + symbol,
+                "response": True,
+            }
+            for number, topic in enumerate(
+                ["/spotMarket/level2Depth50:", "/market/match:"], 1
+            )
+        ]
+    # binance subscribes in the url
+    return []
+
+
+def resync(state, reason):
+    """
+    the local book can no longer be trusted; reconnect for a fresh snapshot
+    """
+    state["resyncs"] += 1
+    raise ConnectionError("resync %s" % (reason,))
+
+
+def levels(rows):
+    """
+    [[price, size, ...], ...] to (prices, sizes) floats
+    """
+    return [float(row[0]) for row in rows], [float(row[1]) for row in rows]
+
+
+def snapshot(state, bids, asks):
+    """
+    replace the book with [[price, size, ...], ...] per side
+    """
+    bidp, bidv = levels(bids)
+    askp, askv = levels(asks)
+    load(state["book"], {"bidv": bidv, "bidp": bidp, "askp": askp, "askv": askv})
+    state["synced"] = True
+
+
+def trade(state, price, volume):
+    """
+    record the last trade
+    """
+    state["trade"] = {
+        "price": float(price),
+        "volume": abs(float(volume)),
+        "unix": time.time(),
+    }
+
+
+def coinbase_message(state, data):
+    """
+    level2 snapshot and l2update; matches for trades
+    """
+    kind = data.get("type")
+    if kind == "snapshot":
+        snapshot(state, data["bids"], data["asks"])
+    elif kind == "l2update" and state["synced"]:
+        for side, key in [("bid", "buy"), ("ask", "sell")]:
+            changes = [c[1:] for c in data["changes"] if c[0] == key]
+            if changes:
+                update_many(state["book"], side, *levels(changes))
+    elif kind in ["match", "last_match"]:
+        trade(state, data["price"], data["size"])
+    elif kind == "error":
+        resync(state, data)
+
+
+def binance_message(state, data):
+    """
+    combined stream of top 20 snapshots and trades
+    """
+    stream, data = data.get("stream", ""), data.get("data", {})
+    if "@depth" in stream:
+        snapshot(state, data["bids"], data["asks"])
+    elif stream.endswith("@trade"):
+        trade(state, data["p"], data["q"])
+
+
+def kraken_message(state, data):
+    """
+    [channel id, payload, ..., channel name, pair] or an event dict
+    """
+    if isinstance(data, dict):
+        if data.get("status") == "error":
+            resync(state, data)
+        return
+    name, payloads = data[-2], data[1:-2]
+    if name.startswith("book"):
+        for payload in payloads:
+            if "as" in payload or "bs" in payload:
+                snapshot(state, payload.get("bs", []), payload.get("as", []))
+                continue
+            if not state["synced"]:
+                continue
+            for side, key in [("bid", "b"), ("ask", "a")]:
+                if key in payload:
+                    update_many(state["book"], side, *levels(payload[key]))
+                    # kraken expects the book cut back to the depth subscribed
+                    truncate(state["book"], side, DEPTH)
+    elif name == "trade":
+        price, volume = payloads[0][-1][:2]
+        trade(state, price, volume)
+
+
+def bitfinex_message(state, data):
+    """
+    subscription events, then [channel id, payload] per channel
+    """
+    channels = state["context"].setdefault("channels", {})
+    if isinstance(data, dict):
+        if data.get("event") == "subscribed":
+            channels[data["chanId"]] = data["channel"]
+        elif data.get("event") == "error" or data.get("code") == 20051:
+            # 20051: the server is restarting; reconnect
+            resync(state, data)
+        return
+    channel, payload = channels.get(data[0]), data[1]
+    if payload == "hb":
+        return
+    if channel == "book":
+        if isinstance(payload[0], list):
+            # snapshot; [[price, count, amount], ...]
+            bids = [[p, a] for p, _, a in payload if a > 0]
+            asks = [[p, -a] for p, _, a in payload if a < 0]
+            snapshot(state, bids, asks)
+            return
+        price, count, amount = payload
+        # count 0 deletes; amount 1 for a bid, -1 for an ask
+        side = "bid" if amount > 0 else "ask"
+        size = abs(amount) if count else 0
+        update_many(state["book"], side, [float(price)], [size])
+    elif channel == "trades":
+        if payload == "te":
+            _, _, amount, price = data[2]
+        elif isinstance(payload, list):
+            # snapshot; newest first
+            _, _, amount, price = payload[0]
+        else:
+            return
+        trade(state, price, amount)
+
+
+def poloniex_message(state, data):
+    """
+    [channel id, sequence, [[kind, ...], ...]]; heartbeats are [1010]
+    """
+    if isinstance(data, dict):
+        if "error" in data:
+            resync(state, data)
+        return
+    if len(data) < 3:
+        return
+    sequence, last = data[1], state["context"].get("sequence")
+    if state["synced"] and last is not None and sequence != last + 1:
+        resync(state, "sequence %s after %s" % (sequence, last))
+    state["context"]["sequence"] = sequence
+    for event in data[2]:
+        if event[0] == "i":
+            asks, bids = event[1]["orderBook"]
+            snapshot(state, list(bids.items()), list(asks.items()))
+        elif event[0] == "o" and state["synced"]:
+            side = "bid" if event[1] == 1 else "ask"
+            update_many(state["book"], side, [float(event[2])], [float(event[3])])
+        elif event[0] == "t":
+            trade(state, event[3], event[4])
+
+
+def kucoin_message(state, data):
+    """
+    top 50 snapshots and matches; welcome, ack and pong are ignored
+    """
+    kind, topic = data.get("type"), data.get("topic", "")
+    if kind == "error":
+        resync(state, data)
+    if kind != "message":
+        return
+    data = data["data"]
+    if topic.startswith("/spotMarket/level2Depth"):
+        snapshot(state, data["bids"], data["asks"])
+    elif topic.startswith("/market/match"):
+        trade(state, data["price"], data["size"])
+
+
+HANDLERS = {
+    "coinbase": coinbase_message,
+    "binance": binance_message,
+    "kraken": kraken_message,
+    "bitfinex": bitfinex_message,
+    "poloniex": poloniex_message,
+    "kucoin": kucoin_message,
+}
+# application level pings, where the exchange wants one
+PINGS = {
+    "kraken": lambda: {"event": "ping"},
+    "bitfinex": lambda: {"event": "ping"},
+    "kucoin": lambda: {"id": str(int(time.time() * 1000)), "type": "ping"},
+}
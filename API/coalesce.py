@@ -0,0 +1,103 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Single-Flight Request Coalescing
+
+litepresence 2019
+"""
+
+# STANDARD MODULES
+from concurrent.futures import Future
+from copy import deepcopy
+from threading import Lock
+
+# GLOBAL USER DEFINED CONSTANTS
+COALESCE = True
+
+# module state; in flight calls by key and hit / miss counters
+FLIGHTS = {"lock": Lock(), "calls": {}, "hits": 0, "misses": 0}
+
+
+def about():
+    """
+    COALESCE USAGE
+
+    from coalesce import single_flight, coalesce_stats
+
+    price = single_flight(("price", "binance", "BTC:USDT"), fetch_price, api)
+    print(coalesce_stats())
+
+    ABOUT
+
+    the first caller of a key runs the target; it is a miss
+    callers arriving while it is in flight wait for it instead; each a hit
+    every caller receives its own copy of the same normalized result
+    an exception in the target is raised in every caller
+    nothing is kept once the call lands; this is not a cache
+    set COALESCE = False to run every call on its own
+    """
+    print(about.__doc__)
+
+
+def single_flight(key, target, *args):
+    """
+    target(*args) shared by every concurrent caller with the same key
+    """
+    if not COALESCE:
+        return target(*args)
+    with FLIGHTS["lock"]:
+        future = FLIGHTS["calls"].get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            FLIGHTS["calls"][key] = future
+            FLIGHTS["misses"] += 1
+        else:
+            FLIGHTS["hits"] += 1
+    if not leader:
+        return deepcopy(future.result())
+    try:
+        result = target(*args)
+    except BaseException as error:
+        land(key)
+        future.set_exception(error)
+        raise
+    land(key)
+    # waiters copy from a private copy; the leader's caller may mutate its own
+    future.set_result(deepcopy(result))
+    return result
+
+
+def land(key):
+    """
+    forget an in flight key; later callers start a new request
+    """
+    with FLIGHTS["lock"]:
+        FLIGHTS["calls"].pop(key, None)
+
+
+def coalesce_stats():
+    """
+    {"hits": int, "misses": int, "inflight": int, "rate": float}
+    rate is the fraction of calls which rode on another caller's request
+    """
+    with FLIGHTS["lock"]:
+        hits, misses = FLIGHTS["hits"], FLIGHTS["misses"]
+        inflight = len(FLIGHTS["calls"])
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "inflight": inflight,
+        "rate": hits / float(total) if total else 0.0,
+    }
+
+
+def reset_stats():
+    """
+    zero the hit and miss counters
+    """
+    with FLIGHTS["lock"]:
+        FLIGHTS["hits"] = FLIGHTS["misses"] = 0
@@ -0,0 +1,104 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Cross Exchange Volume Weighted Composite Candles
+
+litepresence 2019
+"""
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from fan_out import EXCHANGES
+from panel import WORKERS, align, fetch_all
+
+
+def about():
+    """
+    COMPOSITE USAGE
+
+    from composite import get_composite
+
+    ret = get_composite("BTC:USD", ["coinbase", "kraken", "bitfinex"], start, end, 60)
+    ret["candles"]["close"]             # volume weighted close across venues
+    ret["share"]                        # (n_exchanges, n_bars) volume share
+
+    ABOUT
+
+    one get_candles() call per exchange, all at once
+    every venue is aligned by unix on one axis, as get_panel() does
+    open and close are weighted by the volume each venue traded in the bucket
+    high and low are the extremes, volume the sum, across venues which traded
+    a bucket nobody traded in takes the plain mean close of every venue listed,
+    so a venue which went quiet never stretches high or low with a stale price
+
+    RETURNS
+
+    {
+        "candles": {"high", "low", "open", "close", "volume", "unix"},
+        "share": float array (n_exchanges, n_bars); each venue's volume share,
+        "panel": get_panel() style rows per venue under "exchanges",
+        "missing": {exchange: reason},
+    }
+    """
+    print(about.__doc__)
+
+
+def get_composite(
+    pair,
+    exchanges=None,
+    start=None,
+    end=None,
+    interval=86400,
+    cache=None,
+    store=None,
+    workers=WORKERS,
+):
+    """
+    volume weighted candles of one pair across many exchanges
+    """
+    exchanges = list(EXCHANGES if exchanges is None else exchanges)
+    apis = [{"exchange": exchange, "pair": pair} for exchange in exchanges]
+    fetched, missing = fetch_all(
+        apis, "exchange", start, end, interval, cache, store, workers
+    )
+    panel = align(fetched, interval, "exchanges")
+    candles, share = composite(panel)
+    return {"candles": candles, "share": share, "panel": panel, "missing": missing}
+
+
+def composite(panel):
+    """
+    (candles, share) from an aligned panel of one pair at many venues
+    """
+    volume = panel["volume"]
+    traded = volume > 0
+    total = np.where(traded, volume, 0).sum(axis=0)
+    active = total > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(traded, volume, 0) / total
+    share[:, ~active] = 0
+    # venues not yet listed are NaN; quiet venues carry their last close
+    listed = ~np.isnan(panel["close"])
+    quiet = np.where(listed, panel["close"], 0).sum(axis=0) / np.maximum(
+        listed.sum(axis=0), 1
+    )
+
+    def weighted(key):
+        values = np.where(traded, panel[key], 0)
+        return np.where(active, (values * share).sum(axis=0), quiet)
+
+    high = np.where(traded, panel["high"], -np.inf).max(axis=0, initial=-np.inf)
+    low = np.where(traded, panel["low"], np.inf).min(axis=0, initial=np.inf)
+    candles = {
+        "high": np.where(active, high, quiet),
+        "low": np.where(active, low, quiet),
+        "open": weighted("open"),
+        "close": weighted("close"),
+        "volume": total.astype(np.float64),
+        "unix": panel["unix"],
+    }
+    return candles, share
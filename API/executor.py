@@ -0,0 +1,341 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Durable Request Executor
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import atexit
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from copy import deepcopy
+from multiprocessing import Pipe, Process
+from threading import Lock, Semaphore
+
+# CEX MODULES
+from utilities import trace
+
+# GLOBAL USER DEFINED CONSTANTS
+# "spawn"   : legacy; a brand new process for every request
+# "process" : long lived worker processes; hung workers are killed and replaced
+# "thread"  : long lived worker threads; hung threads are abandoned along
+#             with their pool, and a fresh pool takes the next calls
+# "inline"  : run in the calling thread; no timeout beyond the http timeout
+MODE = "process"
+WORKERS = 8
+
+# module state; one pool per process
+POOL = {
+    "lock": Lock(),
+    "broadcast": Lock(),
+    "idle": [],
+    "slots": None,
+    "threads": None,
+}
+
+
+def about():
+    """
+    EXECUTOR USAGE
+
+    from executor import execute, set_mode
+
+    set_mode("thread", workers=16)
+    result = execute(target, (api,), timeout)
+
+    ABOUT
+
+    process_request() used to fork a brand new child for every external call
+    the executor keeps a pool of long lived workers instead
+    the target must be a module level function so that it can be pickled
+    the target receives a deep copy of its args in every mode
+    a target which outlives its timeout raises TimeoutError in the caller
+    in process mode that worker is terminated and respawned on demand
+    """
+    print(about.__doc__)
+
+
+def set_mode(mode, workers=None):
+    """
+    switch executor mode and / or pool size; tears down the current pool
+    """
+    global MODE, WORKERS  # pylint: disable=global-statement
+    if mode not in ["spawn", "process", "thread", "inline"]:
+        raise ValueError("invalid executor mode " + str(mode))
+    shutdown()
+    MODE = mode
+    if workers is not None:
+        WORKERS = int(workers)
+
+
+def worker(conn):
+    """
+    long lived child process; execute (target, args) tasks until sentinel
+    """
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+        target, args = task
+        try:
+            conn.send((True, target(*args)))
+        except Exception as error:
+            conn.send((False, trace(error)))
+    conn.close()
+
+
+def spawn_worker():
+    """
+    start a fresh worker process; return (process, parent end of pipe)
+    """
+    parent, child = Pipe()
+    proc = Process(target=worker, args=(child,))
+    proc.daemon = True
+    proc.start()
+    child.close()
+    return proc, parent
+
+
+def kill_worker(proc, conn):
+    """
+    terminate a worker process and release its pipe
+    """
+    try:
+        conn.close()
+    except Exception:
+        pass
+    proc.terminate()
+    proc.join(1)
+
+
+def checkout():
+    """
+    reserve an idle worker process, spawning one if the pool is not full
+    """
+    with POOL["lock"]:
+        if POOL["slots"] is None:
+            POOL["slots"] = Semaphore(WORKERS)
+        slots = POOL["slots"]
+    slots.acquire()
+    with POOL["lock"]:
+        idle = POOL["idle"]
+        while idle:
+            proc, conn = idle.pop()
+            if proc.is_alive():
+                return proc, conn, slots
+            kill_worker(proc, conn)
+    try:
+        proc, conn = spawn_worker()
+    except Exception:
+        slots.release()
+        raise
+    return proc, conn, slots
+
+
+def checkin(proc, conn, slots, healthy=True):
+    """
+    return a worker to the pool, or destroy it if it misbehaved
+    workers checked out before a shutdown() are destroyed on return
+    """
+    with POOL["lock"]:
+        healthy = healthy and slots is POOL["slots"] and proc.is_alive()
+        if healthy:
+            POOL["idle"].append((proc, conn))
+    if not healthy:
+        kill_worker(proc, conn)
+    slots.release()
+
+
+def execute_process(target, args, timeout):
+    """
+    run the target in a pooled worker process; kill it if it hangs
+    """
+    proc, conn, slots = checkout()
+    try:
+        conn.send((target, args))
+        hung = not conn.poll(timeout)
+        if not hung:
+            success, result = conn.recv()
+    except (EOFError, OSError) as error:
+        checkin(proc, conn, slots, healthy=False)
+        raise RuntimeError("worker died: " + trace(error)) from error
+    except BaseException:
+        # unpicklable args, KeyboardInterrupt, etc; never leak the worker
+        checkin(proc, conn, slots, healthy=False)
+        raise
+    if hung:
+        checkin(proc, conn, slots, healthy=False)
+        raise TimeoutError("worker exceeded %s seconds" % timeout)
+    checkin(proc, conn, slots)
+    if not success:
+        raise RuntimeError(result)
+    return result
+
+
+def execute_thread(target, args, timeout):
+    """
+    run the target in a pooled worker thread; abandon it if it hangs
+    a thread cannot be killed, so the pool it holds a slot of is replaced
+    """
+    args = deepcopy(args)
+    # submit under the lock so a concurrent shutdown() cannot slip between
+    with POOL["lock"]:
+        if POOL["threads"] is None:
+            POOL["threads"] = ThreadPoolExecutor(WORKERS)
+        pool = POOL["threads"]
+        future = pool.submit(target, *args)
+    try:
+        return future.result(timeout)
+    except FutureTimeout as error:
+        future.cancel()
+        with POOL["lock"]:
+            if POOL["threads"] is pool:
+                POOL["threads"] = ThreadPoolExecutor(WORKERS)
+        # its other threads finish what was queued on it, then exit
+        pool.shutdown(wait=False)
+        raise TimeoutError("thread exceeded %s seconds" % timeout) from error
+
+
+def execute_spawn(target, args, timeout):
+    """
+    legacy behavior; one brand new process per request
+    """
+    parent, child = Pipe(duplex=False)
+    proc = Process(target=spawn_target, args=(child, target, args))
+    proc.daemon = False
+    proc.start()
+    child.close()
+    try:
+        if not parent.poll(timeout):
+            raise TimeoutError("process exceeded %s seconds" % timeout)
+        success, result = parent.recv()
+    except EOFError as error:
+        raise RuntimeError("process died without result") from error
+    finally:
+        proc.terminate()
+        proc.join(1)
+        parent.close()
+    if not success:
+        raise RuntimeError(result)
+    return result
+
+
+def spawn_target(conn, target, args):
+    """
+    child side of a legacy spawned request
+    """
+    try:
+        conn.send((True, target(*args)))
+    except Exception as error:
+        conn.send((False, trace(error)))
+    conn.close()
+
+
+def execute(target, args=(), timeout=None):
+    """
+    run target(*args) under the current MODE and return its result
+    raises TimeoutError if it exceeds timeout, RuntimeError if it failed
+    """
+    if MODE == "process":
+        return execute_process(target, args, timeout)
+    if MODE == "thread":
+        return execute_thread(target, args, timeout)
+    if MODE == "spawn":
+        return execute_spawn(target, args, timeout)
+    return target(*deepcopy(args))
+
+
+def broadcast(target, args=(), timeout=None):
+    """
+    run target(*args) once in every worker process; return a list of results
+    fills the process pool to WORKERS first, so it waits for busy workers
+    in every other mode the workers share this process; it runs once, here
+    a worker which fails or hangs contributes None and is replaced
+    """
+    if MODE != "process":
+        return [target(*deepcopy(args))]
+    with POOL["broadcast"]:
+        workers = []
+        try:
+            for _ in range(WORKERS):
+                workers.append(checkout())
+        except BaseException:
+            for proc, conn, slots in workers:
+                checkin(proc, conn, slots)
+            raise
+    results = []
+    pending = list(workers)
+    try:
+        for proc, conn, slots in workers:
+            try:
+                conn.send((target, args))
+            except (EOFError, OSError):
+                pass
+        while pending:
+            proc, conn, slots = pending[0]
+            result = None
+            try:
+                healthy = conn.poll(timeout)
+                if healthy:
+                    success, result = conn.recv()
+                    result = result if success else None
+            except (EOFError, OSError):
+                healthy = False
+            pending.pop(0)
+            checkin(proc, conn, slots, healthy=healthy)
+            results.append(result)
+    except BaseException:
+        # unpicklable args, KeyboardInterrupt, etc; never leak the workers
+        for proc, conn, slots in pending:
+            checkin(proc, conn, slots, healthy=False)
+        raise
+    return results
+
+
+def shutdown():
+    """
+    stop every pooled worker process and thread
+    """
+    with POOL["lock"]:
+        idle, POOL["idle"] = POOL["idle"], []
+        threads, POOL["threads"] = POOL["threads"], None
+        POOL["slots"] = None
+    for proc, conn in idle:
+        try:
+            conn.send(None)
+        except Exception:
+            pass
+        proc.join(0.5)
+        kill_worker(proc, conn)
+    if threads is not None:
+        threads.shutdown(wait=False)
+
+
+atexit.register(shutdown)
+
+
+def demo():
+    """
+    compare executor modes on a trivial target
+    """
+    for mode in ["spawn", "process", "thread", "inline"]:
+        set_mode(mode)
+        begin = time.time()
+        for _ in range(20):
+            execute(time.time, (), 5)
+        print(mode, "%.4f" % ((time.time() - begin) / 20), "seconds per call")
+    shutdown()
+
+
+if __name__ == "__main__":
+    demo()
@@ -0,0 +1,146 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Concurrent Cross Exchange Price And Book
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pprint import pprint
+
+# CEX MODULES
+from cex_public import get_book, get_price
+from utilities import trace
+
+# GLOBAL USER DEFINED CONSTANTS
+EXCHANGES = [
+    "bittrex",
+    "bitfinex",
+    "binance",
+    "poloniex",
+    "coinbase",
+    "kraken",
+    "kucoin",
+]
+DEADLINE = 10  # seconds for the whole fan out
+DEPTH = 10
+
+
+def about():
+    """
+    FAN OUT USAGE
+
+    from fan_out import fan_out
+
+    ret = fan_out("BTC:USD", ["coinbase", "kraken", "bitfinex"], deadline=3)
+    ret["best_bid"]     # {"exchange": "kraken", "price": 9000.1, "volume": 2.0}
+
+    ABOUT
+
+    price and book of one pair at many exchanges, all requested at once
+    everything which has not landed by the deadline is reported missing
+    a slow or failing venue never holds back the others
+
+    RETURNS
+
+    {
+        "results": {exchange: {"price": float, "book": {...}}},
+        "missing": {exchange: {"price" or "book": reason}},
+        "best_bid": {"exchange", "price", "volume"} or None,
+        "best_ask": {"exchange", "price", "volume"} or None,
+        "spread": best ask - best bid or None,
+        "crossed": True if the best bid is above the best ask,
+        "elapsed": seconds,
+    }
+    """
+    print(about.__doc__)
+
+
+def fan_out(pair, exchanges=None, depth=DEPTH, deadline=DEADLINE, kinds=None):
+    """
+    price and / or book of pair at every exchange concurrently
+    kinds is a list of "price" and / or "book"; default both
+    """
+    begin = time.time()
+    exchanges = list(EXCHANGES if exchanges is None else exchanges)
+    kinds = list(kinds or ["price", "book"])
+    targets = {"price": get_price, "book": lambda api: get_book(api, depth)}
+    pool = ThreadPoolExecutor(max(len(exchanges) * len(kinds), 1))
+    futures = {}
+    for exchange in exchanges:
+        for kind in kinds:
+            api = {"exchange": exchange, "pair": pair}
+            futures[pool.submit(targets[kind], api)] = (exchange, kind)
+    done, _ = wait(futures, timeout=max(deadline - (time.time() - begin), 0))
+    # stragglers finish in the background; nobody waits for them
+    pool.shutdown(wait=False)
+    results, missing = {}, {}
+    for future, (exchange, kind) in futures.items():
+        if future not in done:
+            missing.setdefault(exchange, {})[kind] = "deadline"
+            continue
+        try:
+            results.setdefault(exchange, {})[kind] = future.result()
+        except Exception as error:
+            missing.setdefault(exchange, {})[kind] = trace(error)
+    ret = {"results": results, "missing": missing}
+    ret.update(top_of_book(results))
+    ret["elapsed"] = time.time() - begin
+    return ret
+
+
+def top_of_book(results):
+    """
+    consolidated best bid and best ask among the venues with a book
+    """
+    best_bid = best_ask = None
+    for exchange, result in results.items():
+        book = result.get("book")
+        if book is None:
+            continue
+        if len(book["bidp"]) and (
+            best_bid is None or book["bidp"][0] > best_bid["price"]
+        ):
+            best_bid = {
+                "exchange": exchange,
+                "price": float(book["bidp"][0]),
+                "volume": float(book["bidv"][0]),
+            }
+        if len(book["askp"]) and (
+            best_ask is None or book["askp"][0] < best_ask["price"]
+        ):
+            best_ask = {
+                "exchange": exchange,
+                "price": float(book["askp"][0]),
+                "volume": float(book["askv"][0]),
+            }
+    spread = None
+    if best_bid is not None and best_ask is not None:
+        spread = best_ask["price"] - best_bid["price"]
+    return {
+        "best_bid": best_bid,
+        "best_ask": best_ask,
+        "spread": spread,
+        "crossed": spread is not None and spread < 0,
+    }
+
+
+def demo():
+    """
+    BTC:USD top of book across the venues which list it
+    """
+    ret = fan_out("BTC:USD", ["bitfinex", "coinbase", "kraken", "bittrex"], deadline=5)
+    pprint({k: v for k, v in ret.items() if k != "results"})
+    for exchange, result in ret["results"].items():
+        print(exchange, result.get("price"))
+
+
+if __name__ == "__main__":
+    demo()
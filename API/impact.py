@@ -0,0 +1,123 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Market Impact And Slippage Of A Book
+
+litepresence 2019
+"""
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# GLOBAL USER DEFINED CONSTANTS
+# the side of the book each order side takes from, and the sign which makes
+# its prices ascend away from the touch
+SIDES = {"buy": ("askp", "askv", 1.0), "sell": ("bidp", "bidv", -1.0)}
+
+
+def about():
+    """
+    IMPACT USAGE
+
+    from impact import impact, max_size, order_edict
+
+    book = get_book(api, 50)
+    sizes = np.linspace(0, 100, 5000)
+    ret = impact(book, "buy", sizes)
+    ret["average"], ret["worst"], ret["slippage"], ret["filled"]
+    max_size(book, "sell", [5, 10, 25])     # largest sizes within those bps
+    post_order(order_edict(book, "buy", 12.5), api)
+
+    ABOUT
+
+    a market order of each size walks the book from the touch
+    buy takes the asks, sell takes the bids
+    average is the mean fill price, worst the last level touched
+    slippage is the average fill against the best price, in basis points;
+    positive is worse
+    filled is the amount the book can take, at most the size asked
+    when the book runs out the order is priced on what it holds
+    every size is priced at once with cumsum and searchsorted
+    """
+    print(about.__doc__)
+
+
+def levels(book, side):
+    """
+    (signed prices, cumulative volume, cumulative signed notional) of a side
+    the cumulative sums begin with 0, before the first level
+    """
+    prices, volumes, sign = SIDES[side]
+    prices = sign * np.asarray(book[prices], dtype=np.float64)
+    volumes = np.asarray(book[volumes], dtype=np.float64)
+    volume = np.zeros(len(prices) + 1)
+    notional = np.zeros(len(prices) + 1)
+    np.cumsum(volumes, out=volume[1:])
+    np.cumsum(prices * volumes, out=notional[1:])
+    return prices, volume, notional
+
+
+def impact(book, side, sizes):
+    """
+    {"average", "worst", "slippage", "filled"} arrays of market orders of
+    sizes against a get_book() book; side is "buy" or "sell"
+    """
+    sizes = np.asarray(sizes, dtype=np.float64)
+    prices, volume, notional = levels(book, side)
+    sign = SIDES[side][2]
+    if not len(prices):
+        nan = np.full(sizes.shape, np.nan)
+        return {"average": nan, "worst": nan, "slippage": nan, "filled": 0 * sizes}
+    filled = np.minimum(sizes, volume[-1])
+    # the level each order fills on
+    index = np.minimum(np.searchsorted(volume[1:], filled), len(prices) - 1)
+    cost = notional[index] + (filled - volume[index]) * prices[index]
+    average = np.divide(
+        cost, filled, out=np.full(filled.shape, prices[0]), where=filled > 0
+    )
+    return {
+        "average": sign * average,
+        "worst": sign * prices[index],
+        "slippage": (average - prices[0]) * (1e4 / abs(prices[0])),
+        "filled": filled,
+    }
+
+
+def max_size(book, side, bps):
+    """
+    largest market order sizes whose slippage stays within bps basis points
+    the whole side if it never gets that far
+    """
+    bps = np.asarray(bps, dtype=np.float64)
+    prices, volume, notional = levels(book, side)
+    if not len(prices):
+        return np.zeros(bps.shape)
+    limit = prices[0] + abs(prices[0]) * bps / 1e4
+    # the average price once each level is taken whole, ascending
+    index = np.searchsorted(notional[1:] / volume[1:], limit, side="right")
+    last = np.minimum(index, len(prices) - 1)
+    # solve (notional + (size - volume) * price) / size == limit on that level
+    size = np.divide(
+        notional[last] - volume[last] * prices[last],
+        limit - prices[last],
+        out=np.full(bps.shape, volume[-1]),
+        where=index < len(prices),
+    )
+    return np.where(index > 0, size, 0.0)
+
+
+def order_edict(book, side, amount=None, bps=None):
+    """
+    post_order() edict taking amount at once, or the most within bps
+    priced at the worst level it reaches; amount is capped at the book
+    """
+    if amount is None:
+        amount = float(max_size(book, side, bps))
+    ret = impact(book, side, [amount])
+    return {
+        "side": side,
+        "amount": float(ret["filled"][0]),
+        "price": float(ret["worst"][0]),
+    }
@@ -0,0 +1,209 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Incrementally Updated Order Book
+
+litepresence 2019
+"""
+
+# STANDARD MODULES
+from threading import Lock
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from cex_public import get_book
+
+# GLOBAL USER DEFINED CONSTANTS
+CAPACITY = 256  # levels per side before the arrays grow
+# sign which turns prices into keys ascending toward the best level
+SIGNS = {"bid": 1.0, "ask": -1.0}
+
+
+def about():
+    """
+    ORDER BOOK USAGE
+
+    from order_book import book_snapshot, update, best, depth_of_market
+
+    book = book_snapshot({"exchange": "kraken", "pair": "XBT:USD"}, 50)
+    update(book, "bid", 9000.5, 1.25)       # add or resize a level
+    update(book, "ask", 9001.0, 0)          # size 0 deletes the level
+    update_many(book, "bid", prices, sizes) # a whole diff message at once
+    best(book, "bid")                       # (price, size) or None
+    dom = depth_of_market(book, 10)         # get_book() format
+
+    ABOUT
+
+    a book is a dict holding one pair of sorted arrays per side
+    levels are kept by key, price for bids and -price for asks, ascending,
+    so the best level of either side is always the last one held
+    best() is a single index; depth_of_market() a slice off the end
+    a level is found by binary search; a resize is done in place and an
+    insert or delete only moves the levels between it and the touch,
+    where nearly all of the traffic is
+    large diffs are merged as one vectorized sort instead
+    book_snapshot() starts a book from get_book(); load() resets one from any
+    snapshot in that format, polled or from a stream
+    """
+    print(about.__doc__)
+
+
+def new_side(capacity=CAPACITY):
+    """
+    empty side; keys ascending toward the best level
+    """
+    return {"keys": np.empty(capacity), "sizes": np.empty(capacity), "count": 0}
+
+
+def new_book(capacity=CAPACITY):
+    """
+    empty book
+    """
+    return {
+        "bid": new_side(capacity),
+        "ask": new_side(capacity),
+        "lock": Lock(),
+    }
+
+
+def book_snapshot(api, depth=50, cache=False):
+    """
+    new book from a get_book() snapshot of api["pair"]
+    """
+    book = new_book()
+    load(book, get_book(api, depth, cache))
+    return book
+
+
+def load(book, dom):
+    """
+    replace every level with a get_book() style snapshot
+    {"bidv": [], "bidp": [], "askp": [], "askv": []}
+    """
+    with book["lock"]:
+        for side, prices, sizes in [
+            ("bid", dom["bidp"], dom["bidv"]),
+            ("ask", dom["askp"], dom["askv"]),
+        ]:
+            book[side] = new_side(max(CAPACITY, 2 * len(prices)))
+            merge(book[side], SIGNS[side], prices, sizes)
+
+
+def update(book, side, price, size):
+    """
+    set the size of one level; size 0 deletes it
+    """
+    with book["lock"]:
+        level(book[side], SIGNS[side] * price, size)
+
+
+def update_many(book, side, prices, sizes):
+    """
+    set the sizes of many levels of one side; sizes of 0 delete them
+    when two updates name one price the last wins
+    """
+    with book["lock"]:
+        data = book[side]
+        if len(prices) > max(data["count"] // 8, 8):
+            merge(data, SIGNS[side], prices, sizes)
+            return
+        for price, size in zip(prices, sizes):
+            level(data, SIGNS[side] * price, size)
+
+
+def truncate(book, side, depth):
+    """
+    drop all but the best depth levels of one side
+    """
+    with book["lock"]:
+        data = book[side]
+        count = data["count"]
+        if count > depth:
+            for field in ["keys", "sizes"]:
+                data[field][:depth] = data[field][count - depth : count]
+            data["count"] = depth
+
+
+def best(book, side):
+    """
+    (price, size) of the best bid or ask; None if the side is empty
+    """
+    with book["lock"]:
+        data = book[side]
+        if not data["count"]:
+            return None
+        last = data["count"] - 1
+        return SIGNS[side] * data["keys"][last], data["sizes"][last]
+
+
+def depth_of_market(book, depth=10):
+    """
+    the best depth levels per side in get_book() format
+    """
+    dom = {}
+    with book["lock"]:
+        for side in ["bid", "ask"]:
+            data = book[side]
+            count = data["count"]
+            begin = max(count - depth, 0)
+            dom[side + "p"] = SIGNS[side] * data["keys"][begin:count][::-1]
+            dom[side + "v"] = data["sizes"][begin:count][::-1].copy()
+    return {key: dom[key] for key in ["bidv", "bidp", "askp", "askv"]}
+
+
+def level(data, key, size):
+    """
+    set or delete one level of a side by key; caller holds the lock
+    """
+    keys, sizes, count = data["keys"], data["sizes"], data["count"]
+    index = int(np.searchsorted(keys[:count], key))
+    found = index < count and keys[index] == key
+    if found and size:
+        sizes[index] = size
+    elif found:
+        # close the gap; only the levels nearer the touch move
+        keys[index : count - 1] = keys[index + 1 : count]
+        sizes[index : count - 1] = sizes[index + 1 : count]
+        data["count"] = count - 1
+    elif size:
+        if count == len(keys):
+            grow(data)
+            keys, sizes = data["keys"], data["sizes"]
+        keys[index + 1 : count + 1] = keys[index:count]
+        sizes[index + 1 : count + 1] = sizes[index:count]
+        keys[index] = key
+        sizes[index] = size
+        data["count"] = count + 1
+
+
+def grow(data):
+    """
+    double the capacity of a side
+    """
+    count = data["count"]
+    for field in ["keys", "sizes"]:
+        values = np.empty(2 * len(data[field]))
+        values[:count] = data[field][:count]
+        data[field] = values
+
+
+def merge(data, sign, prices, sizes):
+    """
+    apply many levels to a side as one sort; caller holds the lock
+    """
+    count = data["count"]
+    keys = np.concatenate([data["keys"][:count], sign * np.asarray(prices, float)])
+    values = np.concatenate([data["sizes"][:count], np.asarray(sizes, float)])
+    # the newest entry for each key wins; np.unique keeps the first seen
+    _, index = np.unique(keys[::-1], return_index=True)
+    index = len(keys) - 1 - index
+    index = index[values[index] != 0]
+    while len(data["keys"]) < len(index):
+        grow(data)
+    data["keys"][: len(index)] = keys[index]
+    data["sizes"][: len(index)] = values[index]
+    data["count"] = len(index)
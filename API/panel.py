@@ -0,0 +1,129 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Multi Pair Candle Panel On A Common Time Grid
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+from concurrent.futures import ThreadPoolExecutor
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from cex_public import COLUMNS, fill_buckets, get_candles
+from utilities import trace
+
+# GLOBAL USER DEFINED CONSTANTS
+WORKERS = 8  # pairs fetched at once
+
+
+def about():
+    """
+    PANEL USAGE
+
+    from panel import get_panel
+
+    pairs = ["BTC:USDT", "ETH:USDT", "LTC:USDT"]
+    panel = get_panel("binance", pairs, start, end, 3600)
+    panel["close"]          # shape (len(panel["pairs"]), len(panel["unix"]))
+    returns = np.diff(np.log(panel["close"]), axis=1)
+
+    ABOUT
+
+    one get_candles() call per pair, WORKERS at a time
+    every pair is laid on the same unix axis of bar open times, one column
+    per interval from the oldest candle of any pair to the newest
+    gaps after a pair's first candle are filled with its previous close and
+    zero volume, as get_candles() itself does; every field is NaN before it
+    rows follow panel["pairs"]; pairs which failed are left out and listed in
+    panel["missing"] with the reason
+
+    RETURNS
+
+    {
+        "pairs": [pair, ...],
+        "unix": int array (n_bars,),
+        "high", "low", "open", "close", "volume": float arrays (n_pairs, n_bars),
+        "missing": {pair: reason},
+    }
+    """
+    print(about.__doc__)
+
+
+def get_panel(
+    exchange,
+    pairs,
+    start=None,
+    end=None,
+    interval=86400,
+    cache=None,
+    store=None,
+    workers=WORKERS,
+):
+    """
+    candles of many pairs at one exchange as 2-D arrays on a shared unix axis
+    """
+    apis = [{"exchange": exchange, "pair": pair} for pair in pairs]
+    fetched, missing = fetch_all(
+        apis, "pair", start, end, interval, cache, store, workers
+    )
+    panel = align(fetched, interval)
+    panel["missing"] = missing
+    return panel
+
+
+def fetch_all(apis, label, start, end, interval, cache, store, workers=WORKERS):
+    """
+    get_candles() of every api concurrently
+    ({api[label]: candles}, {api[label]: reason}) in the order of apis
+    """
+
+    def fetch(api):
+        return get_candles(api, start, end, interval, cache, store)
+
+    fetched, missing = {}, {}
+    with ThreadPoolExecutor(max(min(workers, len(apis)), 1)) as pool:
+        futures = {api[label]: pool.submit(fetch, api) for api in apis}
+        for name, future in futures.items():
+            try:
+                fetched[name] = future.result()
+            except Exception as error:
+                missing[name] = trace(error)
+    return fetched, missing
+
+
+def align(fetched, interval, label="pairs"):
+    """
+    {name: candles} to one row per name on the union unix axis
+    names without candles are left out; panel[label] lists the rows
+    every bar is placed by its open time; binance stamps bars one second
+    before their close, so unix is floored to the interval first
+    """
+    fetched = {
+        name: dict(data, unix=data["unix"] - data["unix"] % interval)
+        for name, data in fetched.items()
+    }
+    names = [name for name, data in fetched.items() if len(data["unix"])]
+    if names:
+        begin = min(int(fetched[name]["unix"][0]) for name in names)
+        stop = max(int(fetched[name]["unix"][-1]) for name in names)
+        unix = np.arange(begin, stop + 1, interval)
+    else:
+        unix = np.array([], dtype=np.int64)
+    panel = {label: names, "unix": unix}
+    for key in COLUMNS[:-1]:
+        panel[key] = np.full((len(names), len(unix)), np.nan)
+    for row, name in enumerate(names):
+        data = fetched[name]
+        filled = fill_buckets(data, unix, -1, interval, np.nan)
+        listed = unix >= data["unix"][0]
+        for key in COLUMNS[:-1]:
+            panel[key][row, listed] = filled[key][listed]
+    return panel
@@ -0,0 +1,222 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Per Exchange Token Bucket Rate Limiter
+
+litepresence 2019
+"""
+
+# STANDARD MODULES
+import asyncio
+import os
+import struct
+import time
+from threading import Lock
+
+# CEX MODULES
+from utilities import flock
+
+# GLOBAL USER DEFINED CONSTANTS
+# {exchange: (burst capacity in tokens, refill in tokens per second)}
+# one token is one ordinary call; from each exchange's documented limits
+LIMITS = {
+    "binance": (60, 20.0),  # 1200 request weight per minute
+    "bitfinex": (10, 1.5),  # 90 public calls per minute
+    "bittrex": (10, 1.0),  # 60 calls per minute
+    "coinbase": (6, 3.0),  # 3 per second, bursts of 6
+    "kraken": (15, 1.0),  # call counter max 15, decays ~1 per second
+    "kucoin": (30, 10.0),  # 30 calls per 3 seconds
+    "poloniex": (6, 6.0),  # 6 calls per second
+}
+# {exchange: {endpoint prefix: tokens}}; unlisted endpoints cost one token
+WEIGHTS = {
+    "binance": {
+        "/api/v1/ticker/allPrices": 2,
+        "/api/v3/account": 5,
+    },
+    "bitfinex": {
+        "/v2/candles": 3,  # 30 per minute vs 90 for ticker and book
+        "/v2/tickers": 3,
+    },
+    "kraken": {
+        "/0/public/OHLC": 2,
+    },
+}
+# lanes in priority order; the fraction of each bucket a lane may not touch
+# orders may drain the bucket, backfills leave half of it for everyone else
+LANES = ["order", "market", "backfill"]
+RESERVE = {"order": 0.0, "market": 0.2, "backfill": 0.5}
+POLL = 0.05  # max seconds between checks while throttled
+HOLD = 4 * POLL  # a throttled lane is "waiting" this long after its last check
+# bucket files shared by every process on this host
+PATH = str(os.path.dirname(os.path.abspath(__file__))) + "/rate_limit/"
+CLOCK = time.time  # wall clock; comparable across processes
+
+# one bucket file per exchange: tokens, last refill, waiting until per lane
+RECORD = struct.Struct("d" * (2 + len(LANES)))
+
+# module state; file descriptors never cross a fork
+FILES = {"pid": None, "fds": {}, "lock": Lock()}
+
+
+def about():
+    """
+    RATE LIMIT USAGE
+
+    from rate_limit import acquire
+
+    acquire(api, "order")   # blocks only while the exchange budget is spent
+    resp = request(api)
+
+    ABOUT
+
+    one token bucket per exchange, kept in a small file under PATH
+    every thread and every process on this host draws from the same bucket
+    updates happen under a thread lock plus an exclusive flock on that file
+    where there is no flock (windows) only threads of one process share it
+    calls go out as fast as LIMITS allow; WEIGHTS price heavier endpoints
+    lanes are "order", "market" (default) or "backfill"
+    cex_private orders and cancels use "order", candle pages "backfill"
+    api["lane"], if present, overrides the lane of a call
+    lower lanes leave RESERVE of the bucket untouched
+    and yield entirely while a higher lane is waiting
+    a waiting lane refreshes its claim every POLL; claims expire after HOLD
+    so a process which dies while throttled cannot starve the others
+    """
+    print(about.__doc__)
+
+
+def weight(api):
+    """
+    tokens charged for api["endpoint"] at api["exchange"]
+    """
+    endpoint = str(api.get("endpoint", ""))
+    for prefix, tokens in WEIGHTS.get(api["exchange"], {}).items():
+        if endpoint.startswith(prefix):
+            return tokens
+    return 1
+
+
+def lane_index(api, lane):
+    """
+    priority of this call; api["lane"] overrides the caller's default
+    """
+    return LANES.index(api.get("lane", lane))
+
+
+def bucket_fd(exchange):
+    """
+    open file descriptor of the exchange bucket file in this process
+    caller holds FILES["lock"]
+    """
+    if FILES["pid"] != os.getpid():
+        FILES["pid"] = os.getpid()
+        FILES["fds"] = {}
+    key = PATH + exchange
+    if key not in FILES["fds"]:
+        os.makedirs(PATH, exist_ok=True)
+        FILES["fds"][key] = os.open(
+            key, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644
+        )
+    return FILES["fds"][key]
+
+
+def read_record(fd):
+    """
+    raw bytes of a bucket file; caller holds FILES["lock"]
+    seek and read rather than pread, which windows lacks
+    """
+    os.lseek(fd, 0, os.SEEK_SET)
+    return os.read(fd, RECORD.size)
+
+
+def try_acquire(api, lane="market", tokens=None):
+    """
+    take tokens for this call if its lane may; else seconds to wait
+    returns 0.0 on success
+    """
+    exchange = api["exchange"]
+    if exchange not in LIMITS:
+        return 0.0
+    capacity, rate = LIMITS[exchange]
+    lane = lane_index(api, lane)
+    floor = RESERVE[LANES[lane]] * capacity
+    # a lane can never spend below its floor; charge it at most what it may
+    tokens = min(weight(api) if tokens is None else tokens, capacity - floor)
+    with FILES["lock"]:
+        fd = bucket_fd(exchange)
+        flock(fd, "LOCK_EX")
+        try:
+            raw = read_record(fd)
+            now = CLOCK()
+            if len(raw) < RECORD.size:
+                record = [float(capacity), now] + [0.0] * len(LANES)
+            else:
+                record = list(RECORD.unpack(raw))
+            elapsed = max(now - record[1], 0.0)
+            level = min(float(capacity), record[0] + elapsed * rate)
+            record[0], record[1] = level, now
+            # a higher priority lane is queued; let it have the next tokens
+            ahead = any(record[2 + i] > now for i in range(lane))
+            if not ahead and level - tokens >= floor:
+                record[0] = level - tokens
+                pause = 0.0
+            else:
+                record[2 + lane] = now + HOLD
+                pause = min(max((tokens + floor - level) / rate, 0.0), POLL) or POLL
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, RECORD.pack(*record))
+        finally:
+            flock(fd, "LOCK_UN")
+    return pause
+
+
+def acquire(api, lane="market", tokens=None):
+    """
+    block until this call fits the exchange budget; returns seconds waited
+    """
+    begin = time.time()
+    pause = try_acquire(api, lane, tokens)
+    while pause:
+        time.sleep(pause)
+        pause = try_acquire(api, lane, tokens)
+    return time.time() - begin
+
+
+async def acquire_async(api, lane="market", tokens=None):
+    """
+    acquire() for coroutines; awaits instead of blocking the event loop
+    """
+    begin = time.time()
+    pause = try_acquire(api, lane, tokens)
+    while pause:
+        await asyncio.sleep(pause)
+        pause = try_acquire(api, lane, tokens)
+    return time.time() - begin
+
+
+def levels():
+    """
+    {exchange: tokens in the bucket file} as of its last update
+    """
+    ret = {}
+    with FILES["lock"]:
+        for exchange in LIMITS:
+            raw = read_record(bucket_fd(exchange))
+            if len(raw) == RECORD.size:
+                ret[exchange] = RECORD.unpack(raw)[0]
+    return ret
+
+
+def reset(exchange=None):
+    """
+    refill one or every bucket and clear waiting claims
+    """
+    with FILES["lock"]:
+        for name in [exchange] if exchange else list(LIMITS):
+            fd = bucket_fd(name)
+            flock(fd, "LOCK_EX")
+            os.ftruncate(fd, 0)
+            flock(fd, "LOCK_UN")
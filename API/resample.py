@@ -0,0 +1,82 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Local Candle Resampling
+
+litepresence 2019
+"""
+
+# THIRD PARTY MODULES
+import numpy as np
+
+
+def about():
+    """
+    RESAMPLE USAGE
+
+    from resample import resample, native_interval
+
+    native_interval(INTERVALS["coinbase"], 14400)   # 3600
+    four_hour = resample(hourly, 14400)
+
+    ABOUT
+
+    get_candles() calls these for any interval an exchange does not offer
+    the finest native interval which divides it is fetched, from the
+    candle store if enabled, and aggregated locally
+    buckets are aligned to the unix epoch; unix is the open of each bucket
+    open is the first open, close the last close, high the highest high,
+    low the lowest low and volume the sum in each bucket
+    the newest bucket may still be forming, as at the exchange
+    """
+    print(about.__doc__)
+
+
+def native_interval(intervals, interval):
+    """
+    the largest native interval which divides interval; None if none does
+    """
+    divisors = [native for native in intervals if not interval % native]
+    return max(divisors) if divisors else None
+
+
+def resample(data, interval):
+    """
+    dict of candle arrays to buckets of interval seconds
+    """
+    unix = data["unix"]
+    if not len(unix):
+        return data
+    bucket = unix - unix % interval
+    # index of the first candle in each bucket
+    first = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    last = np.r_[first[1:], len(unix)] - 1
+    aggregate = {
+        "high": lambda values: np.maximum.reduceat(values, first),
+        "low": lambda values: np.minimum.reduceat(values, first),
+        "open": lambda values: values[first],
+        "close": lambda values: values[last],
+        "volume": lambda values: np.add.reduceat(values, first),
+        "unix": lambda values: bucket[first],
+    }
+    return {key: aggregate[key](values) for key, values in data.items()}
+
+
+def resample_chunks(chunks, interval):
+    """
+    resample() a stream of consecutive candle chunks
+    the newest bucket of each chunk waits for the next one, which may extend it
+    """
+    held = None
+    for data in chunks:
+        if held is not None:
+            data = {k: np.concatenate([held[k], v]) for k, v in data.items()}
+        bucket = data["unix"] - data["unix"] % interval
+        ready = bucket < bucket[-1]
+        held = {k: v[~ready] for k, v in data.items()}
+        if ready.any():
+            yield resample({k: v[ready] for k, v in data.items()}, interval)
+    if held is not None:
+        yield resample(held, interval)
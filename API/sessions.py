@@ -0,0 +1,165 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+binance - bitfinex - bittrex - coinbase - kucoin - kraken - poloniex
+
+Pooled Keep-Alive HTTP Sessions
+
+litepresence 2019
+"""
+
+# pylint: disable=broad-except
+
+# STANDARD MODULES
+import os
+import time
+from threading import Lock
+
+# THIRD PARTY MODULES
+import requests
+from requests.adapters import HTTPAdapter
+
+# CEX MODULES
+from executor import broadcast
+
+# GLOBAL USER DEFINED CONSTANTS
+TIMEOUT = 10
+POOL_CONNECTIONS = 4  # hosts cached per session
+POOL_MAXSIZE = 10  # keep-alive connections per host
+POOL_SIZES = {}  # per exchange override of POOL_MAXSIZE; ie {"binance": 20}
+
+# module state; sessions never cross a fork
+SESSIONS = {"pid": None, "urls": {}, "lock": Lock()}
+
+
+def about():
+    """
+    SESSIONS USAGE
+
+    from sessions import get_session, pool_prewarm, pool_stats
+
+    resp = get_session(api).request(method, url, ...)
+    pool_prewarm({"binance": "https://api.binance.com"})
+    print(pool_stats())
+
+    ABOUT
+
+    one requests.Session per exchange base url
+    each session keeps a pool of keep-alive connections
+    so DNS, TCP and TLS handshakes are paid once per connection, not per call
+    sessions live in the process which makes the request
+    in executor "process" mode that is each long lived worker
+    in executor "spawn" mode every request is a new process; nothing is reused
+    """
+    print(about.__doc__)
+
+
+def get_session(api):
+    """
+    pooled keep-alive session for api["url"], created on first use
+    """
+    url = api["url"]
+    with SESSIONS["lock"]:
+        # a forked child must not share sockets with its parent
+        if SESSIONS["pid"] != os.getpid():
+            SESSIONS["pid"] = os.getpid()
+            SESSIONS["urls"] = {}
+        session = SESSIONS["urls"].get(url)
+        if session is None:
+            size = POOL_SIZES.get(api.get("exchange"), POOL_MAXSIZE)
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=size)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            SESSIONS["urls"][url] = session
+    return session
+
+
+def prewarm(urls):
+    """
+    open a keep-alive connection to each {exchange: url} ahead of trading
+    returns {exchange: seconds to connect} or None if unreachable
+    """
+    elapsed = {}
+    for exchange, url in urls.items():
+        begin = time.time()
+        try:
+            get_session({"exchange": exchange, "url": url}).head(url, timeout=TIMEOUT)
+            elapsed[exchange] = time.time() - begin
+        except Exception:
+            elapsed[exchange] = None
+    return elapsed
+
+
+def session_stats():
+    """
+    connection reuse per base url in this process
+
+    {url: {"requests": int, "connections": int, "reuse": float}}
+
+    reuse is the fraction of requests which did not open a new connection
+    """
+    with SESSIONS["lock"]:
+        if SESSIONS["pid"] != os.getpid():
+            return {}
+        sessions = dict(SESSIONS["urls"])
+    stats = {}
+    for url, session in sessions.items():
+        counts = stats.setdefault(url, {"requests": 0, "connections": 0})
+        pools = session.get_adapter(url).poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)  # may be evicted meanwhile
+            if pool is not None:
+                counts["requests"] += pool.num_requests
+                counts["connections"] += pool.num_connections
+    return reuse_rates(stats)
+
+
+def merge_stats(stats):
+    """
+    combine a list of session_stats() from several worker processes
+    """
+    merged = {}
+    for stat in stats:
+        # a worker which failed to report contributes None
+        for url, counts in (stat or {}).items():
+            total = merged.setdefault(url, {"requests": 0, "connections": 0})
+            total["requests"] += counts["requests"]
+            total["connections"] += counts["connections"]
+    return reuse_rates(merged)
+
+
+def reuse_rates(stats):
+    """
+    add the "reuse" hit rate to request and connection counts
+    """
+    for counts in stats.values():
+        requests_made = counts["requests"]
+        counts["reuse"] = (
+            1 - counts["connections"] / float(requests_made) if requests_made else 0.0
+        )
+    return stats
+
+
+def pool_prewarm(urls):
+    """
+    prewarm() in every executor worker; returns a list of per worker results
+    """
+    return broadcast(prewarm, (urls,), TIMEOUT * max(len(urls), 1))
+
+
+def pool_stats():
+    """
+    session_stats() merged across every executor worker
+    """
+    return merge_stats(broadcast(session_stats, (), TIMEOUT))
+
+
+def close_sessions():
+    """
+    close every pooled session in this process
+    """
+    with SESSIONS["lock"]:
+        sessions, SESSIONS["urls"] = SESSIONS["urls"], {}
+    for session in sessions.values():
+        session.close()
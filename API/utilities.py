@@ -14,17 +14,33 @@ import time
 import traceback
 from calendar import timegm
 from datetime import datetime
+from functools import lru_cache
 from json import dumps as json_dumps
 from json import loads as json_loads
 
+try:
+    import fcntl
+except ImportError:  # windows; only the callers' thread locks apply there
+    fcntl = None
 
+# THIRD PARTY MODULES
+import numpy as np
+
+# GLOBAL USER DEFINED CONSTANTS
+# json_ipc text pipes; appended lines go to its comptroller subfolder
+PIPE_PATH = str(os.path.dirname(os.path.abspath(__file__))) + "/pipe/"
+
+
+@lru_cache(maxsize=4096)
 def from_iso_date(date):
     """
     ISO to UNIX conversion
+    cached; the same few window edges and timestamps recur between calls
     """
     return int(timegm(time.strptime(str(date), "%Y-%m-%dT%H:%M:%S")))
 
 
+@lru_cache(maxsize=4096)
 def to_iso_date(unix):
     """
     iso8601 datetime given unix epoch
@@ -32,6 +48,25 @@ def to_iso_date(unix):
     return datetime.utcfromtimestamp(int(unix)).isoformat()
 
 
+def from_iso_dates(dates):
+    """
+    ISO to UNIX conversion of many dates at once as an int64 array
+    parsed by numpy datetime64; anything it rejects goes one by one
+    """
+    try:
+        return np.array(dates, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        return np.array([from_iso_date(date) for date in dates], dtype=np.int64)
+
+
+def to_iso_dates(unix):
+    """
+    iso8601 datetimes of many unix epochs at once as an array of str
+    """
+    unix = np.asarray(unix).astype(np.int64).astype("datetime64[s]")
+    return np.datetime_as_string(unix)
+
+
 def symbol_syntax(exchange, symbol):
     """
     translate ticker symbol to each exchange's local syntax
@@ -75,6 +110,38 @@ def trace(error):
     return msg
 
 
+def flock(handle, operation):
+    """
+    fcntl.flock(handle, fcntl.<operation>), "LOCK_EX", "LOCK_SH" or "LOCK_UN"
+    a no-op where there is no fcntl; callers also hold a thread lock
+    """
+    if fcntl is not None:
+        fcntl.flock(handle, getattr(fcntl, operation))
+
+
+def pipe_doc(api):
+    """
+    name of the json_ipc text pipe file for one request attempt
+    """
+    return (
+        api["exchange"]
+        + api["pair"]
+        + str(int(10 ** 6 * api["nonce"]))
+        + "_{}_private.txt".format(api["exchange"])
+    )
+
+
+def pipe_pop(api):
+    """
+    read and destroy the json_ipc text pipe file for one request attempt
+    """
+    doc = pipe_doc(api)
+    data = json_ipc(doc)
+    if os.path.isfile(PIPE_PATH + doc):
+        os.remove(PIPE_PATH + doc)
+    return data
+
+
 def json_ipc(doc="", text="", initialize=False, append=False):
     """
     JSON IPC
@@ -119,7 +186,7 @@ def json_ipc(doc="", text="", initialize=False, append=False):
     if not act == "appending":
         tag = "<<< JSON IPC >>>"
     # determine where we are in the file system; change directory to pipe folder
-    path = os.path.dirname(os.path.abspath(__file__)) + "/pipe"
+    path = PIPE_PATH.rstrip("/")
     # ensure we're writing json then add prescript and postscript for clipping
     try:
         text = tag + json_dumps(json_loads(text)) + tag if text else text
@@ -0,0 +1,126 @@
+"""
+CEX - Centralized Exchange API Wrapper
+
+pytest configuration; the API modules import each other flat from API/
+"""
+
+# STANDARD MODULES
+import os
+import sys
+import time
+from http.server import ThreadingHTTPServer
+from json import dumps as json_dumps
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+# THIRD PARTY MODULES
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "API"))
+
+# CEX MODULES
+# pylint: disable=wrong-import-position
+import cex_private  # noqa: E402
+import cex_public  # noqa: E402
+import executor  # noqa: E402
+import rate_limit  # noqa: E402
+import utilities  # noqa: E402
+from benchmark import StubHandler  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def private_buckets(monkeypatch, tmp_path):
+    """
+    rate limit buckets in a temp dir, never the shared ones under API/
+    """
+    monkeypatch.setattr(rate_limit, "PATH", str(tmp_path) + "/buckets/")
+
+
+@pytest.fixture(autouse=True)
+def private_pipes(monkeypatch, tmp_path):
+    """
+    json_ipc text pipes in a temp dir, never the shared ones under API/
+    workers forked during the test inherit it
+    """
+    monkeypatch.setattr(utilities, "PIPE_PATH", str(tmp_path) + "/pipe/")
+
+
+@pytest.fixture(name="stub")
+def fixture_stub():
+    """
+    local exchange serving GET, POST and DELETE
+    returns a dict of base "url", the "paths" it served and every "request"
+    set stub["body"] to bytes, or to a function of the request record
+    returning bytes or a json serializable object
+    set stub["delay"] to hold each response; "inflight" peaks are recorded
+    """
+    state = {
+        "paths": [],
+        "requests": [],
+        "body": StubHandler.body,
+        "delay": 0,
+        "inflight": 0,
+        "peak": 0,
+        "lock": Lock(),
+    }
+
+    class Handler(StubHandler):
+        """
+        canned or computed response from the fixture state; records requests
+        """
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            record = {
+                "method": self.command,
+                "path": url.path,
+                "query": {k: v[-1] for k, v in parse_qs(url.query).items()},
+                "headers": dict(self.headers),
+                "body": self.rfile.read(length).decode(),
+            }
+            with state["lock"]:
+                state["paths"].append(self.path)
+                state["requests"].append(record)
+                state["inflight"] += 1
+                state["peak"] = max(state["peak"], state["inflight"])
+            time.sleep(state["delay"])
+            body = state["body"]
+            body = body(record) if callable(body) else body
+            if not isinstance(body, bytes):
+                body = json_dumps(body).encode()
+            with state["lock"]:
+                state["inflight"] -= 1
+            self.body = body
+            super().do_GET()
+
+        do_POST = do_GET  # pylint: disable=invalid-name
+        do_DELETE = do_GET  # pylint: disable=invalid-name
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = "http://127.0.0.1:%s" % server.server_address[1]
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(name="coinbase")
+def fixture_coinbase(stub, monkeypatch):
+    """
+    coinbase public calls, and private calls at any exchange, routed to the
+    stub with no rate limits; sync calls run inline
+    the default process pool is restored afterwards
+    """
+    monkeypatch.setitem(cex_public.URLS, "coinbase", stub["url"])
+
+    def lookup_url(api):
+        api["url"] = stub["url"]
+        return api
+
+    monkeypatch.setattr(cex_private, "lookup_url", lookup_url)
+    monkeypatch.setattr(rate_limit, "LIMITS", {})
+    executor.set_mode("inline")
+    yield stub
+    executor.set_mode("process", workers=8)
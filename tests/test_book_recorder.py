@@ -0,0 +1,176 @@
+"""
+order book snapshots recorded to disk and replayed
+"""
+
+# STANDARD MODULES
+import os
+from threading import Event
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import book_recorder
+from book_recorder import close_recorder, load, open_recorder, record, replay
+from cex_public import book_buffer
+
+API = {"exchange": "kraken", "pair": "XBT:USD"}
+OTHER = {"exchange": "coinbase", "pair": "BTC:USD"}
+
+
+@pytest.fixture(autouse=True)
+def books_path(monkeypatch, tmp_path):
+    """
+    recorded books in a temp dir
+    """
+    monkeypatch.setattr(book_recorder, "PATH", str(tmp_path) + "/books/")
+
+
+def random_books(count, depth, seed=0):
+    """
+    books which mostly repeat or move a few levels, of varying depth
+    """
+    rng = np.random.default_rng(seed)
+    books = []
+    bidp = 100 - np.cumsum(rng.random(depth + 5))
+    askp = 100 + np.cumsum(rng.random(depth + 5))
+    bidv, askv = rng.random(depth + 5), rng.random(depth + 5)
+    for _ in range(count):
+        if rng.random() < 0.7:
+            moved = rng.integers(0, depth + 5, 3)
+            bidv[moved] = rng.random(3)
+            askv[moved] = rng.random(3) * 1e-7
+        bids, asks = rng.integers(0, depth + 5, 2)
+        books.append(
+            {
+                "bidv": bidv[:bids].copy(),
+                "bidp": bidp[:bids].copy(),
+                "askp": askp[:asks].copy(),
+                "askv": askv[:asks].copy(),
+            }
+        )
+    return books
+
+
+def assert_loaded(data, books, unix, depth):
+    assert data["unix"].tolist() == unix
+    for row, book in enumerate(books):
+        for field in book_recorder.FIELDS:
+            count = data["bids" if field[:3] == "bid" else "asks"][row]
+            assert count == min(len(book[field]), depth)
+            assert data[field][row, :count].tolist() == book[field][:depth].tolist()
+            assert np.isnan(data[field][row, count:]).all()
+
+
+@pytest.mark.parametrize("delta", [True, False])
+def test_round_trip(delta):
+    depth = 10
+    books = random_books(50, depth)
+    recorder = open_recorder(depth, delta=delta, keyframe=7)
+    for unix, book in enumerate(books):
+        assert record(recorder, API, book, 1000 + unix)
+    close_recorder(recorder)
+    assert recorder["written"] == 50 and recorder["dropped"] == 0
+    path = book_recorder.series_path("kraken", "XBT:USD", depth)
+    assert os.path.getsize(path + "books.bin") == 50 * (16 + 32 * depth)
+    unix = list(range(1000, 1050))
+    assert_loaded(load("kraken", "XBT:USD", depth), books, unix, depth)
+    # a window from the middle of a keyframe group
+    data = load("kraken", "XBT:USD", depth, 1010, 1030)
+    assert_loaded(data, books[10:31], unix[10:31], depth)
+    assert len(load("kraken", "XBT:USD", depth, 2000)["unix"]) == 0
+    assert len(load("kraken", "XBT:USD", 20)["unix"]) == 0
+
+
+def test_delta_stores_unchanged_levels_as_zeros():
+    book = random_books(1, 10)[0]
+    recorder = open_recorder(10, delta=True, keyframe=4)
+    for unix in range(8):
+        record(recorder, API, book, unix)
+    close_recorder(recorder)
+    path = book_recorder.series_path("kraken", "XBT:USD", 10)
+    dtype = book_recorder.record_dtype(10, True)
+    rows = np.fromfile(path + "books.bin", dtype)
+    assert [bool(row.any()) for row in rows["book"]] == [True, False, False, False] * 2
+
+
+def test_reopen_appends_and_cuts_torn_record():
+    books = random_books(30, 5, seed=1)
+    for begin, stop in [(0, 13), (13, 30)]:
+        recorder = open_recorder(5, delta=True, keyframe=4)
+        for unix in range(begin, stop):
+            record(recorder, API, books[unix], unix)
+        close_recorder(recorder)
+        path = book_recorder.series_path("kraken", "XBT:USD", 5)
+        with open(path + "books.bin", "ab") as handle:
+            handle.write(b"torn")
+    assert_loaded(load("kraken", "XBT:USD", 5), books, list(range(30)), 5)
+
+
+def test_record_copies_the_buffer():
+    buffer = book_buffer(5)
+    buffer["bidp"][:2] = [10, 9]
+    buffer["bidv"][:2] = [1, 2]
+    buffer["bids"] = 2
+    recorder = open_recorder(5)
+    record(recorder, API, buffer, 1)
+    buffer["bidp"][:] = 0
+    buffer["bids"] = 0
+    close_recorder(recorder)
+    data = load("kraken", "XBT:USD", 5)
+    assert data["bids"].tolist() == [2] and data["asks"].tolist() == [0]
+    assert data["bidp"][0, :2].tolist() == [10, 9]
+    path = book_recorder.series_path("kraken", "XBT:USD", 5)
+    assert book_recorder.read_meta(path)["delta"] is False
+
+
+def test_full_buffer_drops_without_blocking(monkeypatch):
+    release = Event()
+    write = book_recorder.write
+
+    def slow_write(recorder, key, snapshots):
+        release.wait(5)
+        write(recorder, key, snapshots)
+
+    monkeypatch.setattr(book_recorder, "write", slow_write)
+    recorder = open_recorder(5, buffer=3)
+    book = random_books(1, 5)[0]
+    kept = [record(recorder, API, book, unix) for unix in range(20)]
+    assert kept.count(False) >= 16 and recorder["dropped"] == kept.count(False)
+    release.set()
+    close_recorder(recorder)
+    assert recorder["written"] == kept.count(True)
+
+
+def test_replay_in_time_order():
+    books = random_books(40, 5, seed=2)
+    recorder = open_recorder(5, delta=True, keyframe=3)
+    for unix, book in enumerate(books):
+        record(recorder, [API, OTHER][unix % 2], book, 100 + unix)
+    close_recorder(recorder)
+    replayed = list(replay([OTHER, API], 5, 105, 130))
+    assert [unix for _, unix, _ in replayed] == list(range(105, 131))
+    for api, unix, book in replayed:
+        assert api == [API, OTHER][int(unix) % 2]
+        assert list(book) == ["bidv", "bidp", "askp", "askv"]
+        for field, values in book.items():
+            assert values.tolist() == books[int(unix) - 100][field][:5].tolist()
+
+
+def test_poll_books(monkeypatch):
+    book = random_books(1, 5)[0]
+
+    def get_book(api, depth, cache=None, out=None):
+        if api["exchange"] == "bittrex":
+            raise ConnectionError("down")
+        return book
+
+    monkeypatch.setattr(book_recorder, "get_book", get_book)
+    recorder = open_recorder(5)
+    apis = [API, OTHER, {"exchange": "bittrex", "pair": "BTC:USD"}]
+    book_recorder.poll_books(recorder, apis, interval=0, rounds=3)
+    close_recorder(recorder)
+    assert recorder["written"] == 6 and recorder["failed"] == 3
+    assert "ConnectionError" in recorder["error"]
+    assert len(load("coinbase", "BTC:USD", 5)["unix"]) == 3
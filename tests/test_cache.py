@@ -0,0 +1,149 @@
+"""
+bounded ttl cache under get_price, get_book and get_candles
+"""
+
+# STANDARD MODULES
+import time
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import cache
+import cex_public
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """
+    fake clock and an empty cache around every test
+    """
+    now = [1000000.0]
+    monkeypatch.setattr(cache, "CLOCK", lambda: now[0])
+    cache.clear()
+    yield now
+    cache.clear()
+
+
+def counter():
+    calls = []
+
+    def target(value):
+        calls.append(value)
+        return {"value": value, "call": len(calls)}
+
+    return calls, target
+
+
+def test_ttl(clock):
+    calls, target = counter()
+    assert cache.cache_call(("price", 1), 5, True, target, "a")["call"] == 1
+    clock[0] += 4.9
+    assert cache.cache_call(("price", 1), 5, True, target, "a")["call"] == 1
+    clock[0] += 0.2
+    assert cache.cache_call(("price", 1), 5, True, target, "a")["call"] == 2
+    assert cache.cache_stats()["hits"] == 1
+    assert cache.cache_stats()["misses"] == 2
+
+
+def test_bypass_and_opt_in(monkeypatch):
+    calls, target = counter()
+    cache.cache_call(("price", 1), 5, None, target, "a")
+    cache.cache_call(("price", 1), 5, None, target, "a")
+    assert len(calls) == 2
+    monkeypatch.setattr(cache, "CACHE", True)
+    cache.cache_call(("price", 1), 5, None, target, "a")
+    cache.cache_call(("price", 1), 5, False, target, "a")
+    cache.cache_call(("price", 1), 5, None, target, "a")
+    assert len(calls) == 4
+
+
+def test_callers_get_copies():
+    _, target = counter()
+    first = cache.cache_call(("book", 1), 1, True, target, "a")
+    first["value"] = "mutated"
+    assert cache.cache_call(("book", 1), 1, True, target, "a")["value"] == "a"
+
+
+def test_lru_bounded_by_entries(monkeypatch):
+    monkeypatch.setattr(cache, "MAX_ENTRIES", 2)
+    calls, target = counter()
+    for key in [1, 2, 1, 3]:
+        cache.cache_call(("price", key), 5, True, target, key)
+    # 2 was least recently used when 3 arrived
+    cache.cache_call(("price", 1), 5, True, target, 1)
+    cache.cache_call(("price", 2), 5, True, target, 2)
+    assert calls == [1, 2, 3, 2]
+    assert cache.cache_stats()["entries"] == 2
+
+
+def test_lru_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(cache, "MAX_BYTES", 2500)
+    for key in range(4):
+        cache.store(("book", key), {"bidp": np.zeros(100)}, 1, 0)
+    stats = cache.cache_stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= 2500
+    assert stats["evictions"] == 2
+    # too large to ever fit; not kept
+    cache.store(("book", 9), {"bidp": np.zeros(1000)}, 1, 0)
+    assert cache.lookup(("book", 9)) == (None, None)
+
+
+def test_stale_while_revalidate(clock):
+    calls, target = counter()
+    cache.cache_call(("price", 1), 5, "stale", target, "a")
+    clock[0] += 10
+    # expired but within the STALE grace: old answer at once, refresh behind
+    assert cache.cache_call(("price", 1), 5, "stale", target, "a")["call"] == 1
+    begin = time.time()
+    while len(calls) < 2 and time.time() - begin < 5:
+        time.sleep(0.01)
+    while cache.ENTRIES["refreshing"] and time.time() - begin < 5:
+        time.sleep(0.01)
+    assert cache.cache_call(("price", 1), 5, "stale", target, "a")["call"] == 2
+    assert cache.cache_stats()["stale"] == 1
+    # past the grace the caller waits for a fresh answer
+    clock[0] += 5 + cache.STALE["price"]
+    assert cache.cache_call(("price", 1), 5, "stale", target, "a")["call"] == 3
+
+
+def test_refresh_gets_its_own_api(clock):
+    seen = []
+
+    def target(api):
+        api["nonce"] = len(seen)
+        seen.append(api)
+        return len(seen)
+
+    api = {"exchange": "coinbase", "pair": "BTC:USD"}
+    cache.cache_call(("price", 1), 5, "stale", target, api)
+    clock[0] += 10
+    cache.cache_call(("price", 1), 5, "stale", target, api)
+    deadline = time.time() + 5
+    while len(seen) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(seen) == 2 and seen[1] is not api
+    assert seen[1]["pair"] == "BTC:USD" and api["nonce"] == 0
+
+
+def test_candle_ttl(clock):
+    clock[0] = 86400 * 100 + 3600
+    assert cache.candle_ttl(None, 86400) == 86400 - 3600
+    assert cache.candle_ttl(clock[0], 86400) == 86400 - 3600
+    assert cache.candle_ttl(86400 * 90, 86400) is None
+
+
+def test_get_price_and_book(coinbase):
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    assert cex_public.get_price(dict(api), cache=True) == 0.00713
+    assert cex_public.get_price(dict(api), cache=True) == 0.00713
+    assert len(coinbase["requests"]) == 1
+    coinbase["body"] = {"bids": [["1", "2", 1]], "asks": [["3", "4", 1]]}
+    cex_public.get_book(dict(api), cache=True)
+    book = cex_public.get_book(dict(api), cache=True)
+    assert np.array_equal(book["askp"], [3.0])
+    assert len(coinbase["requests"]) == 2
+    cex_public.get_book(dict(api), cache=False)
+    assert len(coinbase["requests"]) == 3
@@ -0,0 +1,84 @@
+"""
+incremental latest candles feed
+"""
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import candle_feed
+import cex_public
+from test_cex_async import unix
+
+NOW = [1600000000 + 30]
+
+
+def exchange(record):
+    """
+    coinbase candles up to NOW; the newest bar is still forming
+    """
+    query = record["query"]
+    interval = int(query["granularity"])
+    start, end = unix(query["start"]), min(unix(query["end"]), NOW[0])
+    times = range(start - start % interval + interval, end, interval)
+    # a bar every 7th minute is missing
+    return [
+        [t, 1.0, 3.0, 1.5, 2.0 + (t + NOW[0] * (t + interval > NOW[0])) % 7, 10.0]
+        for t in reversed(times)
+        if t % 420
+    ]
+
+
+@pytest.fixture(name="coinbase")
+def fixture_coinbase(coinbase, monkeypatch):
+    monkeypatch.setattr(candle_feed, "CLOCK", lambda: NOW[0])
+    NOW[0] = 1600000000 + 30
+    coinbase["body"] = exchange
+    return coinbase
+
+
+def test_feed(coinbase):
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    feed = candle_feed.open_feed(api, 60, 50)
+    data = candle_feed.window(feed)
+    assert len(data["unix"]) == 50
+    assert (np.diff(data["unix"]) == 60).all()
+    calls = len(coinbase["requests"])
+    # three minutes later
+    NOW[0] += 180
+    new = candle_feed.refresh(feed)
+    assert len(coinbase["requests"]) == calls + 1
+    query = coinbase["requests"][-1]["query"]
+    assert unix(query["start"]) == data["unix"][-1] - 60
+    fresh = candle_feed.window(feed)
+    assert fresh["unix"][-1] == data["unix"][-1] + 60 * new
+    assert (np.diff(fresh["unix"]) == 60).all()
+    assert len(fresh["unix"]) == 50
+    # the bars the feed holds are those a fresh get_candles() returns
+    expected = cex_public.get_candles(dict(api), NOW[0] - 60 * 60, NOW[0] - 60, 60)
+    common = np.isin(fresh["unix"], expected["unix"])
+    for key, values in fresh.items():
+        assert np.array_equal(values[common], expected[key][-common.sum() :])
+    assert candle_feed.window(feed, 3)["unix"].tolist() == fresh["unix"][-3:].tolist()
+    # the forming bar changes in place
+    NOW[0] += 1
+    assert candle_feed.refresh(feed) == 0
+    last = candle_feed.window(feed, 1)
+    assert last["unix"][0] == fresh["unix"][-1]
+    assert last["close"][0] != fresh["close"][-1]
+
+
+def test_ring_wraps():
+    feed = {
+        "size": 4,
+        "head": 0,
+        "count": 0,
+        "data": {k: np.zeros(4) for k in cex_public.COLUMNS},
+        "lock": candle_feed.Lock(),
+    }
+    for begin in [0, 3, 6]:
+        data = {k: np.arange(begin, begin + 3) * 1.0 for k in cex_public.COLUMNS}
+        candle_feed.append(feed, data)
+    assert candle_feed.window(feed)["unix"].tolist() == [5.0, 6.0, 7.0, 8.0]
+    assert candle_feed.window(feed, 2)["close"].tolist() == [7.0, 8.0]
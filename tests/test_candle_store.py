@@ -0,0 +1,116 @@
+"""
+persistent candle store and incremental candle fetching
+"""
+
+# STANDARD MODULES
+from threading import Thread
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import candle_store
+import cex_public
+from test_cex_async import coinbase_candles
+
+API = {"exchange": "coinbase", "pair": "LTC:BTC"}
+END = 1600000000
+
+
+@pytest.fixture(autouse=True)
+def store_path(monkeypatch, tmp_path):
+    """
+    candle store in a temp dir
+    """
+    monkeypatch.setattr(candle_store, "PATH", str(tmp_path) + "/candles/")
+
+
+@pytest.fixture(name="coinbase")
+def fixture_coinbase(coinbase):
+    """
+    coinbase candles from the stub
+    """
+    coinbase["body"] = coinbase_candles
+    return coinbase
+
+
+def rows(*unix):
+    return np.array([[1.0] * 5 + [t] for t in unix], dtype=float)
+
+
+def test_gaps_and_ranges():
+    assert candle_store.gaps([], 0, 100) == [[0, 100]]
+    assert candle_store.gaps([[20, 50], [70, 80]], 0, 100) == [
+        [0, 20],
+        [50, 70],
+        [80, 100],
+    ]
+    assert candle_store.gaps([[0, 100]], 10, 90) == []
+    assert candle_store.merge_ranges([[70, 80], [0, 20], [25, 60]], 5) == [
+        [0, 60],
+        [70, 80],
+    ]
+
+
+def test_save_and_load():
+    candle_store.save("coinbase", "LTC:BTC", 60, rows(120, 60, 180, 9999), 60, 180)
+    candle_store.save("coinbase", "LTC:BTC", 60, rows(180, 240), 180, 240)
+    data = candle_store.load("coinbase", "LTC:BTC", 60)
+    assert data["unix"].tolist() == [60, 120, 180, 240]
+    assert isinstance(data["close"], np.memmap)
+    assert candle_store.load("coinbase", "LTC:BTC", 60, 100, 200)["unix"].tolist() == [
+        120,
+        180,
+    ]
+    assert candle_store.covered("coinbase", "LTC:BTC", 60) == [[60, 240]]
+
+
+def test_load_never_mixes_two_saves():
+    done = []
+
+    def writer():
+        for count in range(1, 60):
+            unix = 60 * np.arange(1, count + 1)
+            candle_store.save("coinbase", "LTC:BTC", 60, rows(*unix), 0, 60 * count)
+        done.append(True)
+
+    candle_store.save("coinbase", "LTC:BTC", 60, rows(60), 0, 60)
+    thread = Thread(target=writer)
+    thread.start()
+    while not done:
+        data = candle_store.load("coinbase", "LTC:BTC", 60)
+        assert len({len(values) for values in data.values()}) == 1
+    thread.join()
+
+
+def test_only_missing_spans_are_fetched(coinbase):
+    start = END - 1000 * 60
+    expected = cex_public.get_candles(dict(API), start, END, 60, store=False)
+    data = cex_public.get_candles(dict(API), start, END, 60, store=True)
+    calls = len(coinbase["requests"])
+    for key, values in expected.items():
+        assert np.array_equal(data[key], values)
+    # everything is on disk; no requests at all
+    data = cex_public.get_candles(dict(API), start, END, 60, store=True)
+    assert len(coinbase["requests"]) == calls
+    for key, values in expected.items():
+        assert np.array_equal(data[key], values)
+    # a later window fetches its new tail only, in one page
+    later = cex_public.get_candles(dict(API), start, END + 100 * 60, 60, store=True)
+    assert len(coinbase["requests"]) == calls + 1
+    assert later["unix"][-1] >= END + 100 * 60
+    assert np.array_equal(later["close"][: len(data["close"])], data["close"])
+
+
+def test_open_bars_are_not_kept(coinbase, monkeypatch):
+    monkeypatch.setattr(candle_store, "CLOCK", lambda: END + 30)
+    start = END - 100 * 60
+    data = cex_public.get_candles(dict(API), start, END, 60, store=True)
+    assert data["unix"][-1] >= END - 60
+    kept = candle_store.load("coinbase", "LTC:BTC", 60)["unix"]
+    assert kept[-1] <= candle_store.last_closed(60) < END - 60
+    # the unsettled tail is requested again
+    calls = len(coinbase["requests"])
+    cex_public.get_candles(dict(API), start, END, 60, store=True)
+    assert len(coinbase["requests"]) == calls + 1
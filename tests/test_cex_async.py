@@ -0,0 +1,214 @@
+"""
+asyncio api against a local stub exchange
+"""
+
+# STANDARD MODULES
+import asyncio
+import hashlib
+import hmac
+from base64 import b64decode, b64encode
+from datetime import datetime, timezone
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import cex_async
+import cex_private
+import cex_public
+import executor
+
+BOOK = {
+    "sequence": 1,
+    "bids": [["0.0071%s" % i, "1.%s" % i, 1] for i in range(9, 0, -1)],
+    "asks": [["0.0072%s" % i, "2.%s" % i, 1] for i in range(1, 10)],
+}
+SECRET = b64encode(b"secret").decode()
+
+
+def run(coroutine):
+    """
+    run a coroutine on a fresh event loop, closing its sessions after
+    """
+
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await cex_async.close_sessions()
+
+    return asyncio.run(main())
+
+
+def unix(iso):
+    """
+    iso date of a coinbase candle query to unix
+    """
+    return int(datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp())
+
+
+def coinbase_candles(record):
+    """
+    stub response; one candle per granularity between start and end
+    """
+    query = record["query"]
+    interval = int(query["granularity"])
+    start, end = unix(query["start"]), unix(query["end"])
+    times = range(start - start % interval + interval, end, interval)
+    # [time, low, high, open, close, volume], newest first
+    return [[t, 1.0, 3.0, 1.5, 2.0 + t % 7, 10.0] for t in reversed(times)]
+
+
+def private(exchange):
+    """
+    api dict with credentials
+    """
+    return {
+        "exchange": exchange,
+        "pair": "LTC:BTC",
+        "key": "key",
+        "secret": SECRET,
+        "passphrase": "pass",
+    }
+
+
+def test_get_book(coinbase):
+    coinbase["body"] = BOOK
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    book = run(cex_async.get_book(dict(api), depth=5))
+    expected = cex_public.book_response(dict(api), BOOK, 5)
+    assert list(book) == list(expected)
+    for key, values in expected.items():
+        assert np.array_equal(book[key], values)
+        assert len(values) == 5
+    assert coinbase["requests"][0]["path"] == "/products/LTC-BTC/book"
+    assert coinbase["requests"][0]["query"] == {"level": "2"}
+
+
+def test_get_candles_paginates_concurrently(coinbase):
+    coinbase["body"] = coinbase_candles
+    coinbase["delay"] = 0.05
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    end = 1600000000
+    start = end - 700 * 60
+    data = run(cex_async.get_candles(dict(api), start, end, 60))
+    # 700 candles at 295 per page
+    assert len(coinbase["requests"]) == 3
+    assert coinbase["peak"] == 3
+    assert (np.diff(data["unix"]) == 60).all()
+    assert data["unix"][0] <= start + 60 and data["unix"][-1] >= end
+    # identical to the sync path over the same stub
+    executor.set_mode("inline")
+    try:
+        expected = cex_public.get_candles(dict(api), start, end, 60)
+    finally:
+        executor.set_mode("process", workers=8)
+    assert list(data) == list(expected)
+    for key, values in expected.items():
+        assert np.array_equal(data[key], values)
+
+
+def test_failed_candle_page_is_retried(coinbase):
+    failed = []
+
+    def body(record):
+        # the oldest page fails once
+        if not failed:
+            failed.append(record["query"]["start"])
+            return {"message": "try again"}
+        return coinbase_candles(record)
+
+    coinbase["body"] = body
+    end = 1600000000
+    start = end - 700 * 60
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    data = run(cex_async.get_candles(api, start, end, 60))
+    starts = [r["query"]["start"] for r in coinbase["requests"]]
+    assert len(starts) == 4 and starts.count(failed[0]) == 2
+    # nothing was forward filled over the failed page
+    assert (data["volume"] == 10).all() and (np.diff(data["unix"]) == 60).all()
+
+
+def test_candle_page_raises_after_page_attempts(coinbase, monkeypatch):
+    monkeypatch.setattr(cex_async, "PAGE_ATTEMPTS", 2)
+    monkeypatch.setattr(cex_async, "ATTEMPTS", 1)
+    coinbase["body"] = {"message": "down"}
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    with pytest.raises(ValueError):
+        run(cex_async.candles(api, 1600000000 - 6000, 1600000000, 60))
+    assert len(coinbase["requests"]) == 2
+
+
+def test_signed_private_call(coinbase):
+    coinbase["body"] = []
+    orders = run(cex_async.get_orders(private("coinbase")))
+    assert orders["bids"] == [] and orders["asks"] == []
+    record = coinbase["requests"][0]
+    headers = record["headers"]
+    # coinbase signs params as a json body
+    assert record["method"] == "GET" and record["path"] == "/orders"
+    assert record["body"] == '{"product_id": "LTC-BTC"}'
+    assert headers["CB-ACCESS-KEY"] == "key"
+    assert headers["CB-ACCESS-PASSPHRASE"] == "pass"
+    message = headers["CB-ACCESS-TIMESTAMP"] + "GET/orders" + record["body"]
+    message = message.encode()
+    digest = hmac.new(b64decode(SECRET), message, hashlib.sha256).digest()
+    assert headers["CB-ACCESS-SIGN"] == b64encode(digest).decode()
+
+
+def test_cancel_collation(coinbase):
+    coinbase["body"] = lambda record: [record["path"]]
+    ret = run(cex_async.delete_orders(private("coinbase"), ["a", "b"]))
+    assert ret == [
+        {"order_id": "a", "response": ["/orders/a"]},
+        {"order_id": "b", "response": ["/orders/b"]},
+    ]
+    # cancel all is one call; its raw response is returned
+    ret = run(cex_async.delete_orders(private("coinbase")))
+    assert ret == ["/orders"]
+    assert coinbase["requests"][-1]["body"] == '{"product_id": "LTC-BTC"}'
+
+
+def test_nonce_exchanges_cancel_in_order(coinbase):
+    coinbase["body"] = {"success": 1}
+    coinbase["delay"] = 0.02
+    ids = [11, 12, 13, 14, 15]
+    ret = run(cex_async.delete_orders(private("poloniex"), ids))
+    assert [r["order_id"] for r in ret] == ids
+    nonces = [int(r["query"]["nonce"]) for r in coinbase["requests"]]
+    assert nonces == sorted(set(nonces))
+    assert coinbase["peak"] == 1
+    # timestamp signed exchanges still cancel concurrently
+    coinbase["peak"] = 0
+    run(cex_async.delete_orders(private("coinbase"), ids))
+    assert coinbase["peak"] > 1
+
+
+def test_next_nonce_strictly_increases():
+    nonces = [cex_private.next_nonce("kraken") for _ in range(1000)]
+    millis = [int(nonce * 1000) for nonce in nonces]
+    assert all(b == a + 1 or b > a for a, b in zip(millis, millis[1:]))
+    assert len(set(millis)) == len(millis)
+
+
+def test_bitfinex_cancel_is_refused(coinbase):
+    with pytest.raises(ValueError, match="bitfinex"):
+        cex_private.delete_orders(private("bitfinex"), ["1"])
+    with pytest.raises(ValueError, match="bitfinex"):
+        run(cex_async.delete_orders(private("bitfinex")))
+    assert not coinbase["requests"]
+
+
+def test_get_prices(coinbase, monkeypatch):
+    monkeypatch.setitem(cex_public.URLS, "binance", coinbase["url"])
+    coinbase["body"] = [{"symbol": "LTCBTC", "price": "0.007"}]
+    prices = run(cex_async.get_prices({"exchange": "binance"}, ["LTC:BTC", "X:BTC"]))
+    assert prices == {"LTC:BTC": 0.007, "X:BTC": None}
+    assert len(coinbase["requests"]) == 1
+    coinbase["body"] = lambda record: (
+        {"message": "NotFound"} if "X-" in record["path"] else {"price": "0.5"}
+    )
+    pairs = ["A:B", "C:D", "X:BTC"]
+    prices = run(cex_async.get_prices({"exchange": "coinbase"}, pairs))
+    assert prices == {"A:B": 0.5, "C:D": 0.5, "X:BTC": None}
@@ -0,0 +1,394 @@
+"""
+sync public api against a local stub exchange
+"""
+
+# STANDARD MODULES
+import json
+import tracemalloc
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import cex_public
+import executor
+import rate_limit
+from benchmark import book_payload
+from test_cex_async import coinbase_candles
+
+
+@pytest.fixture(name="pool")
+def fixture_pool(coinbase):
+    """
+    the coinbase stub served to a fresh two worker process pool
+    """
+    executor.set_mode("process", workers=2)
+    return coinbase
+
+
+def test_get_price(pool):
+    assert cex_public.get_price({"exchange": "coinbase", "pair": "LTC:BTC"}) == 0.00713
+    assert pool["paths"] == ["/products/LTC-BTC/ticker?market=LTC-BTC"]
+
+
+@pytest.mark.usefixtures("pool")
+def test_pipe_enabled_after_workers_started(monkeypatch):
+    popped = []
+    pipe_pop = cex_public.pipe_pop
+    monkeypatch.setattr(
+        cex_public, "pipe_pop", lambda api: popped.append(api) or pipe_pop(api)
+    )
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    assert cex_public.get_price(dict(api)) == 0.00713
+    assert not popped
+    monkeypatch.setattr(cex_public, "PIPE", True)
+    assert cex_public.get_price(dict(api)) == 0.00713
+    assert len(popped) == 1
+
+
+def test_urls_changed_after_workers_started(pool, monkeypatch):
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    cex_public.get_price(dict(api))
+    # a second stub replaces the first while the workers are alive
+    first = list(pool["paths"])
+    monkeypatch.setitem(cex_public.URLS, "coinbase", pool["url"] + "/moved")
+    cex_public.get_price(dict(api))
+    assert pool["paths"][: len(first)] == first
+    assert pool["paths"][-1].startswith("/moved/products/LTC-BTC/ticker")
+
+
+SNAPSHOTS = {
+    "binance": [
+        {"symbol": "LTCBTC", "price": "0.007"},
+        {"symbol": "ETHBTC", "price": "0.03"},
+        {"symbol": "XRPBTC", "price": "0.00002"},
+    ],
+    "poloniex": {
+        "BTC_LTC": {"last": "0.007"},
+        "BTC_ETH": {"last": "0.03"},
+        "BTC_XRP": {"last": "0.00002"},
+    },
+    "kraken": {
+        "error": [],
+        "result": {
+            "XLTCXXBT": {"c": ["0.007", "1"]},
+            "XETHXXBT": {"c": ["0.03", "1"]},
+        },
+    },
+    "bittrex": {
+        "result": [
+            {"MarketName": "BTC-LTC", "Last": 0.007},
+            {"MarketName": "BTC-ETH", "Last": 0.03},
+        ]
+    },
+    "bitfinex": [
+        ["tLTCBTC", 0, 0, 0, 0, 0, 0, 0.007, 0, 0, 0],
+        ["tETHBTC", 0, 0, 0, 0, 0, 0, 0.03, 0, 0, 0],
+    ],
+    "kucoin": {
+        "data": {
+            "ticker": [
+                {"symbol": "LTC-BTC", "last": "0.007"},
+                {"symbol": "ETH-BTC", "last": "0.03"},
+            ]
+        }
+    },
+}
+
+
+@pytest.mark.parametrize("exchange", sorted(SNAPSHOTS))
+def test_get_prices_one_request(exchange, stub, monkeypatch):
+    monkeypatch.setitem(cex_public.URLS, exchange, stub["url"])
+    monkeypatch.setattr(rate_limit, "LIMITS", {})
+    monkeypatch.setattr(executor, "MODE", "inline")
+    stub["body"] = SNAPSHOTS[exchange]
+    pairs = ["LTC:BTC", "ETH:BTC", "DOGE:BTC"]
+    prices = cex_public.get_prices({"exchange": exchange}, pairs)
+    assert prices == {"LTC:BTC": 0.007, "ETH:BTC": 0.03, "DOGE:BTC": None}
+    assert len(stub["requests"]) == 1
+    query = stub["requests"][0]["query"]
+    if exchange == "kraken":
+        assert query["pair"] == "ltcxbt,ethxbt,dogexbt"
+    if exchange == "bitfinex":
+        assert query["symbols"] == "tLTCBTC,tETHBTC,tDOGEBTC"
+
+
+def test_get_prices_falls_back_per_pair(coinbase):
+    coinbase["body"] = lambda record: (
+        {"message": "NotFound"}
+        if "DOGE" in record["path"]
+        else {"price": "1" if "LTC" in record["path"] else "2"}
+    )
+    pairs = ["LTC:BTC", "ETH:USD", "DOGE:BTC"]
+    prices = cex_public.get_prices({"exchange": "coinbase"}, pairs)
+    # an unlisted pair is None, as in the one request path
+    assert prices == {"LTC:BTC": 1.0, "ETH:USD": 2.0, "DOGE:BTC": None}
+    paths = sorted(record["path"] for record in coinbase["requests"])
+    assert paths == [
+        "/products/DOGE-BTC/ticker",
+        "/products/ETH-USD/ticker",
+        "/products/LTC-BTC/ticker",
+    ]
+
+
+def test_candle_pages_in_parallel_with_per_page_retry(coinbase):
+    failed = []
+
+    def body(record):
+        # the oldest page fails once
+        if not failed and record["query"]["start"].startswith("2020-09-12T16"):
+            failed.append(record["query"]["start"])
+            return {"message": "try again"}
+        return coinbase_candles(record)
+
+    coinbase["body"] = body
+    coinbase["delay"] = 0.05
+    end = 1600000000
+    data = cex_public.get_candles(
+        {"exchange": "coinbase", "pair": "LTC:BTC"}, end - 1000 * 60, end, 60
+    )
+    # 4 pages at once, then the failed page alone
+    assert coinbase["peak"] == 4
+    assert len(coinbase["requests"]) == 5
+    assert [r["query"]["start"] for r in coinbase["requests"]].count(failed[0]) == 2
+    assert (np.diff(data["unix"]) == 60).all()
+    assert data["unix"][0] <= end - 999 * 60 and data["unix"][-1] >= end
+
+
+def test_process_candles():
+    def candle(unix, *ohlcv):
+        row = dict(zip(["open", "high", "low", "close", "volume"], ohlcv), unix=unix)
+        return [row[k] for k in cex_public.COLUMNS]
+
+    data = np.array(
+        [
+            candle(240, 1.0, 1.0, 1.0, 1.0, 1.0),
+            candle(60, 1.0, 2.0, 0.5, 1.5, 2.0),
+            candle(0, 1.0, 1.0, 1.0, 1.0, 0.0),
+            candle(180, 1.5, 1.0, 2.0, 1.2, 3.0),
+            candle(60, 9.0, 9.0, 9.0, 9.0, 9.0),
+            candle(300, 1.0, 1.0, 1.0, 1.0, 1.0),
+        ]
+    )
+    data = cex_public.process_candles(data, 0, 1000, 0, 60)
+    assert list(data) == ["high", "low", "open", "close", "volume", "unix"]
+    assert data["unix"].dtype == np.int64
+    # the last candle only bounds the interpolation; 120 is filled
+    assert data["unix"].tolist() == [60, 120, 180, 240]
+    assert data["volume"].tolist() == [2.0, 0.0, 3.0, 1.0]
+    assert data["close"].tolist() == [1.5, 1.5, 1.2, 1.0]
+    assert data["open"].tolist() == [1.0, 1.5, 1.5, 1.0]
+    assert data["high"].tolist() == [2.0, 1.5, 2.0, 1.0]
+    assert data["low"].tolist() == [0.75, 1.5, 1.2, 1.0]
+    # no volume before the window; nothing left
+    flat = np.array([candle(60 * i, 1.0, 1.0, 1.0, 1.0, 0.0) for i in range(5)])
+    empty = cex_public.process_candles(flat, 0, 1000, 0, 60)
+    assert all(v.dtype == np.float64 and not len(v) for v in empty.values())
+
+
+@pytest.mark.parametrize(
+    "exchange, body",
+    [
+        (
+            "bitfinex",
+            [[1600000060000, 1, 2, 4, 0.5, 9], [1600000000000, 1, 2, 4, 0.5, 9]],
+        ),
+        ("binance", [[0, "1", "4", "0.5", "2", "9", 1600000000999, "0"]]),
+        ("coinbase", [[1600000000, 0.5, 4, 1, 2, 9]]),
+        (
+            "kraken",
+            {"result": {"X": [[1600000000, "1", "4", "0.5", "2", "3", "9", 5]]}},
+        ),
+        ("kucoin", {"data": [["1600000000", "1", "2", "4", "0.5", "9", "18"]]}),
+        (
+            "poloniex",
+            [
+                {
+                    "date": 1600000000,
+                    "open": 1,
+                    "high": 4,
+                    "low": 0.5,
+                    "close": 2,
+                    "quoteVolume": 9,
+                }
+            ],
+        ),
+        (
+            "bittrex",
+            {
+                "result": [
+                    {
+                        "O": 1,
+                        "H": 4,
+                        "L": 0.5,
+                        "C": 2,
+                        "V": 9,
+                        "T": "2020-09-13T12:26:40",
+                    }
+                ]
+            },
+        ),
+    ],
+)
+def test_candles_response(exchange, body):
+    page = cex_public.candles_response({"exchange": exchange}, body, 0, 1600000000)
+    assert page.dtype == np.float64
+    assert page.tolist() == [[4.0, 0.5, 1.0, 2.0, 9.0, 1600000000.0]]
+
+
+def test_candles_response_rejects_nulls():
+    with pytest.raises(ValueError):
+        cex_public.candles_response(
+            {"exchange": "coinbase"}, [[1600000000, None, 4, 1, 2, 9]], 0, 1
+        )
+
+
+def test_candle_dtype():
+    data = {"close": np.array([1.5, 2.5]), "unix": np.array([60, 120])}
+    assert cex_public.candle_dtype(data) is data
+    with pytest.raises(ValueError):
+        cex_public.candle_dtype(data, np.float32)
+    records = cex_public.candle_dtype(data, "structured")
+    assert records.dtype.names == ("close", "unix")
+    assert records["close"].tolist() == [1.5, 2.5]
+    assert records[1]["unix"] == 120
+
+
+@pytest.mark.parametrize("interval, chunk", [(60, 1), (60, 97), (60, 10**6), (180, 50)])
+def test_iter_candles_joins_to_get_candles(coinbase, interval, chunk):
+    def body(record):
+        # gaps, and no volume in the first hour
+        candles = [c for c in coinbase_candles(record) if c[0] % 420]
+        return [c[:5] + [0.0 if c[0] < 1599950000 else c[5]] for c in candles]
+
+    coinbase["body"] = body
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    end = 1600000000
+    start = end - 1000 * 60
+    expected = cex_public.get_candles(dict(api), start, end, interval)
+    chunks = list(cex_public.iter_candles(dict(api), start, end, interval, chunk))
+    assert all(0 < len(c["unix"]) <= chunk for c in chunks)
+    assert len(chunks) > 1 or chunk > 1000
+    for key, values in expected.items():
+        joined = np.concatenate([c[key] for c in chunks])
+        assert joined.dtype == values.dtype
+        assert np.array_equal(joined, values)
+
+
+@pytest.mark.parametrize(
+    "exchange, depth, params",
+    [
+        ("binance", 10, {"limit": 10}),
+        ("binance", 11, {"limit": 20}),
+        ("bitfinex", 10, {"len": 25}),
+        ("bitfinex", 50, {"len": 100}),
+        ("poloniex", 7, {"depth": 7}),
+        ("kraken", 7, {"count": "7"}),
+        ("coinbase", 1, {"level": 1}),
+        ("coinbase", 2, {"level": 2}),
+    ],
+)
+def test_book_request_depth(exchange, depth, params):
+    api = cex_public.book_request({"exchange": exchange, "pair": "LTC:BTC"}, depth)
+    assert params.items() <= api["params"].items()
+
+
+def test_book_request_kucoin_depth():
+    api = {"exchange": "kucoin", "pair": "LTC:BTC"}
+    assert cex_public.book_request(api, 20)["endpoint"].endswith("level2_20")
+    assert cex_public.book_request(api, 21)["endpoint"].endswith("level2_100")
+
+
+@pytest.mark.parametrize("separators", [(",", ":"), (", ", ": ")])
+@pytest.mark.parametrize("depth", [1, 3, 5, 8])
+def test_book_json_stops_at_depth(separators, depth):
+    levels = [{"Quantity": 1.5 + i, "Rate": 100.0 - i} for i in range(5)]
+    data = {"success": True, "message": "", "result": {"buy": levels, "sell": []}}
+    raw = json.dumps(data, separators=separators).encode()
+    assert cex_public.book_json("bittrex", raw, depth) == {
+        "result": {"buy": levels[:depth], "sell": []}
+    }
+    # coinbase at depth > 1, its level 2 book of 50
+    bids = [["%s" % (100 - i), "1.0", 1] for i in range(50)]
+    raw = json.dumps({"sequence": 1, "bids": bids, "asks": bids}, separators=separators)
+    assert cex_public.book_json("coinbase", raw, 2 * depth) == {
+        "bids": bids[: 2 * depth],
+        "asks": bids[: 2 * depth],
+    }
+
+
+def test_book_json_falls_back_to_full_decode():
+    error = b'{"success":false,"message":"INVALID_MARKET","result":null}'
+    assert cex_public.book_json("bittrex", error, 10) == json.loads(error)
+    # coinbase sends 50 levels; not worth decoding one by one for 40
+    raw = json.dumps({"sequence": 1, "bids": [["1", "2", 1]] * 50, "asks": []})
+    assert cex_public.book_json("coinbase", raw, 40) == json.loads(raw)
+
+
+def test_get_book_requests_depth(coinbase):
+    coinbase["body"] = {
+        "sequence": 1,
+        "bids": [["0.00%s" % (80 - i), "1.%s" % i, 1] for i in range(50)],
+        "asks": [["0.00%s" % (81 + i), "2.%s" % i, 1] for i in range(50)],
+    }
+    book = cex_public.get_book({"exchange": "coinbase", "pair": "LTC:BTC"}, 3)
+    assert book["bidp"].tolist() == [0.0080, 0.0079, 0.0078]
+    assert book["askv"].tolist() == [2.0, 2.1, 2.2]
+    assert coinbase["requests"][-1]["query"]["level"] == "2"
+
+
+@pytest.mark.parametrize("exchange", list(cex_public.URLS))
+@pytest.mark.parametrize("depth", [1, 10, 50])
+def test_book_fill_matches_book_response(exchange, depth):
+    api = {"exchange": exchange}
+    data = json.loads(book_payload(exchange, 60))
+    out = cex_public.book_buffer(50)
+    arrays = {k: v for k, v in out.items() if k not in ["bids", "asks"]}
+    cex_public.book_fill(api, data, depth, out)
+    book = cex_public.book_response(api, data, depth)
+    assert out["bids"] == out["asks"] == depth
+    for key, values in book.items():
+        # filled in place, NaN past the levels held
+        assert out[key] is arrays[key]
+        assert out[key][:depth].tolist() == values.tolist()
+        assert np.isnan(out[key][depth:]).all()
+
+
+def test_book_fill_normalizes_unsorted_books():
+    api = {"exchange": "coinbase"}
+    data = {"bids": [["1", "1"], ["3", "1"], ["2", "1"]], "asks": [["4", "1"]]}
+    out = cex_public.book_fill(api, data, 5, cex_public.book_buffer(5))
+    assert (out["bids"], out["asks"]) == (3, 1)
+    assert out["bidp"][:3].tolist() == [3, 2, 1]
+    assert np.isnan(out["askp"][1:]).all()
+
+
+def test_book_fill_allocates_no_arrays():
+    api = {"exchange": "binance"}
+    data = json.loads(book_payload("binance", 50))
+    out = cex_public.book_buffer(50)
+    cex_public.book_fill(api, data, 50, out)
+    tracemalloc.start()
+    cex_public.book_fill(api, data, 50, out)
+    filled = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    cex_public.book_response(api, data, 50)
+    fresh = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # four arrays of 50 floats alone are 1600 bytes
+    assert filled < 1600 < fresh
+
+
+def test_get_book_out(coinbase):
+    coinbase["body"] = {
+        "sequence": 1,
+        "bids": [["0.00%s" % (80 - i), "1.%s" % i, 1] for i in range(50)],
+        "asks": [["0.00%s" % (81 + i), "2.%s" % i, 1] for i in range(50)],
+    }
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    first = cex_public.get_book(dict(api), 3, out=True)
+    second = cex_public.get_book(dict(api), 3, out=True)
+    assert first is second is cex_public.BUFFERS[("coinbase", "LTC:BTC", 3)]
+    assert second["bidp"].tolist() == [0.0080, 0.0079, 0.0078]
+    assert len(coinbase["requests"]) == 2
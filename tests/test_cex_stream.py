@@ -0,0 +1,339 @@
+"""
+streaming market data against a local websocket server replaying frames
+"""
+
+# STANDARD MODULES
+import asyncio
+import time
+from json import loads as json_loads
+from threading import Thread
+
+# THIRD PARTY MODULES
+import pytest
+from aiohttp import WSMsgType, web
+
+# CEX MODULES
+import cex_async
+import cex_public
+import cex_stream
+from cex_stream import close_stream, open_stream, stream_book, stream_ticker
+
+# frames recorded per exchange; one list per connection, all but the last hang up
+FRAMES = {
+    "coinbase": [
+        [
+            {"type": "subscriptions", "channels": [{"name": "level2"}]},
+            {
+                "type": "snapshot",
+                "product_id": "BTC-USD",
+                "bids": [["10100.00", "1.5"], ["10099.50", "2.0"]],
+                "asks": [["10101.00", "0.5"], ["10102.00", "3.0"]],
+            },
+            {
+                "type": "l2update",
+                "product_id": "BTC-USD",
+                "changes": [["buy", "10100.50", "0.7"], ["sell", "10101.00", "0"]],
+                "time": "2019-09-09T00:00:00.000000Z",
+            },
+            {
+                "type": "match",
+                "trade_id": 1,
+                "side": "sell",
+                "size": "0.02",
+                "price": "10100.50",
+                "product_id": "BTC-USD",
+            },
+        ]
+    ],
+    "binance": [
+        [
+            {
+                "stream": "btcusdt@depth20@100ms",
+                "data": {
+                    "lastUpdateId": 1,
+                    "bids": [
+                        ["10100.50", "0.7"],
+                        ["10100.00", "1.5"],
+                        ["10099.50", "2.0"],
+                    ],
+                    "asks": [["10102.00", "3.0"]],
+                },
+            },
+            {
+                "stream": "btcusdt@trade",
+                "data": {"e": "trade", "p": "10100.50", "q": "0.02"},
+            },
+        ]
+    ],
+    "kraken": [
+        [
+            {"event": "systemStatus", "status": "online", "version": "0.2.0"},
+            {"event": "subscriptionStatus", "channelID": 10, "status": "subscribed"},
+            [
+                10,
+                {
+                    "as": [["10101.0", "0.5", "1.0"], ["10102.0", "3.0", "1.0"]],
+                    "bs": [["10100.0", "1.5", "1.0"], ["10099.5", "2.0", "1.0"]],
+                },
+                "book-25",
+                "XBT/USD",
+            ],
+            {"event": "heartbeat"},
+            [10, {"b": [["10100.5", "0.7", "1.1"]]}, "book-25", "XBT/USD"],
+            [
+                10,
+                {"a": [["10101.0", "0.00000000", "1.2"]]},
+                {"b": [["10099.5", "2.0", "1.2"]]},
+                "book-25",
+                "XBT/USD",
+            ],
+            [11, [["10100.5", "0.02", "1.3", "s", "l", ""]], "trade", "XBT/USD"],
+        ]
+    ],
+    "bitfinex": [
+        [
+            {"event": "info", "version": 2},
+            {"event": "subscribed", "channel": "book", "chanId": 5, "len": "25"},
+            {"event": "subscribed", "channel": "trades", "chanId": 6},
+            [5, [[10100, 1, 1.5], [10099.5, 2, 2.0], [10101, 2, -0.5], [10102, 1, -3]]],
+            [5, "hb"],
+            [5, [10100.5, 1, 0.7]],
+            [5, [10101, 0, -1]],
+            [6, [[1, 1568000000000, 0.01, 10100]]],
+            [6, "te", [2, 1568000000001, -0.02, 10100.5]],
+        ]
+    ],
+    "poloniex": [
+        [
+            [1010],
+            [
+                121,
+                1,
+                [
+                    [
+                        "i",
+                        {
+                            "currencyPair": "USDT_BTC",
+                            "orderBook": [
+                                {"10101.00": "0.5", "10102.00": "3"},
+                                {"10100.00": "1.5", "10099.50": "2"},
+                            ],
+                        },
+                    ]
+                ],
+            ],
+            [121, 2, [["o", 1, "10100.50", "0.7"]]],
+            # sequence 3 never arrives; the book must resync
+            [121, 4, [["o", 0, "10101.00", "0.00"]]],
+        ],
+        [
+            [
+                121,
+                10,
+                [
+                    [
+                        "i",
+                        {
+                            "currencyPair": "USDT_BTC",
+                            "orderBook": [
+                                {"10101.00": "0.5", "10102.00": "3"},
+                                {"10100.00": "1.5", "10099.50": "2"},
+                            ],
+                        },
+                    ]
+                ],
+            ],
+            [
+                121,
+                11,
+                [
+                    ["o", 1, "10100.50", "0.7"],
+                    ["o", 0, "10101.00", "0.00000000"],
+                    ["t", "1", 0, "10100.50", "0.02", 1568000000],
+                ],
+            ],
+        ],
+    ],
+    "kucoin": [
+        [
+            {"id": "1", "type": "welcome"},
+            {"id": "2", "type": "ack"},
+            {
+                "type": "message",
+                "topic": "/spotMarket/level2Depth50:BTC-USDT",
+                "subject": "level2",
+                "data": {
+                    "asks": [["10102", "3"]],
+                    "bids": [["10100.5", "0.7"], ["10100", "1.5"], ["10099.5", "2"]],
+                    "timestamp": 1568000000000,
+                },
+            },
+            {
+                "type": "message",
+                "topic": "/market/match:BTC-USDT",
+                "subject": "trade.l3match",
+                "data": {"price": "10100.5", "size": "0.02", "side": "sell"},
+            },
+        ]
+    ],
+}
+EXPECTED = {
+    "bidp": [10100.5, 10100.0, 10099.5],
+    "bidv": [0.7, 1.5, 2.0],
+    "askp": [10102.0],
+    "askv": [3.0],
+}
+
+
+@pytest.fixture(name="replay")
+def fixture_replay(monkeypatch):
+    """
+    local stand in for every exchange's websocket, replaying FRAMES
+    returns a dict of the "frames" left to serve and what was "received"
+    """
+    state = {"frames": {k: list(v) for k, v in FRAMES.items()}, "received": {}}
+
+    async def socket(request):
+        exchange = request.match_info["exchange"]
+        received = state["received"].setdefault(exchange, [])
+        received.append({"query": dict(request.query), "messages": []})
+        response = web.WebSocketResponse()
+        await response.prepare(request)
+        frames = state["frames"][exchange].pop(0) if state["frames"][exchange] else []
+        for frame in frames:
+            await response.send_json(frame)
+        hang_up = len(state["frames"][exchange]) > 0
+        if not hang_up:
+            async for msg in response:
+                if msg.type == WSMsgType.TEXT:
+                    received[-1]["messages"].append(json_loads(msg.data))
+        await response.close()
+        return response
+
+    async def bullet(request):
+        return web.json_response(
+            {
+                "code": "200000",
+                "data": {
+                    "token": "public",
+                    "instanceServers": [
+                        {"endpoint": "ws://%s/kucoin" % request.host, "pingInterval": 1}
+                    ],
+                },
+            }
+        )
+
+    app = web.Application()
+    app.router.add_get("/{exchange}", socket)
+    app.router.add_get("/{exchange}/stream", socket)
+    app.router.add_post("/api/v1/bullet-public", bullet)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+    thread = Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    for exchange in FRAMES:
+        monkeypatch.setitem(
+            cex_stream.WS_URLS, exchange, "ws://127.0.0.1:%s/%s" % (port, exchange)
+        )
+    monkeypatch.setitem(cex_public.URLS, "kucoin", "http://127.0.0.1:%s" % port)
+    monkeypatch.setattr(cex_stream, "BACKOFF", 0.05)
+    yield state
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def wait_for(predicate, timeout=5):
+    """
+    poll until predicate() is true
+    """
+    begin = time.time()
+    while not predicate():
+        assert time.time() - begin < timeout, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize(
+    "exchange, pair",
+    [
+        ("coinbase", "BTC:USD"),
+        ("binance", "BTC:USDT"),
+        ("kraken", "BTC:USD"),
+        ("bitfinex", "BTC:USD"),
+        ("poloniex", "BTC:USD"),
+        ("kucoin", "BTC:USDT"),
+    ],
+)
+def test_replay(replay, exchange, pair):
+    api = {"exchange": exchange, "pair": pair}
+    feed = open_stream([api])
+    try:
+        wait_for(lambda: (stream_ticker(feed, api)["last"] or 0) == 10100.5)
+        wait_for(
+            lambda: (stream_book(feed, api) or {"bidp": []})["bidp"].tolist()
+            == EXPECTED["bidp"]
+        )
+        book = stream_book(feed, api)
+        assert list(book) == ["bidv", "bidp", "askp", "askv"]
+        assert {k: v.tolist() for k, v in book.items()} == EXPECTED
+        ticker = stream_ticker(feed, api)
+        assert (ticker["bid"], ticker["bidv"]) == (10100.5, 0.7)
+        assert (ticker["ask"], ticker["askv"]) == (10102.0, 3.0)
+        assert ticker["volume"] == 0.02 and ticker["synced"]
+        wait_for(lambda: replay["received"].get(exchange))
+    finally:
+        close_stream(feed)
+    received = replay["received"][exchange]
+    if exchange == "binance":
+        assert received[0]["query"]["streams"] == "btcusdt@depth20@100ms/btcusdt@trade"
+    else:
+        assert received[-1]["messages"] == cex_stream.subscriptions(exchange, pair)
+
+
+def test_resync_on_sequence_gap(replay):
+    api = {"exchange": "poloniex", "pair": "BTC:USD"}
+    feed = open_stream([api])
+    try:
+        wait_for(lambda: stream_ticker(feed, api)["last"] == 10100.5)
+        stream = feed["streams"][("poloniex", "BTC:USD")]
+        assert stream["connects"] == 2 and stream["resyncs"] == 1
+        assert {k: v.tolist() for k, v in stream_book(feed, api).items()} == EXPECTED
+    finally:
+        close_stream(feed)
+
+
+def test_reconnect_after_hang_up(replay):
+    api = {"exchange": "coinbase", "pair": "BTC:USD"}
+    replay["frames"]["coinbase"].insert(0, FRAMES["coinbase"][0][:2])
+    feed = open_stream([api])
+    try:
+        wait_for(lambda: stream_ticker(feed, api)["last"] == 10100.5)
+        stream = feed["streams"][("coinbase", "BTC:USD")]
+        assert stream["connects"] == 2 and stream["resyncs"] == 0
+        assert stream_book(feed, api)["bidp"].tolist() == EXPECTED["bidp"]
+    finally:
+        close_stream(feed)
+
+
+def test_bittrex_is_polled(monkeypatch):
+    async def get_book(api, depth):
+        return {k: v[:depth] for k, v in EXPECTED.items()}
+
+    async def get_price(api):
+        return 10100.5
+
+    monkeypatch.setattr(cex_async, "get_book", get_book)
+    monkeypatch.setattr(cex_async, "get_price", get_price)
+    api = {"exchange": "bittrex", "pair": "BTC:USD"}
+    feed = open_stream([api])
+    try:
+        wait_for(lambda: stream_ticker(feed, api)["synced"])
+        assert stream_ticker(feed, api)["last"] == 10100.5
+        assert stream_book(feed, api, 1)["bidp"].tolist() == [10100.5]
+    finally:
+        close_stream(feed)
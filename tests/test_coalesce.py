@@ -0,0 +1,99 @@
+"""
+single-flight coalescing of identical concurrent calls
+"""
+
+# STANDARD MODULES
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+import cex_public
+import coalesce
+import executor
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    """
+    zero the counters around every test
+    """
+    coalesce.reset_stats()
+    yield
+    coalesce.reset_stats()
+
+
+def test_concurrent_callers_share_one_call():
+    release, calls = Event(), []
+
+    def target(value):
+        calls.append(value)
+        release.wait(5)
+        return {"value": value}
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [
+            pool.submit(coalesce.single_flight, "key", target, 1) for _ in range(8)
+        ]
+        while coalesce.coalesce_stats()["hits"] < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(5) for future in futures]
+    assert calls == [1]
+    assert results == [{"value": 1}] * 8
+    # every caller owns its copy
+    assert len({id(result) for result in results}) == 8
+    stats = coalesce.coalesce_stats()
+    assert (stats["hits"], stats["misses"], stats["inflight"]) == (7, 1, 0)
+
+
+def test_sequential_calls_are_not_cached():
+    calls = []
+    for _ in range(3):
+        coalesce.single_flight("key", calls.append, 1)
+    assert len(calls) == 3
+    assert coalesce.coalesce_stats()["misses"] == 3
+
+
+def test_exception_reaches_every_caller():
+    release = Event()
+
+    def target():
+        release.wait(5)
+        raise ValueError("down")
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(coalesce.single_flight, "key", target) for _ in range(4)]
+        while coalesce.coalesce_stats()["hits"] < 3:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(5)
+    assert coalesce.coalesce_stats()["inflight"] == 0
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(coalesce, "COALESCE", False)
+    assert coalesce.single_flight("key", len, "abc") == 3
+    assert coalesce.coalesce_stats()["misses"] == 0
+
+
+def test_get_price_and_book_coalesce(coinbase):
+    executor.set_mode("thread", workers=8)
+    coinbase["delay"] = 0.3
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    with ThreadPoolExecutor(8) as pool:
+        prices = list(pool.map(lambda _: cex_public.get_price(dict(api)), range(8)))
+    assert prices == [0.00713] * 8
+    assert len(coinbase["requests"]) == 1
+    coinbase["body"] = {"bids": [["1", "2", 1]], "asks": [["3", "4", 1]]}
+    with ThreadPoolExecutor(8) as pool:
+        books = list(pool.map(lambda _: cex_public.get_book(dict(api)), range(8)))
+    assert len(coinbase["requests"]) == 2
+    assert all(np.array_equal(book["askp"], [3.0]) for book in books)
+    assert coalesce.coalesce_stats()["hits"] == 14
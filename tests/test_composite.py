@@ -0,0 +1,109 @@
+"""
+cross exchange volume weighted composite candles
+"""
+
+# STANDARD MODULES
+import time
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+import panel
+from composite import composite, get_composite
+
+# exchange: candles at unix 60, 120, 180 as (high, low, open, close, volume)
+VENUES = {
+    "coinbase": [(11, 9, 10, 10, 1), (12, 10, 10, 11, 0), (13, 11, 11, 12, 3)],
+    "kraken": [(14, 10, 12, 13, 3), (15, 12, 13, 14, 1), (14, 13, 14, 14, 1)],
+}
+
+
+def candles(exchange):
+    """
+    normalized candles, as get_candles() returns them
+    """
+    rows = np.array(VENUES[exchange], dtype=float)
+    data = {key: rows[:, idx] for idx, key in enumerate(panel.COLUMNS[:-1])}
+    data["unix"] = np.array([60, 120, 180])
+    return data
+
+
+def test_composite(monkeypatch):
+    def get_candles(api, *_):
+        if api["exchange"] == "kucoin":
+            raise ValueError("BTC:USD not listed")
+        return candles(api["exchange"])
+
+    monkeypatch.setattr(panel, "get_candles", get_candles)
+    ret = get_composite("BTC:USD", ["coinbase", "kraken", "kucoin"], interval=60)
+    assert ret["panel"]["exchanges"] == ["coinbase", "kraken"]
+    assert list(ret["missing"]) == ["kucoin"]
+    data = ret["candles"]
+    assert data["unix"].tolist() == [60, 120, 180]
+    assert data["volume"].tolist() == [4, 1, 4]
+    # weighted by volume: 1 at coinbase and 3 at kraken
+    assert data["open"][0] == (10 * 1 + 12 * 3) / 4
+    assert data["close"][0] == (10 * 1 + 13 * 3) / 4
+    # nothing traded at coinbase; its bar does not count
+    assert data["high"][1] == 15 and data["low"][1] == 12
+    assert data["close"][1] == 14
+    assert data["high"][2] == 14 and data["low"][2] == 11
+    assert ret["share"].tolist() == [[0.25, 0, 0.75], [0.75, 1, 0.25]]
+
+
+def test_binance_bars_align_by_open_time(monkeypatch):
+    def get_candles(api, *_):
+        data = candles("coinbase")
+        if api["exchange"] == "binance":
+            # binance stamps each bar with its close time, less one second
+            data["unix"] = data["unix"] + 59
+        return data
+
+    monkeypatch.setattr(panel, "get_candles", get_candles)
+    ret = get_composite("BTC:USDT", ["coinbase", "binance"], interval=60)
+    aligned = ret["panel"]
+    assert aligned["unix"].tolist() == [60, 120, 180]
+    assert aligned["close"].tolist() == [[10, 11, 12], [10, 11, 12]]
+    assert ret["candles"]["close"].tolist() == [10, 11, 12]
+
+
+def test_quiet_and_unlisted():
+    nan = np.nan
+    aligned = {
+        "unix": np.array([60, 120, 180]),
+        "high": np.array([[nan, 2, 2], [5, 5, 6]]),
+        "low": np.array([[nan, 2, 2], [5, 5, 4]]),
+        "open": np.array([[nan, 2, 2], [5, 5, 5]]),
+        "close": np.array([[nan, 2, 2], [5, 5, 5]]),
+        "volume": np.array([[nan, 0, 0], [0, 0, 2]]),
+    }
+    data, share = composite(aligned)
+    # nobody traded; the mean close of the venues listed
+    assert data["close"].tolist() == [5, 3.5, 5]
+    assert data["high"].tolist() == [5, 3.5, 6]
+    assert data["volume"].tolist() == [0, 0, 2]
+    assert share.tolist() == [[0, 0, 0], [0, 0, 1]]
+
+
+def test_speed():
+    # a day of minutes at seven exchanges
+    rng = np.random.default_rng(0)
+    shape = (7, 1440)
+    close = 100 + rng.standard_normal(shape).cumsum(axis=1)
+    aligned = {
+        "unix": np.arange(shape[1]) * 60,
+        "high": close + 1,
+        "low": close - 1,
+        "open": close,
+        "close": close,
+        "volume": rng.exponential(size=shape) * (rng.random(shape) > 0.2),
+    }
+    composite(aligned)
+    begin = time.perf_counter()
+    data, _ = composite(aligned)
+    assert time.perf_counter() - begin < 0.05
+    assert np.all(data["low"] <= data["open"]) and np.all(data["open"] <= data["high"])
+    assert np.all(data["low"] <= data["close"]) and np.all(
+        data["close"] <= data["high"]
+    )
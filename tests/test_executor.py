@@ -0,0 +1,143 @@
+"""
+worker pool checkout / checkin, hung and crashed workers, mode switching
+"""
+
+# STANDARD MODULES
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# THIRD PARTY MODULES
+import pytest
+
+# CEX MODULES
+import executor
+
+
+def pid():
+    """
+    module level target; the worker's process id
+    """
+    return os.getpid()
+
+
+def nap(seconds):
+    """
+    module level target; sleep then report the worker's process id
+    """
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def crash():
+    """
+    module level target; the worker dies without replying
+    """
+    os._exit(1)  # pylint: disable=protected-access
+
+
+def fail():
+    """
+    module level target; an ordinary exception
+    """
+    raise ValueError("boom")
+
+
+@pytest.fixture(name="pool", params=["process"])
+def fixture_pool(request):
+    """
+    a two worker pool, torn down afterwards
+    """
+    executor.set_mode(request.param, workers=2)
+    yield
+    executor.set_mode("process", workers=8)
+
+
+def test_workers_are_reused(pool):
+    pids = {executor.execute(pid, (), 5) for _ in range(10)}
+    assert len(pids) == 1
+    assert os.getpid() not in pids
+
+
+def test_timeout_kills_and_respawns(pool):
+    executor.execute(pid, (), 5)
+    hung = list(executor.POOL["idle"])
+    with pytest.raises(TimeoutError):
+        executor.execute(nap, (5,), 0.2)
+    # the hung worker was terminated, not returned to the pool
+    assert not any(proc.is_alive() for proc, _ in hung)
+    assert not executor.POOL["idle"]
+    # and the pool still serves from a fresh worker
+    assert executor.execute(pid, (), 5) != os.getpid()
+    assert len(executor.POOL["idle"]) == 1
+
+
+@pytest.mark.parametrize("mode", ["process", "thread"])
+def test_hung_workers_do_not_starve_the_pool(mode):
+    executor.set_mode(mode, workers=2)
+    try:
+        # every worker hangs past its timeout
+        for _ in range(executor.WORKERS):
+            with pytest.raises(TimeoutError):
+                executor.execute(nap, (3,), 0.2)
+        assert executor.execute(time.time, (), 1)
+    finally:
+        executor.set_mode("process", workers=8)
+
+
+def test_crashed_worker_is_replaced(pool):
+    with pytest.raises(RuntimeError):
+        executor.execute(crash, (), 5)
+    assert executor.execute(pid, (), 5) != os.getpid()
+
+
+def test_target_exception_is_raised(pool):
+    with pytest.raises(RuntimeError, match="boom"):
+        executor.execute(fail, (), 5)
+    assert executor.execute(pid, (), 5)
+
+
+def test_unpicklable_args_do_not_leak_workers(pool):
+    for _ in range(3):  # more failures than the pool has workers
+        with pytest.raises(Exception):
+            executor.execute(len, (threading.Lock(),), 5)
+    assert executor.execute(pid, (), 5)
+
+
+def test_broadcast_reaches_every_worker(pool):
+    assert len(set(executor.broadcast(pid, (), 5))) == 2
+    with pytest.raises(Exception):
+        executor.broadcast(len, (threading.Lock(),), 5)
+    assert len(executor.broadcast(pid, (), 5)) == 2
+
+
+def test_mode_switch_under_load():
+    executor.set_mode("process", workers=4)
+    results, errors = [], []
+
+    def call(_):
+        try:
+            results.append(executor.execute(nap, (0.05,), 5))
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append(error)
+
+    with ThreadPoolExecutor(8) as callers:
+        futures = [callers.submit(call, i) for i in range(40)]
+        for mode in ["thread", "inline", "process", "spawn", "process"]:
+            time.sleep(0.05)
+            executor.set_mode(mode, workers=4)
+        for future in futures:
+            future.result(30)
+    # every call completed in one mode or another; nothing hung
+    assert len(results) + len(errors) == 40
+    assert not errors, errors
+    assert executor.execute(pid, (), 5)
+    executor.set_mode("process", workers=8)
+
+
+def test_shutdown_leaves_no_workers(pool):
+    executor.execute(pid, (), 5)
+    executor.shutdown()
+    assert not executor.POOL["idle"]
+    assert executor.execute(pid, (), 5)
@@ -0,0 +1,90 @@
+"""
+concurrent cross exchange price and book under one deadline
+"""
+
+# STANDARD MODULES
+import time
+
+# THIRD PARTY MODULES
+import pytest
+
+# CEX MODULES
+import cex_public
+import coalesce
+import executor
+from fan_out import fan_out, top_of_book
+
+RESPONSES = {
+    "/products/LTC-BTC/ticker": {"price": "0.0071"},
+    "/products/LTC-BTC/book": {
+        "bids": [["0.0070", "3", 1]],
+        "asks": [["0.0073", "1", 1]],
+    },
+    "/api/v1/ticker/allPrices": [{"symbol": "LTCBTC", "price": "0.0072"}],
+    "/api/v1/depth": {"bids": [["0.0071", "2"]], "asks": [["0.0072", "4"]]},
+    "/0/public/Ticker": {"result": {"XLTCXXBT": {"c": ["0.0070", "1"]}}},
+    "/0/public/Depth": {
+        "result": {
+            "XLTCXXBT": {"bids": [["0.0069", "1", 1]], "asks": [["0.0074", "1", 1]]}
+        }
+    },
+}
+
+
+@pytest.fixture(name="venues")
+def fixture_venues(coinbase, monkeypatch):
+    """
+    coinbase, binance and kraken on the stub; kucoin on a path it 404s
+    """
+    for exchange in ["binance", "kraken"]:
+        monkeypatch.setitem(cex_public.URLS, exchange, coinbase["url"])
+    monkeypatch.setitem(cex_public.URLS, "kucoin", coinbase["url"] + "/down")
+    monkeypatch.setattr(cex_public, "ATTEMPTS", 1)
+    monkeypatch.setattr(coalesce, "COALESCE", False)
+    coinbase["body"] = lambda record: RESPONSES.get(record["path"], b"not json")
+    executor.set_mode("thread", workers=16)
+    return coinbase
+
+
+def test_consolidated_top_of_book(venues):
+    ret = fan_out("LTC:BTC", ["coinbase", "binance", "kraken"], depth=5, deadline=5)
+    assert not ret["missing"]
+    assert ret["results"]["binance"]["price"] == 0.0072
+    assert ret["best_bid"] == {"exchange": "binance", "price": 0.0071, "volume": 2.0}
+    assert ret["best_ask"] == {"exchange": "binance", "price": 0.0072, "volume": 4.0}
+    assert ret["spread"] == pytest.approx(0.0001)
+    assert not ret["crossed"]
+
+
+def test_failing_venue_is_missing(venues):
+    ret = fan_out("LTC:BTC", ["coinbase", "kucoin"], deadline=5)
+    assert set(ret["missing"]) == {"kucoin"}
+    assert set(ret["missing"]["kucoin"]) == {"price", "book"}
+    assert ret["best_bid"]["exchange"] == "coinbase"
+
+
+def test_slow_venue_misses_the_deadline(venues):
+    respond = venues["body"]
+
+    def kraken_lags(record):
+        if record["path"].startswith("/0/public"):
+            time.sleep(2)
+        return respond(record)
+
+    venues["body"] = kraken_lags
+    ret = fan_out("LTC:BTC", ["coinbase", "kraken"], deadline=0.5)
+    assert ret["missing"] == {"kraken": {"price": "deadline", "book": "deadline"}}
+    assert ret["elapsed"] < 1.5
+    assert ret["best_ask"]["exchange"] == "coinbase"
+
+
+def test_crossed_books():
+    books = {
+        "a": {"book": {"bidp": [2.0], "bidv": [1.0], "askp": [3.0], "askv": [1.0]}},
+        "b": {"book": {"bidp": [0.5], "bidv": [1.0], "askp": [1.5], "askv": [1.0]}},
+        "c": {"price": 1.0},
+    }
+    top = top_of_book(books)
+    assert top["best_bid"]["exchange"] == "a" and top["best_ask"]["exchange"] == "b"
+    assert top["crossed"] and top["spread"] == -0.5
+    assert top_of_book({})["best_bid"] is None
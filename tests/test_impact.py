@@ -0,0 +1,116 @@
+"""
+market impact and slippage of a book
+"""
+
+# STANDARD MODULES
+import time
+
+# THIRD PARTY MODULES
+import numpy as np
+import pytest
+
+# CEX MODULES
+from impact import impact, max_size, order_edict
+
+BOOK = {
+    "bidv": np.array([1.0, 2.0, 3.0]),
+    "bidp": np.array([99.0, 98.0, 96.0]),
+    "askp": np.array([101.0, 102.0, 105.0]),
+    "askv": np.array([1.0, 2.0, 3.0]),
+}
+
+
+def walk(book, side, size):
+    """
+    (average, worst, filled) of one market order, level by level
+    """
+    prices, volumes = (
+        (book["askp"], book["askv"]) if side == "buy" else (book["bidp"], book["bidv"])
+    )
+    left, cost, worst = size, 0.0, prices[0]
+    for price, volume in zip(prices, volumes):
+        if left <= 0:
+            break
+        take = min(left, volume)
+        cost += take * price
+        left -= take
+        worst = price
+    filled = size - left
+    return (cost / filled if filled else prices[0]), worst, filled
+
+
+def test_impact():
+    ret = impact(BOOK, "buy", [0, 0.5, 1, 2, 4, 6, 10])
+    assert ret["average"].tolist() == pytest.approx(
+        [101, 101, 101, 101.5, 102.5, 620 / 6, 620 / 6]
+    )
+    assert ret["worst"].tolist() == [101, 101, 101, 102, 105, 105, 105]
+    assert ret["filled"].tolist() == [0, 0.5, 1, 2, 4, 6, 6]
+    assert ret["slippage"][3] == pytest.approx(1e4 * 0.5 / 101)
+    ret = impact(BOOK, "sell", [2])
+    assert ret["average"][0] == 98.5 and ret["worst"][0] == 98
+    # worse fills are positive slippage on both sides
+    assert ret["slippage"][0] == pytest.approx(1e4 * 0.5 / 99)
+
+
+@pytest.mark.parametrize("side", ["buy", "sell"])
+def test_against_walking_the_book(side):
+    rng = np.random.default_rng(0)
+    sizes = rng.uniform(0, 7, 500)
+    ret = impact(BOOK, side, sizes)
+    for i, size in enumerate(sizes):
+        average, worst, filled = walk(BOOK, side, size)
+        assert ret["average"][i] == pytest.approx(average)
+        assert ret["worst"][i] == worst
+        assert ret["filled"][i] == pytest.approx(filled)
+
+
+@pytest.mark.parametrize("side", ["buy", "sell"])
+def test_max_size(side):
+    bps = np.array([-1, 0, 10, 50, 100, 200, 1000])
+    sizes = max_size(BOOK, side, bps)
+    assert sizes[0] == 0 and sizes[1] == 1 and sizes[-1] == 6
+    # no order at all for a negative slippage
+    slippage = impact(BOOK, side, sizes)["slippage"]
+    assert np.all(slippage[1:] <= bps[1:] + 1e-9)
+    # any more and the slippage is over, unless the whole side is taken
+    short = sizes < 6
+    over = impact(BOOK, side, sizes[short] + 1e-6)["slippage"]
+    assert np.all(over > bps[short])
+
+
+def test_order_edict():
+    assert order_edict(BOOK, "buy", 2.5) == {
+        "side": "buy",
+        "amount": 2.5,
+        "price": 102.0,
+    }
+    assert order_edict(BOOK, "sell", 50) == {
+        "side": "sell",
+        "amount": 6.0,
+        "price": 96.0,
+    }
+    edict = order_edict(BOOK, "buy", bps=50)
+    assert edict["price"] == 102 and 1 < edict["amount"] < 3
+
+
+def test_empty_side():
+    book = dict(BOOK, askp=np.array([]), askv=np.array([]))
+    ret = impact(book, "buy", [1, 2])
+    assert np.isnan(ret["average"]).all() and ret["filled"].tolist() == [0, 0]
+    assert max_size(book, "buy", 10) == 0
+
+
+def test_speed():
+    book = {
+        "bidp": 100 - np.arange(50) / 100,
+        "bidv": np.ones(50),
+        "askp": 100.01 + np.arange(50) / 100,
+        "askv": np.ones(50),
+    }
+    sizes = np.linspace(0, 60, 5000)
+    impact(book, "buy", sizes)
+    begin = time.perf_counter()
+    for _ in range(100):
+        impact(book, "buy", sizes)
+    assert (time.perf_counter() - begin) / 100 < 0.002
@@ -0,0 +1,96 @@
+"""
+incrementally updated order book
+"""
+
+# STANDARD MODULES
+import random
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+import order_book
+from cex_public import book_response
+from order_book import best, depth_of_market, load, new_book, update, update_many
+
+DOM = {
+    "bidv": np.array([1.0, 2.0, 3.0]),
+    "bidp": np.array([10.0, 9.5, 9.0]),
+    "askp": np.array([10.5, 11.0]),
+    "askv": np.array([4.0, 5.0]),
+}
+
+
+def reference(levels, side, depth):
+    """
+    prices and sizes of the best depth levels of a {price: size} dict
+    """
+    prices = sorted(levels, reverse=side == "bid")[:depth]
+    return prices, [levels[price] for price in prices]
+
+
+def test_book_response_order():
+    data = {
+        "bids": [["9", "1"], ["10", "2"], ["9", "3"]],
+        "asks": [["12", "1"], ["11", "2"], ["11", "1"]],
+    }
+    book = book_response({"exchange": "coinbase"}, data, 2)
+    # sorted by price then volume, best first, as sorted(zip()) did
+    assert book["bidp"].tolist() == [10, 9] and book["bidv"].tolist() == [2, 3]
+    assert book["askp"].tolist() == [11, 11] and book["askv"].tolist() == [1, 2]
+
+
+def test_updates():
+    book = new_book()
+    load(book, DOM)
+    assert best(book, "bid") == (10.0, 1.0)
+    assert best(book, "ask") == (10.5, 4.0)
+    update(book, "bid", 10.25, 7)
+    update(book, "ask", 10.5, 0)
+    update(book, "ask", 10.75, 2)
+    update(book, "bid", 9.5, 6)
+    update(book, "bid", 1.0, 0)
+    dom = depth_of_market(book, 3)
+    assert dom["bidp"].tolist() == [10.25, 10.0, 9.5]
+    assert dom["bidv"].tolist() == [7, 1, 6]
+    assert dom["askp"].tolist() == [10.75, 11.0]
+    assert dom["askv"].tolist() == [2, 5]
+    assert list(dom) == list(DOM)
+    # a slice is a copy; the book does not change under its reader
+    dom["bidv"][0] = 0
+    assert best(book, "bid") == (10.25, 7.0)
+    order_book.truncate(book, "bid", 2)
+    assert depth_of_market(book, 5)["bidp"].tolist() == [10.25, 10.0]
+    load(book, {k: v[:0] for k, v in DOM.items()})
+    assert best(book, "bid") is None and best(book, "ask") is None
+
+
+def test_random_against_dict(monkeypatch):
+    # a tiny capacity so the sides grow
+    monkeypatch.setattr(order_book, "CAPACITY", 4)
+    rng = random.Random(0)
+    book = order_book.new_book(4)
+    levels = {"bid": {}, "ask": {}}
+    for _ in range(3000):
+        side = rng.choice(["bid", "ask"])
+        count = rng.choice([1, 1, 1, 5, 40])
+        prices = [rng.randrange(1, 200) / 4 for _ in range(count)]
+        sizes = [rng.choice([0, 0, 1, 2.5, 3]) for _ in range(count)]
+        if count == 1:
+            update(book, side, prices[0], sizes[0])
+        else:
+            update_many(book, side, prices, sizes)
+        for price, size in zip(prices, sizes):
+            if size:
+                levels[side][price] = size
+            else:
+                levels[side].pop(price, None)
+        if rng.random() < 0.01:
+            dom = depth_of_market(book, 1000)
+            load(book, dom)
+        depth = rng.randrange(1, 20)
+        dom = depth_of_market(book, depth)
+        for side in ["bid", "ask"]:
+            prices, sizes = reference(levels[side], side, depth)
+            assert dom[side + "p"].tolist() == prices
+            assert dom[side + "v"].tolist() == sizes
@@ -0,0 +1,75 @@
+"""
+many pairs of one exchange on a common time grid
+"""
+
+# STANDARD MODULES
+import time
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+import panel
+from cex_public import process_candles
+
+# pair: (first unix, last unix, unix missing at the exchange)
+SPANS = {
+    "A:USD": (1000, 1500, [1200, 1300]),
+    "B:USD": (1200, 1700, []),
+    "C:USD": (1100, 1400, [1400]),
+}
+
+
+def candles(pair):
+    """
+    normalized candles, as get_candles() returns them
+    """
+    first, last, missing = SPANS[pair]
+    unix = np.array([t for t in range(first, last + 101, 100) if t not in missing])
+    page = np.column_stack(
+        [unix + 2.0, unix - 2.0, unix * 1.0, unix + 1.0, unix / 100.0, unix]
+    )
+    return process_candles(page, first, last, first - 300, 100)
+
+
+def test_panel(monkeypatch):
+    def get_candles(api, *_):
+        time.sleep(0.2)
+        if api["pair"] == "D:USD":
+            raise ValueError("delisted")
+        return candles(api["pair"])
+
+    monkeypatch.setattr(panel, "get_candles", get_candles)
+    begin = time.time()
+    ret = panel.get_panel("coinbase", list(SPANS) + ["D:USD"], interval=100)
+    # fetched concurrently
+    assert time.time() - begin < 0.6
+    assert ret["pairs"] == list(SPANS)
+    assert list(ret["missing"]) == ["D:USD"]
+    assert "delisted" in ret["missing"]["D:USD"]
+    assert ret["unix"].tolist() == list(range(1100, 1800, 100))
+    assert ret["close"].shape == ret["volume"].shape == (3, 7)
+    nan = np.nan
+    # A:USD; gaps take the previous close, then the close carries forward
+    assert ret["close"][0].tolist() == [1101, 1101, 1101, 1401, 1501, 1501, 1501]
+    assert ret["volume"][0].tolist() == [11, 0, 0, 14, 15, 0, 0]
+    # B:USD is not listed before its first candle
+    np.testing.assert_array_equal(
+        ret["close"][1], [nan, nan, 1301, 1401, 1501, 1601, 1701]
+    )
+    np.testing.assert_array_equal(ret["volume"][1], [nan, nan, 13, 14, 15, 16, 17])
+    # every row matches what get_candles() returned over its own span
+    for row, pair in enumerate(ret["pairs"]):
+        data = candles(pair)
+        columns = np.isin(ret["unix"], data["unix"])
+        for key in ["high", "low", "open", "close", "volume"]:
+            assert ret[key][row, columns].tolist() == data[key].tolist()
+
+
+def test_empty(monkeypatch):
+    monkeypatch.setattr(
+        panel, "get_candles", lambda *_: {k: np.array([]) for k in panel.COLUMNS}
+    )
+    ret = panel.get_panel("coinbase", ["A:USD"], interval=100)
+    assert ret["pairs"] == [] and ret["missing"] == {}
+    assert ret["unix"].shape == (0,) and ret["close"].shape == (0, 0)
@@ -0,0 +1,130 @@
+"""
+token bucket refill, lane reserves, priority yield and weight clamping
+"""
+
+# STANDARD MODULES
+import asyncio
+from multiprocessing import Process
+
+# THIRD PARTY MODULES
+import pytest
+
+# CEX MODULES
+import rate_limit
+
+
+class Clock:
+    """
+    fake wall clock; advanced by hand
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch, tmp_path):
+    """
+    fresh bucket files and a frozen clock for every test
+    """
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "PATH", str(tmp_path) + "/")
+    monkeypatch.setattr(rate_limit, "CLOCK", clock)
+    monkeypatch.setattr(rate_limit, "LIMITS", {"coinbase": (6, 3.0)})
+    monkeypatch.setattr(rate_limit, "WEIGHTS", {"coinbase": {"/heavy": 4}})
+    return clock
+
+
+def test_burst_then_refill(clock):
+    api = {"exchange": "coinbase"}
+    # orders may drain the full burst of 6
+    for _ in range(6):
+        assert rate_limit.try_acquire(api, "order") == 0.0
+    assert rate_limit.try_acquire(api, "order") > 0.0
+    clock.now += 1.0  # 3 tokens per second
+    for _ in range(3):
+        assert rate_limit.try_acquire(api, "order") == 0.0
+    assert rate_limit.try_acquire(api, "order") > 0.0
+
+
+def test_lane_reserves(clock):
+    api = {"exchange": "coinbase"}
+    # backfill leaves half of 6 untouched
+    taken = 0
+    while rate_limit.try_acquire(api, "backfill") == 0.0:
+        taken += 1
+    assert taken == 3
+    # market leaves 1.2; one more whole token fits above it
+    assert rate_limit.try_acquire(api, "market") == 0.0
+    assert rate_limit.try_acquire(api, "market") > 0.0
+    clock.now += 1.0
+    assert rate_limit.try_acquire(api, "order") == 0.0
+
+
+def test_priority_yield(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "HOLD", 5.0)
+    api = {"exchange": "coinbase"}
+    for _ in range(6):
+        rate_limit.try_acquire(api, "order")
+    # an order is throttled, so it claims its lane for HOLD seconds
+    assert rate_limit.try_acquire(api, "order") > 0.0
+    clock.now += 2.0  # bucket is full again
+    # market yields to the waiting order despite the full bucket
+    assert rate_limit.try_acquire(api, "market") > 0.0
+    assert rate_limit.try_acquire(api, "order") == 0.0
+    # once the claim expires market proceeds
+    clock.now += 5.0
+    assert rate_limit.try_acquire(api, "market") == 0.0
+
+
+def test_api_lane_overrides_default(clock):
+    api = {"exchange": "coinbase", "lane": "order"}
+    for _ in range(6):
+        assert rate_limit.try_acquire(api, "backfill") == 0.0
+
+
+def test_heavy_call_never_hangs(clock):
+    # heavier than a lane may ever spend; charged down to what the lane may
+    assert rate_limit.try_acquire({"exchange": "coinbase"}, "backfill", 6) == 0.0
+    clock.now += 10
+    heavy = {"exchange": "coinbase", "endpoint": "/heavy/1"}
+    assert rate_limit.try_acquire(heavy, "backfill") == 0.0
+
+
+def test_acquire_returns_when_refilled(monkeypatch, tmp_path):
+    monkeypatch.setattr(rate_limit, "PATH", str(tmp_path) + "/")
+    monkeypatch.setattr(rate_limit, "LIMITS", {"coinbase": (2, 50.0)})
+    api = {"exchange": "coinbase"}
+    waits = [rate_limit.acquire(api, "order", 2) for _ in range(3)]
+    assert waits[0] < 0.01
+    assert 0.02 < waits[2] < 1.0
+    waits = asyncio.run(rate_limit.acquire_async(api, "order", 2))
+    assert waits < 1.0
+
+
+def test_unknown_exchange_is_not_limited(clock):
+    assert rate_limit.try_acquire({"exchange": "stub"}) == 0.0
+
+
+def drain(path):
+    """
+    module level child; spend the coinbase bucket from another process
+    """
+    rate_limit.PATH = path
+    rate_limit.LIMITS = {"coinbase": (6, 3.0)}
+    rate_limit.CLOCK = lambda: 1000.0
+    for _ in range(6):
+        rate_limit.try_acquire({"exchange": "coinbase"}, "order")
+
+
+def test_bucket_shared_across_processes(clock, tmp_path):
+    assert rate_limit.try_acquire({"exchange": "coinbase"}, "order") == 0.0
+    child = Process(target=drain, args=(str(tmp_path) + "/",))
+    child.start()
+    child.join(10)
+    # the other process spent the remaining 5 tokens
+    assert rate_limit.levels()["coinbase"] == 0.0
+    assert rate_limit.try_acquire({"exchange": "coinbase"}, "order") > 0.0
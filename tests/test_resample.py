@@ -0,0 +1,57 @@
+"""
+local resampling of candles to intervals the exchanges do not offer
+"""
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+import cex_public
+from resample import native_interval, resample
+from test_cex_async import coinbase_candles
+
+
+def test_native_interval():
+    coinbase = cex_public.INTERVALS["coinbase"]
+    assert native_interval(coinbase, 14400) == 3600
+    assert native_interval(coinbase, 2700) == 900
+    assert native_interval(coinbase, 172800) == 86400
+    assert native_interval(coinbase, 3600) == 3600
+    assert native_interval(coinbase, 90) is None
+    assert cex_public.INTERVALS["poloniex"][14400] == 14400
+
+
+def test_resample():
+    data = {
+        "high": np.array([2.0, 3.0, 1.5, 4.0, 2.0]),
+        "low": np.array([1.0, 0.5, 1.0, 1.0, 1.5]),
+        "open": np.array([1.5, 2.0, 1.2, 2.0, 1.8]),
+        "close": np.array([2.0, 1.2, 1.4, 1.8, 1.9]),
+        "volume": np.array([1.0, 2.0, 3.0, 4.0, 5.0]),
+        "unix": np.array([3600, 7200, 10800, 14400, 18000]),
+    }
+    out = resample(data, 7200)
+    assert list(out) == list(data)
+    assert out["unix"].tolist() == [0, 7200, 14400]
+    assert out["open"].tolist() == [1.5, 2.0, 2.0]
+    assert out["close"].tolist() == [2.0, 1.4, 1.9]
+    assert out["high"].tolist() == [2.0, 3.0, 4.0]
+    assert out["low"].tolist() == [1.0, 0.5, 1.0]
+    assert out["volume"].tolist() == [1.0, 5.0, 9.0]
+
+
+def test_get_candles_resamples(coinbase):
+    coinbase["body"] = coinbase_candles
+    api = {"exchange": "coinbase", "pair": "LTC:BTC"}
+    end = 1600000000
+    start = end - 20 * 14400
+    four = cex_public.get_candles(dict(api), start, end, 14400)
+    assert {r["query"]["granularity"] for r in coinbase["requests"]} == {"3600"}
+    assert (np.diff(four["unix"]) == 14400).all()
+    assert four["unix"][0] == start - start % 14400 + 14400
+    assert four["unix"][-1] == end - end % 14400
+    hourly = cex_public.get_candles(dict(api), start - start % 14400, end, 3600)
+    expected = resample(hourly, 14400)
+    keep = np.isin(expected["unix"], four["unix"])
+    for key, values in four.items():
+        assert np.array_equal(values, expected[key][keep])
@@ -0,0 +1,65 @@
+"""
+pooled keep-alive sessions, their reuse accounting and prewarming
+"""
+
+# THIRD PARTY MODULES
+import pytest
+
+# CEX MODULES
+import executor
+import sessions
+from sessions import get_session, pool_prewarm, pool_stats
+
+
+def fetch(url):
+    """
+    module level executor target; one GET on the pooled session
+    """
+    return get_session({"exchange": "coinbase", "url": url}).get(url).status_code
+
+
+@pytest.fixture(name="mode", params=["inline", "process"])
+def fixture_mode(request):
+    """
+    fresh sessions here and in a two worker pool
+    """
+    sessions.close_sessions()
+    executor.set_mode(request.param, workers=2)
+    yield request.param
+    executor.set_mode("process", workers=8)
+    sessions.close_sessions()
+
+
+def test_pool_sizes(monkeypatch):
+    monkeypatch.setitem(sessions.POOL_SIZES, "binance", 20)
+    sessions.close_sessions()
+    try:
+        for exchange, size in [("binance", 20), ("coinbase", sessions.POOL_MAXSIZE)]:
+            url = "https://%s.example" % exchange
+            adapter = get_session({"exchange": exchange, "url": url}).get_adapter(url)
+            assert adapter.poolmanager.connection_pool_kw["maxsize"] == size
+    finally:
+        sessions.close_sessions()
+
+
+@pytest.mark.usefixtures("mode")
+def test_connection_reuse(stub):
+    url = stub["url"]
+    for _ in range(10):
+        assert executor.execute(fetch, (url,), 10) == 200
+    # one call at a time; the same worker and connection serve every one
+    assert pool_stats()[url] == {"requests": 10, "connections": 1, "reuse": 0.9}
+
+
+def test_prewarm_opens_connections(stub, mode):
+    url = stub["url"]
+    warmed = pool_prewarm({"coinbase": url})
+    workers = len(warmed)
+    assert workers == (1 if mode == "inline" else 2)
+    assert all(each["coinbase"] is not None for each in warmed)
+    stats = pool_stats()[url]
+    assert stats["connections"] == workers and stats["requests"] == workers
+    # the warm connections serve the calls which follow
+    for _ in range(4):
+        executor.execute(fetch, (url,), 10)
+    assert pool_stats()[url]["connections"] == workers
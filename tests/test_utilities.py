@@ -0,0 +1,57 @@
+"""
+shared utilities
+"""
+
+# STANDARD MODULES
+import os
+import subprocess
+import sys
+import tempfile
+
+# THIRD PARTY MODULES
+import numpy as np
+
+# CEX MODULES
+from utilities import from_iso_date, from_iso_dates, to_iso_date, to_iso_dates
+
+
+def test_iso_dates_round_trip():
+    unix = np.arange(0, 4000000000, 9999937)
+    iso = to_iso_dates(unix)
+    assert iso.tolist() == [to_iso_date(t) for t in unix]
+    assert from_iso_dates(iso).tolist() == unix.tolist()
+    assert from_iso_dates(iso).dtype == np.int64
+    assert from_iso_dates([]).tolist() == []
+
+
+def test_iso_dates_fall_back_to_strptime():
+    # unpadded fields are valid to strptime but not to datetime64
+    assert from_iso_dates(["2019-1-2T3:4:5"]).tolist() == [
+        from_iso_date("2019-01-02T03:04:05")
+    ]
+
+
+def test_scalar_conversions_are_cached():
+    from_iso_date.cache_clear()
+    from_iso_date("2020-09-13T12:26:40")
+    assert from_iso_date("2020-09-13T12:26:40") == 1600000000
+    assert from_iso_date.cache_info().hits == 1
+    assert to_iso_date(1600000000.7) == "2020-09-13T12:26:40"
+
+
+def test_imports_without_fcntl():
+    # windows has no fcntl; the modules fall back to their thread locks
+    script = (
+        "import sys\n"
+        "sys.modules['fcntl'] = None\n"
+        "sys.path.insert(0, %r)\n"
+        "import candle_store, cex_private, cex_public, rate_limit, utilities\n"
+        "assert utilities.fcntl is None\n"
+        "rate_limit.PATH = %r\n"
+        "rate_limit.acquire({'exchange': 'coinbase'})\n"
+        "assert rate_limit.levels()['coinbase'] == 5\n"
+    )
+    api = os.path.join(os.path.dirname(os.path.dirname(__file__)), "API")
+    with tempfile.TemporaryDirectory() as temp:
+        code = script % (api, temp + "/")
+        subprocess.run([sys.executable, "-c", code], check=True, timeout=60)